@@ -81,11 +81,77 @@ const dashboardAPI = {
   getSummary: () => api.get('/dashboard'),
 };
 
+// Live events (Server-Sent Events) instead of polling /alerts and /dashboard.
+// handlers maps event types ('alert.created', 'alert.updated',
+// 'maintenance.created', 'maintenance.updated', 'engine.health',
+// 'engine.deleted', 'resync') to callbacks receiving the parsed payload.
+// On 'resync' reload from the REST endpoints. Returns the EventSource;
+// call close() on it to unsubscribe.
+const eventsAPI = {
+  // EventSource cannot send headers, so each connection uses a short-lived
+  // token that only opens the stream. The server ends streams every few
+  // minutes; instead of EventSource retrying with the expired token, every
+  // reconnect fetches a new one and resumes after the last event received.
+  // Returns an object with close().
+  subscribe: (handlers, types) => {
+    let source = null;
+    let closed = false;
+    let lastEventId = null;
+
+    const open = async () => {
+      let token;
+      try {
+        token = (await api.post('/events/token')).data.token;
+      } catch (error) {
+        if (!closed) {
+          setTimeout(open, 5000);
+        }
+        return;
+      }
+      if (closed) {
+        return;
+      }
+
+      const params = new URLSearchParams({ jwt: token });
+      if (types) {
+        params.set('types', types.join(','));
+      }
+      if (lastEventId) {
+        params.set('last_event_id', lastEventId);
+      }
+      source = new EventSource(`/api/events?${params}`);
+      Object.entries(handlers).forEach(([type, handler]) => {
+        source.addEventListener(type, (event) => {
+          lastEventId = event.lastEventId;
+          handler(JSON.parse(event.data));
+        });
+      });
+      source.onerror = () => {
+        source.close();
+        if (!closed) {
+          setTimeout(open, 3000);
+        }
+      };
+    };
+
+    open();
+    return {
+      close: () => {
+        closed = true;
+        if (source) {
+          source.close();
+        }
+      },
+    };
+  },
+};
+
 export {
   api as default,
   authAPI,
   enginesAPI,
   maintenanceAPI,
   alertsAPI,
-  dashboardAPI
+  dashboardAPI,
+  eventsAPI
 };
\ No newline at end of file
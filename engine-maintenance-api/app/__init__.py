@@ -3,14 +3,27 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 import os
-import tensorflow as tf
+from app.services.prediction_queue import PredictionQueue
+from app.utils.cache import ResponseCache
+from app.utils.db_routing import RoutingSession
+from app.utils.metrics import Metrics
+from app.utils.events import EventBroker
+from app.services.window_cache import WindowCache
+from app.services.anomaly_detector import AnomalyDetector
+from app.services.model_registry import ModelRegistry
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
+prediction_queue = PredictionQueue()
+response_cache = ResponseCache()
+window_cache = WindowCache()
+anomaly_detector = AnomalyDetector()
+metrics = Metrics()
+events = EventBroker()
 
-# Global variables for ML model
-ml_model = None
+# Predictors per engine model, loaded on first use
+model_registry = ModelRegistry()
 
 def create_app(config_name='default'):
     app = Flask(__name__)
@@ -20,20 +33,43 @@ def create_app(config_name='default'):
     from app.config import config
     app.config.from_object(config[config_name])
     
+    # Files the app writes at runtime default to the instance folder, not the source tree
+    for key, folder in (('ARCHIVE_DIR', 'archive'), ('SENSOR_STORE_DIR', 'sensor_store'),
+                        ('RESPONSE_CACHE_VERSION_DIR', 'cache_versions')):
+        if not app.config.get(key):
+            app.config[key] = os.path.join(app.instance_path, folder)
+    
     # Initialize extensions with app
     db.init_app(app)
     jwt.init_app(app)
+    prediction_queue.init_app(app)
+    response_cache.init_app(app)
+    window_cache.init_app(app)
+    anomaly_detector.init_app(app)
+    model_registry.init_app(app)
+    metrics.init_app(app)
+    events.init_app(app)
     
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.engines import engines_bp
     from app.routes.maintenance import maintenance_bp
     from app.routes.dashboard import dashboard_bp
+    from app.routes.predictions import predictions_bp
+    from app.routes.metrics import metrics_bp
+    from app.routes.events import events_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api')
     app.register_blueprint(engines_bp, url_prefix='/api')
     app.register_blueprint(maintenance_bp, url_prefix='/api')
     app.register_blueprint(dashboard_bp, url_prefix='/api')
+    app.register_blueprint(predictions_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    app.register_blueprint(events_bp, url_prefix='/api')
+    
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
     
     # Create tables and load model
     with app.app_context():
@@ -44,15 +80,12 @@ def create_app(config_name='default'):
     return app
 
 def load_ml_model():
-    global ml_model
-    
+    # Warm up the default model; per-engine-model ones load on first use
     try:
-        # Define the path to model
-        models_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ml_models')
-        model_path = os.path.join(models_dir, 'RNN_fwd.h5')
+        spec = model_registry.spec_for(None)
         
-        print(f"Loading model from: {model_path}")
-        ml_model = tf.keras.models.load_model(model_path)
+        print(f"Loading model from: {spec.path} ({spec.backend or model_registry.default_backend} backend)")
+        model_registry.get(None)
         print("Model loaded successfully")
     except Exception as e:
-        print(f"Error loading model: {str(e)}")
\ No newline at end of file
+        print(f"Error loading model: {str(e)}")
@@ -0,0 +1,298 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('score-fleet')
+@click.option('--engine-id', 'engine_ids', type=int, multiple=True,
+              help='Engine to score. Repeat for several engines; defaults to the whole fleet.')
+@click.option('--batch-size', type=int, default=None,
+              help='Maximum number of engines per model call.')
+@with_appcontext
+def score_fleet_command(engine_ids, batch_size):
+    """Re-score engines with one batched model pass."""
+    from flask import current_app
+    from app.services.prediction import run_batch_predictions
+
+    batch_size = batch_size or current_app.config['PREDICTION_BATCH_SIZE']
+    summary = run_batch_predictions(list(engine_ids) or None, batch_size=batch_size)
+    click.echo(f"Scored {summary['scored']} engines, skipped {summary['skipped']}, "
+               f"created {summary['alerts_created']} alerts")
+    if summary['missing']:
+        click.echo(f"No such engines: {', '.join(str(engine_id) for engine_id in summary['missing'])}")
+
+
+@click.command('calibrate-rul')
+@click.option('--min-samples', type=int, default=20,
+              help='Past predictions an engine model needs before it is calibrated.')
+@with_appcontext
+def calibrate_rul_command(min_samples):
+    """Fit per-model RUL calibration on past failures and refresh every estimate."""
+    from app.services.rul import fit_rul_calibration, refresh_rul
+
+    fitted = fit_rul_calibration(min_samples=min_samples)
+    for engine_model, (scale, spread, samples) in sorted(fitted.items()):
+        click.echo(f'{engine_model}: scale {scale:.3f}, spread {spread:.3f} from {samples} predictions')
+    if not fitted:
+        click.echo('No engine model has enough failure history; trend estimates stay uncalibrated')
+
+    methods = refresh_rul()
+    click.echo(f"Refreshed RUL for {methods['trend']} engines from their trend "
+               f"and {methods['heuristic']} from the latest probability")
+
+
+@click.command('export-model-weights')
+@with_appcontext
+def export_model_weights_command():
+    """Export RNN_fwd weights to .npz for the NumPy backend."""
+    import os
+    from flask import current_app
+    from app.services.model_backends import NumpyRNNBackend
+
+    model_path = current_app.config['ML_MODEL_PATH']
+    npz_path = os.path.splitext(model_path)[0] + '.npz'
+    NumpyRNNBackend.from_h5(model_path).export(npz_path)
+    click.echo(f'Exported weights to {npz_path}')
+
+
+@click.command('check-model-parity')
+@click.option('--samples', type=int, default=256, help='Number of random windows to compare.')
+@click.option('--tolerance', type=float, default=1e-5, help='Maximum allowed absolute difference.')
+@with_appcontext
+def check_model_parity_command(samples, tolerance):
+    """Compare NumPy backend predictions against the Keras model."""
+    import numpy as np
+    from flask import current_app
+    from app.services.model_backends import load_backend
+
+    model_path = current_app.config['ML_MODEL_PATH']
+    numpy_model = load_backend('numpy', model_path)
+    keras_model = load_backend('keras', model_path)
+
+    # Cover both raw s2 readings and normalised inputs
+    rng = np.random.default_rng(0)
+    X = np.concatenate([
+        rng.normal(642.7, 0.5, size=(samples, 50, 1)),
+        rng.normal(0.0, 1.0, size=(samples, 50, 1))
+    ]).astype(np.float32)
+
+    diff = np.abs(numpy_model.predict(X) - keras_model.predict(X)).max()
+    click.echo(f'Max absolute difference over {len(X)} windows: {diff:.3g}')
+    if diff > tolerance:
+        raise click.ClickException(f'NumPy backend differs from Keras by more than {tolerance}')
+
+
+@click.command('migrate-sensor-columns')
+@click.option('--chunk-size', type=int, default=1000, help='Rows copied per UPDATE batch.')
+@click.option('--keep-json', is_flag=True, help='Keep the legacy sensor_data column after copying.')
+@with_appcontext
+def migrate_sensor_columns_command(chunk_size, keep_json):
+    """Copy sensor readings from the legacy JSON column into s1-s21."""
+    from app.utils.migrations import migrate_sensor_data_to_columns
+
+    copied = migrate_sensor_data_to_columns(chunk_size=chunk_size, keep_json=keep_json)
+    if copied is None:
+        click.echo('Sensor readings are already stored in typed columns')
+    else:
+        click.echo(f'Copied sensor readings for {copied} cycles')
+
+
+@click.command('rebuild-health')
+@with_appcontext
+def rebuild_health_command():
+    """Backfill the engine_health snapshot from cycle and alert history."""
+    from app.services.health import rebuild_engine_health
+
+    count = rebuild_engine_health()
+    click.echo(f'Rebuilt health snapshot for {count} engines')
+
+
+@click.command('rebuild-rollups')
+@click.option('--engine-id', 'engine_ids', type=int, multiple=True,
+              help='Engine to rebuild. Repeat for several engines; defaults to the whole fleet.')
+@with_appcontext
+def rebuild_rollups_command(engine_ids):
+    """Backfill the per-bucket sensor rollups behind the trends endpoint."""
+    from app.services.rollups import rebuild_rollups
+
+    count = rebuild_rollups(list(engine_ids) or None)
+    click.echo(f'Rebuilt trend rollups for {count} engines')
+
+
+@click.command('archive-cycles')
+@click.option('--older-than-days', type=int, default=None,
+              help='Archive cycles recorded more than this many days ago. Defaults to ARCHIVE_AFTER_DAYS.')
+@click.option('--keep-cycles', type=int, default=None,
+              help='Latest cycles per engine that always stay in the table. Defaults to ARCHIVE_KEEP_CYCLES.')
+@click.option('--engine-id', 'engine_ids', type=int, multiple=True,
+              help='Engine to archive. Repeat for several engines; defaults to the whole fleet.')
+@click.option('--dry-run', is_flag=True, help='Only report how many cycles would be archived.')
+@with_appcontext
+def archive_cycles_command(older_than_days, keep_cycles, engine_ids, dry_run):
+    """Move old cycle history out of engine_cycle into compressed archive files."""
+    from datetime import datetime, timedelta
+    from app.services.archive import archive_cycles
+
+    before = datetime.utcnow() - timedelta(days=older_than_days) if older_than_days is not None else None
+    summary = archive_cycles(before=before, keep_cycles=keep_cycles, engine_ids=list(engine_ids) or None,
+                             dry_run=dry_run)
+    if dry_run:
+        click.echo(f"Would archive {summary['cycles']} cycles of {summary['engines']} engines")
+    else:
+        click.echo(f"Archived {summary['cycles']} cycles of {summary['engines']} engines "
+                   f"({summary['bytes'] / 1e6:.1f} MB on disk)")
+
+
+@click.command('export-sensor-store')
+@click.option('--path', default=None, help='Store directory. Defaults to SENSOR_STORE_DIR.')
+@click.option('--engine-id', 'engine_ids', type=int, multiple=True,
+              help='Engine to update. Repeat for several engines; defaults to the whole fleet.')
+@click.option('--rebuild', is_flag=True, help='Rewrite the store from scratch (whole fleet), e.g. after a backfill.')
+@with_appcontext
+def export_sensor_store_command(path, engine_ids, rebuild):
+    """Append new cycles to the memory-mapped sensor store used for training."""
+    import time
+    from app.services.sensor_store import update_sensor_store
+
+    if rebuild and engine_ids:
+        raise click.UsageError('--rebuild covers the whole fleet and cannot be combined with --engine-id')
+
+    started = time.perf_counter()
+    summary = update_sensor_store(path, engine_ids=list(engine_ids) or None, rebuild=rebuild)
+    click.echo(f"Appended {summary['cycles']} cycles of {summary['engines']} engines "
+               f"({summary['rows']} rows allocated) in {time.perf_counter() - started:.1f}s")
+
+
+@click.command('create-indexes')
+@with_appcontext
+def create_indexes_command():
+    """Create any indexes declared on the models that the database lacks."""
+    from sqlalchemy import inspect
+    from app import db
+
+    inspector = inspect(db.engine)
+    created = 0
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                click.echo(f'Created {index.name}')
+                created += 1
+
+    click.echo(f'Created {created} indexes')
+
+
+@click.command('score-anomalies')
+@click.option('--engine-id', 'engine_ids', type=int, multiple=True,
+              help='Engine to back-score. Repeat for several engines; defaults to the whole fleet.')
+@click.option('--refit', is_flag=True, help='Rebuild the sensor baselines from the full history first.')
+@click.option('--chunk-size', type=int, default=5000, help='Cycles scored per UPDATE batch.')
+@with_appcontext
+def score_anomalies_command(engine_ids, refit, chunk_size):
+    """Back-score anomaly_score for historical cycles."""
+    from app.services.anomaly import fit_baselines, backscore_anomalies
+
+    if refit:
+        for engine_model, count in sorted(fit_baselines(chunk_size=chunk_size).items()):
+            click.echo(f'Fitted {engine_model} baseline on {count} cycles')
+
+    scored = backscore_anomalies(list(engine_ids) or None, chunk_size=chunk_size)
+    click.echo(f'Scored {scored} cycles')
+
+
+@click.command('seed-fixtures')
+@click.option('--engines', type=int, default=1000, help='Number of engines to create.')
+@click.option('--cycles', type=int, default=200, help='Cycles per engine.')
+@click.option('--seed', type=int, default=0, help='Random seed.')
+@with_appcontext
+def seed_fixtures_command(engines, cycles, seed):
+    """Fill an empty database with a synthetic fleet."""
+    import time
+    from app.models.engine import Engine
+    from app.utils.fixtures import seed_fleet
+
+    if Engine.query.first() is not None:
+        raise click.ClickException('The database already has engines; seed an empty one')
+
+    started = time.perf_counter()
+    created = seed_fleet(engines=engines, cycles=cycles, seed=seed)
+    click.echo(f"Created {created['engines']} engines, {created['cycles']} cycles, "
+               f"{created['maintenance']} maintenance records and {created['alerts']} alerts "
+               f"in {time.perf_counter() - started:.1f}s")
+
+
+@click.command('ingest')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['json', 'ndjson', 'csv', 'cmapss']), default=None,
+              help='Input format; detected from the file when omitted.')
+@click.option('--workers', type=int, default=None,
+              help='Loader processes, each owning a share of the engines (default: up to 4); '
+                   '0 loads in this process.')
+@click.option('--batch-size', type=int, default=5000, help='Records per transaction.')
+@click.option('--engine-offset', type=int, default=0,
+              help='Added to every engine id, e.g. to load several C-MAPSS subsets side by side.')
+@click.option('--create-engines', is_flag=True, help='Create engines that do not exist yet.')
+@click.option('--engine-model', default=None, help='Model of the engines created by --create-engines.')
+@click.option('--checkpoint', 'checkpoint_path', default=None,
+              help='Checkpoint file; defaults to a file under the instance folder\'s ingest/ directory.')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint and start from the beginning.')
+@click.option('--no-score', is_flag=True, help='Skip the batched prediction pass after loading.')
+@click.option('--rescore', is_flag=True,
+              help='Run the prediction pass for the loaded engines even if the file was already loaded.')
+@with_appcontext
+def ingest_command(path, fmt, workers, batch_size, engine_offset, create_engines, engine_model,
+                   checkpoint_path, restart, no_score, rescore):
+    """Bulk-load cycles from a JSON, NDJSON, CSV or C-MAPSS file."""
+    import os
+    import time
+    from flask import current_app
+    from app.services.backfill import IngestError, ingest_file, default_checkpoint_path
+    from app.services.prediction import run_batch_predictions
+
+    def report(summary):
+        click.echo(f"{summary['rows']} rows loaded ({summary['rows_per_second']:.0f} rows/s), "
+                   f"{summary['skipped']} skipped, at byte {summary['offset']}")
+
+    workers = min(4, os.cpu_count() or 1) if workers is None else workers
+    checkpoint_path = checkpoint_path or default_checkpoint_path(path)
+    try:
+        summary = ingest_file(path, fmt=fmt, workers=workers, batch_size=batch_size,
+                              checkpoint_path=checkpoint_path, restart=restart, engine_offset=engine_offset,
+                              create_engines=create_engines, engine_model=engine_model,
+                              chunk_size=current_app.config['CYCLE_BULK_CHUNK_SIZE'], progress=report)
+    except IngestError as e:
+        raise click.ClickException(str(e))
+
+    if summary['already_complete']:
+        click.echo(f"{path} is already loaded according to {checkpoint_path}; pass --restart to load it again")
+        if not rescore:
+            return
+    else:
+        if summary['resumed_from']:
+            click.echo(f"Resumed from byte {summary['resumed_from']}")
+        click.echo(f"Loaded {summary['rows']} rows for {len(summary['engines'])} engines in "
+                   f"{summary['elapsed']:.1f}s ({summary['rows_per_second']:.0f} rows/s), "
+                   f"skipped {summary['skipped']} existing rows")
+
+    if no_score or not summary['engines']:
+        return
+    started = time.perf_counter()
+    scored = run_batch_predictions(summary['engines'], batch_size=current_app.config['PREDICTION_BATCH_SIZE'])
+    click.echo(f"Scored {scored['scored']} engines, skipped {scored['skipped']}, "
+               f"created {scored['alerts_created']} alerts in {time.perf_counter() - started:.1f}s")
+
+
+def register_commands(app):
+    app.cli.add_command(score_fleet_command)
+    app.cli.add_command(calibrate_rul_command)
+    app.cli.add_command(export_model_weights_command)
+    app.cli.add_command(check_model_parity_command)
+    app.cli.add_command(migrate_sensor_columns_command)
+    app.cli.add_command(rebuild_health_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(archive_cycles_command)
+    app.cli.add_command(export_sensor_store_command)
+    app.cli.add_command(create_indexes_command)
+    app.cli.add_command(score_anomalies_command)
+    app.cli.add_command(seed_fixtures_command)
+    app.cli.add_command(ingest_command)
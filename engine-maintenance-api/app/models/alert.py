@@ -15,6 +15,13 @@ class Alert(db.Model):
     engine = db.relationship('Engine', backref=db.backref('alerts', lazy=True))
     user = db.relationship('User', backref=db.backref('resolved_alerts', lazy=True))
     
+    __table_args__ = (
+        # Open-alert lookups per engine (dedup before creating, resolution, counts)
+        db.Index('ix_alert_engine_type_resolved', 'engine_id', 'alert_type', 'resolved'),
+        # Alert lists filtered by resolved, newest first, with keyset pagination
+        db.Index('ix_alert_resolved_created_at', 'resolved', 'created_at', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,38 @@
+from app import db
+from datetime import datetime
+
+class CycleArchive(db.Model):
+    """
+    One archived segment of an engine's cycle history: a compressed .npz file
+    under ARCHIVE_DIR holding every column of the cycles first_cycle..last_cycle
+    that were moved out of engine_cycle.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    engine_id = db.Column(db.Integer, db.ForeignKey('engine.id'), nullable=False)
+    first_cycle = db.Column(db.Integer, nullable=False)
+    last_cycle = db.Column(db.Integer, nullable=False)
+    cycle_count = db.Column(db.Integer, nullable=False)
+    first_timestamp = db.Column(db.DateTime)
+    last_timestamp = db.Column(db.DateTime)
+    path = db.Column(db.String(255), nullable=False)  # Relative to ARCHIVE_DIR
+    size_bytes = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Segments of an engine in cycle order, for reads over a cycle range
+        db.Index('ix_cycle_archive_engine_cycle', 'engine_id', 'first_cycle'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'engine_id': self.engine_id,
+            'first_cycle': self.first_cycle,
+            'last_cycle': self.last_cycle,
+            'cycle_count': self.cycle_count,
+            'first_timestamp': self.first_timestamp.isoformat() if self.first_timestamp else None,
+            'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp else None,
+            'path': self.path,
+            'size_bytes': self.size_bytes,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,19 @@
+from app import db
+from datetime import datetime
+
+class SensorBaseline(db.Model):
+    """Running mean and variance of the 21 sensors for one engine model"""
+    engine_model = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, default=0)
+    mean = db.Column(db.JSON)  # Per-sensor running mean, s1-s21
+    m2 = db.Column(db.JSON)  # Per-sensor sum of squared deviations (Welford)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'engine_model': self.engine_model,
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
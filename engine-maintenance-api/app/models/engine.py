@@ -1,6 +1,8 @@
 from app import db
 from datetime import datetime
-from sqlalchemy.dialects.mysql import JSON
+
+SETTING_KEYS = ['setting1', 'setting2', 'setting3']
+SENSOR_KEYS = [f's{i}' for i in range(1, 22)]
 
 class Engine(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,6 +15,13 @@ class Engine(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Fleet list filters
+        db.Index('ix_engine_status', 'status'),
+        db.Index('ix_engine_model', 'model'),
+        db.Index('ix_engine_aircraft_id', 'aircraft_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -37,8 +46,28 @@ class EngineCycle(db.Model):
     setting2 = db.Column(db.Float)
     setting3 = db.Column(db.Float)
     
-    # Sensor readings (s1-s21)
-    sensor_data = db.Column(JSON)  # Store all 21 sensor readings as JSON
+    # Sensor readings (s1-s21), one typed column per sensor
+    s1 = db.Column(db.Float)
+    s2 = db.Column(db.Float)
+    s3 = db.Column(db.Float)
+    s4 = db.Column(db.Float)
+    s5 = db.Column(db.Float)
+    s6 = db.Column(db.Float)
+    s7 = db.Column(db.Float)
+    s8 = db.Column(db.Float)
+    s9 = db.Column(db.Float)
+    s10 = db.Column(db.Float)
+    s11 = db.Column(db.Float)
+    s12 = db.Column(db.Float)
+    s13 = db.Column(db.Float)
+    s14 = db.Column(db.Float)
+    s15 = db.Column(db.Float)
+    s16 = db.Column(db.Float)
+    s17 = db.Column(db.Float)
+    s18 = db.Column(db.Float)
+    s19 = db.Column(db.Float)
+    s20 = db.Column(db.Float)
+    s21 = db.Column(db.Float)
     
     # Predictions (updated after processing)
     rul = db.Column(db.Float, nullable=True)  # Remaining useful life
@@ -48,9 +77,20 @@ class EngineCycle(db.Model):
     engine = db.relationship('Engine', backref=db.backref('cycles', lazy=True))
     
     __table_args__ = (
+        # Also serves "latest cycles for an engine" (engine_id = ? ORDER BY cycle DESC)
         db.UniqueConstraint('engine_id', 'cycle', name='unique_engine_cycle'),
     )
     
+    @property
+    def sensor_data(self):
+        """All 21 sensor readings as a dict keyed s1-s21"""
+        return {key: getattr(self, key) for key in SENSOR_KEYS}
+    
+    @sensor_data.setter
+    def sensor_data(self, readings):
+        for key in SENSOR_KEYS:
+            setattr(self, key, readings.get(key))
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,29 @@
+from app import db
+from datetime import datetime
+
+class EngineHealth(db.Model):
+    """Per-engine snapshot of the latest cycle, prediction and open alerts"""
+    engine_id = db.Column(db.Integer, db.ForeignKey('engine.id'), primary_key=True)
+    latest_cycle_id = db.Column(db.Integer, nullable=True)
+    latest_cycle = db.Column(db.Integer, nullable=True)
+    rul = db.Column(db.Float, nullable=True)
+    failure_probability = db.Column(db.Float, nullable=True)
+    open_alerts = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    engine = db.relationship('Engine', backref=db.backref('health', uselist=False, lazy=True))
+    
+    __table_args__ = (
+        # Attention-needed counts and critical engine lists
+        db.Index('ix_engine_health_failure_probability', 'failure_probability'),
+    )
+    
+    def to_dict(self):
+        return {
+            'engine_id': self.engine_id,
+            'latest_cycle': self.latest_cycle,
+            'rul': self.rul,
+            'failure_probability': self.failure_probability,
+            'open_alerts': self.open_alerts,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
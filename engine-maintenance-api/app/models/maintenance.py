@@ -1,6 +1,5 @@
 from app import db
 from datetime import datetime
-from sqlalchemy.dialects.mysql import JSON
 
 class Maintenance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -11,12 +10,19 @@ class Maintenance(db.Model):
     start_date = db.Column(db.DateTime)
     end_date = db.Column(db.DateTime, nullable=True)
     cycle_count = db.Column(db.Integer)
-    parts_replaced = db.Column(JSON, nullable=True)
+    parts_replaced = db.Column(db.JSON, nullable=True)
     notes = db.Column(db.Text, nullable=True)
     
     engine = db.relationship('Engine', backref=db.backref('maintenance_records', lazy=True))
     technician = db.relationship('User', backref=db.backref('maintenance_performed', lazy=True))
     
+    __table_args__ = (
+        # Maintenance history per engine, newest first
+        db.Index('ix_maintenance_engine_start_date', 'engine_id', 'start_date'),
+        # Recent maintenance across the fleet
+        db.Index('ix_maintenance_start_date', 'start_date'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,32 @@
+import uuid
+from app import db
+from datetime import datetime
+
+class PredictionJob(db.Model):
+    """A pending or finished prediction run for one engine"""
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    # No foreign key: the job outlives a deleted engine
+    engine_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, skipped, failed
+    requests = db.Column(db.Integer, default=1)  # Number of enqueue calls coalesced into this job
+    error = db.Column(db.Text, nullable=True)  # Why the job failed or was skipped
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # History pruning keeps the newest PREDICTION_JOB_HISTORY jobs
+        db.Index('ix_prediction_job_created_at', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'engine_id': self.engine_id,
+            'status': self.status,
+            'requests': self.requests,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,32 @@
+from app import db
+from datetime import datetime
+
+# Cycles per bucket, finest first
+ROLLUP_RESOLUTIONS = (10, 100, 1000)
+
+class CycleRollup(db.Model):
+    """Per-sensor min, max and sum of one engine's cycles in one bucket"""
+    engine_id = db.Column(db.Integer, db.ForeignKey('engine.id'), primary_key=True)
+    resolution = db.Column(db.Integer, primary_key=True)  # Cycles per bucket
+    bucket = db.Column(db.Integer, primary_key=True)  # Covers cycles bucket * resolution + 1 .. (bucket + 1) * resolution
+    cycle_count = db.Column(db.Integer, default=0)
+    counts = db.Column(db.JSON)  # Per-sensor number of non-NULL readings, s1-s21
+    min = db.Column(db.JSON)
+    max = db.Column(db.JSON)
+    total = db.Column(db.JSON)  # Per-sensor sum; mean is total / counts
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'engine_id': self.engine_id,
+            'resolution': self.resolution,
+            'bucket': self.bucket,
+            'first_cycle': self.bucket * self.resolution + 1,
+            'last_cycle': (self.bucket + 1) * self.resolution,
+            'cycle_count': self.cycle_count,
+            'counts': self.counts,
+            'min': self.min,
+            'max': self.max,
+            'total': self.total,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,42 @@
+from app import db
+from datetime import datetime
+
+class RulEstimate(db.Model):
+    """Latest remaining useful life estimate of one engine, with its confidence interval"""
+    engine_id = db.Column(db.Integer, db.ForeignKey('engine.id'), primary_key=True)
+    cycle = db.Column(db.Integer)  # Latest predicted cycle the estimate is anchored to
+    rul = db.Column(db.Float)
+    rul_lower = db.Column(db.Float, nullable=True)
+    rul_upper = db.Column(db.Float, nullable=True)
+    slope = db.Column(db.Float, nullable=True)  # Failure probability gained per cycle
+    method = db.Column(db.String(20))  # trend, heuristic
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'engine_id': self.engine_id,
+            'cycle': self.cycle,
+            'rul': self.rul,
+            'rul_lower': self.rul_lower,
+            'rul_upper': self.rul_upper,
+            'slope': self.slope,
+            'method': self.method,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class RulCalibration(db.Model):
+    """Correction of trend RUL estimates for one engine model, fitted on past failures"""
+    engine_model = db.Column(db.String(50), primary_key=True)
+    scale = db.Column(db.Float, default=1.0)  # Observed RUL / estimated RUL (least squares)
+    spread = db.Column(db.Float, default=0.0)  # Standard deviation of the relative error after scaling
+    samples = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'engine_model': self.engine_model,
+            'scale': self.scale,
+            'spread': self.spread,
+            'samples': self.samples,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
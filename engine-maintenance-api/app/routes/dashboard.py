@@ -1,39 +1,41 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
-from app.models.engine import Engine, EngineCycle
+from app import db, response_cache, events
+from app.models.engine import Engine
 from app.models.alert import Alert
-from app.models.user import User
 from app.models.maintenance import Maintenance
-from sqlalchemy import desc
+from app.models.health import EngineHealth
+from app.services.health import refresh_engine_health
+from sqlalchemy import desc, or_, and_
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
+# Cached, so read from the primary: a lagging replica would refill the cache with stale data
+@response_cache.cached('dashboard')
 def get_dashboard_data():
     # Summary statistics
     total_engines = Engine.query.count()
     active_engines = Engine.query.filter_by(status='active').count()
     maintenance_engines = Engine.query.filter_by(status='maintenance').count()
     
-    # Engines needing attention (probability > 0.5)
-    attention_needed_count = db.session.query(Engine).\
-        join(EngineCycle, Engine.id == EngineCycle.engine_id).\
-        filter(EngineCycle.failure_probability > 0.5).\
-        distinct(Engine.id).count()
+    # Engines needing attention (latest probability > 0.5)
+    attention_needed_count = EngineHealth.query.\
+        filter(EngineHealth.failure_probability > 0.5).count()
     
     # Recent alerts
-    recent_alerts = Alert.query.filter_by(resolved=False).order_by(desc(Alert.created_at)).limit(10).all()
+    recent_alerts = Alert.query.options(joinedload(Alert.engine)).\
+        filter_by(resolved=False).order_by(desc(Alert.created_at)).limit(10).all()
     alerts_data = []
     
     for alert in recent_alerts:
-        engine = Engine.query.get(alert.engine_id)
         alerts_data.append({
             'id': alert.id,
             'engine_id': alert.engine_id,
-            'engine_serial': engine.serial_number,
+            'engine_serial': alert.engine.serial_number,
             'alert_type': alert.alert_type,
             'message': alert.message,
             'created_at': alert.created_at.isoformat()
@@ -42,45 +44,37 @@ def get_dashboard_data():
     # Get engines requiring immediate attention (failure probability > 0.8)
     critical_engines_data = []
     
-    # Create a subquery to get the latest cycle for each engine
-    latest_cycles = db.session.query(
-        EngineCycle.engine_id,
-        db.func.max(EngineCycle.cycle).label('max_cycle')
-    ).group_by(EngineCycle.engine_id).subquery()
-    
-    # Join with the EngineCycle table to get the actual cycle data
-    critical_engines = db.session.query(Engine, EngineCycle).\
-        join(latest_cycles, Engine.id == latest_cycles.c.engine_id).\
-        join(EngineCycle, (EngineCycle.engine_id == latest_cycles.c.engine_id) & 
-             (EngineCycle.cycle == latest_cycles.c.max_cycle)).\
-        filter(EngineCycle.failure_probability > 0.8).\
-        order_by(desc(EngineCycle.failure_probability)).\
+    # Read the latest cycle for each engine from the health snapshot
+    critical_engines = db.session.query(Engine, EngineHealth).\
+        join(EngineHealth, Engine.id == EngineHealth.engine_id).\
+        filter(EngineHealth.failure_probability > 0.8).\
+        order_by(desc(EngineHealth.failure_probability)).\
         limit(5).all()
     
-    for engine, cycle in critical_engines:
+    for engine, health in critical_engines:
         critical_engines_data.append({
             'id': engine.id,
             'serial_number': engine.serial_number,
             'aircraft_id': engine.aircraft_id,
-            'failure_probability': cycle.failure_probability,
-            'current_cycle': cycle.cycle,
-            'rul': cycle.rul
+            'failure_probability': health.failure_probability,
+            'current_cycle': health.latest_cycle,
+            'rul': health.rul
         })
     
     # Recent maintenance activities
     recent_maintenance = Maintenance.query.\
+        options(joinedload(Maintenance.engine), joinedload(Maintenance.technician)).\
         order_by(desc(Maintenance.start_date)).\
         limit(5).all()
     
     maintenance_data = []
     for record in recent_maintenance:
-        engine = Engine.query.get(record.engine_id)
-        technician = User.query.get(record.performed_by) if record.performed_by else None
+        technician = record.technician
         
         maintenance_data.append({
             'id': record.id,
             'engine_id': record.engine_id,
-            'engine_serial': engine.serial_number,
+            'engine_serial': record.engine.serial_number,
             'maintenance_type': record.maintenance_type,
             'description': record.description,
             'start_date': record.start_date.isoformat() if record.start_date else None,
@@ -102,19 +96,50 @@ def get_dashboard_data():
 
 @dashboard_bp.route('/alerts', methods=['GET'])
 @jwt_required()
+# Cached, so read from the primary (see get_dashboard_data)
+@response_cache.cached('alerts')
 def get_alerts():
     # Get query parameters
     resolved = request.args.get('resolved', 'false').lower() == 'true'
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    if limit is not None:
+        if limit <= 0:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        limit = min(limit, 500)
+    
+    # Load engines (and resolvers) in the same query instead of one lookup per alert
+    query = Alert.query.options(joinedload(Alert.engine))
+    if resolved:
+        query = query.options(joinedload(Alert.user))
+    query = query.filter_by(resolved=resolved)
+    
+    # Keyset pagination: continue after the (created_at, id) of the last alert seen
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = cursor.rsplit('|', 1)
+            cursor_created_at = datetime.fromisoformat(cursor_created_at)
+            cursor_id = int(cursor_id)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        query = query.filter(or_(
+            Alert.created_at < cursor_created_at,
+            and_(Alert.created_at == cursor_created_at, Alert.id < cursor_id)
+        ))
+    
+    query = query.order_by(desc(Alert.created_at), desc(Alert.id))
+    if limit:
+        query = query.limit(limit)
     
-    alerts = Alert.query.filter_by(resolved=resolved).order_by(desc(Alert.created_at)).all()
+    alerts = query.all()
     result = []
     
     for alert in alerts:
-        engine = Engine.query.get(alert.engine_id)
         alert_data = {
             'id': alert.id,
             'engine_id': alert.engine_id,
-            'engine_serial': engine.serial_number,
+            'engine_serial': alert.engine.serial_number,
             'alert_type': alert.alert_type,
             'message': alert.message,
             'created_at': alert.created_at.isoformat(),
@@ -122,7 +147,7 @@ def get_alerts():
         }
         
         if resolved:
-            resolver = User.query.get(alert.resolved_by)
+            resolver = alert.user
             alert_data.update({
                 'resolved_by': resolver.username if resolver else None,
                 'resolved_at': alert.resolved_at.isoformat() if alert.resolved_at else None
@@ -130,7 +155,13 @@ def get_alerts():
         
         result.append(alert_data)
     
-    return jsonify(result), 200
+    # Hand out a cursor for the next page when the page is full
+    headers = {}
+    if limit and len(alerts) == limit:
+        last = alerts[-1]
+        headers['X-Next-Cursor'] = f'{last.created_at.isoformat()}|{last.id}'
+    
+    return jsonify(result), 200, headers
 
 @dashboard_bp.route('/alerts/<int:alert_id>', methods=['PUT'])
 @jwt_required()
@@ -147,7 +178,10 @@ def update_alert(alert_id):
         alert.resolved_by = current_user['user_id']
         alert.resolved_at = datetime.utcnow()
     
+    refresh_engine_health([alert.engine_id])
+    events.publish_on_commit('alert.updated', alert.to_dict())
     db.session.commit()
+    response_cache.invalidate('dashboard', 'alerts')
     
     return jsonify({
         'message': 'Alert updated successfully',
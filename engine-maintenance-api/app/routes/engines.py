@@ -1,43 +1,105 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
-from app.models.engine import Engine, EngineCycle
+from app import db, prediction_queue, response_cache, window_cache, anomaly_detector, model_registry, events
+from app.models.engine import Engine, EngineCycle, SENSOR_KEYS
 from app.models.alert import Alert
-from app.services.prediction import run_predictions
+from app.models.health import EngineHealth
+from app.services.health import refresh_engine_health
+from app.services.ingest import (
+    CycleValidationError, parse_cycle_payload, build_cycle_rows,
+    find_missing_engines, find_existing_cycles, bulk_insert_cycles
+)
+from app.services.export import EXPORT_FORMATS, iter_cycle_rows, format_rows
+from app.services.anomaly import load_engine_models, create_anomaly_alerts
+from app.services.rollups import update_rollups, choose_resolution, get_trend
+from app.models.rollup import CycleRollup, ROLLUP_RESOLUTIONS
+from app.models.rul import RulEstimate
+from app.models.archive import CycleArchive
+from app.services.archive import archived_max_cycles, delete_archive_files
+from app.utils.db_routing import use_replica
 from datetime import datetime
 
 engines_bp = Blueprint('engines', __name__)
 
+ENGINE_LIST_FIELDS = [
+    'id', 'serial_number', 'model', 'aircraft_id', 'total_cycles', 'status',
+    'installation_date', 'created_at', 'updated_at', 'alerts',
+    'latest_cycle', 'rul', 'failure_probability', 'maintenance_due'
+]
+
 @engines_bp.route('/engines', methods=['GET'])
 @jwt_required()
+@use_replica
 def get_engines():
-    engines = Engine.query.all()
-    result = []
+    # Optional query parameters
+    status = request.args.get('status')
+    model = request.args.get('model')
+    aircraft_id = request.args.get('aircraft_id')
+    page = request.args.get('page', type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    fields = request.args.get('fields')
+    
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in ENGINE_LIST_FIELDS]
+        if unknown:
+            return jsonify({'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+    
+    # Latest cycle, prediction and open alert count come from the health snapshot
+    query = db.session.query(
+        Engine,
+        EngineHealth.latest_cycle,
+        EngineHealth.rul,
+        EngineHealth.failure_probability,
+        EngineHealth.open_alerts
+    ).outerjoin(EngineHealth, Engine.id == EngineHealth.engine_id)
+    
+    # Apply filters if provided
+    if status:
+        query = query.filter(Engine.status == status)
+    
+    if model:
+        query = query.filter(Engine.model == model)
+    
+    if aircraft_id:
+        query = query.filter(Engine.aircraft_id == aircraft_id)
+    
+    query = query.order_by(Engine.id)
+    
+    headers = {}
+    if page:
+        page = max(1, page)
+        per_page = min(max(1, per_page), 500)
+        headers = {
+            'X-Total-Count': str(query.order_by(None).count()),
+            'X-Page': str(page),
+            'X-Per-Page': str(per_page)
+        }
+        query = query.offset((page - 1) * per_page).limit(per_page)
     
-    for engine in engines:
-        # Get the latest cycle data
-        latest_cycle = EngineCycle.query.filter_by(engine_id=engine.id).order_by(EngineCycle.cycle.desc()).first()
-        
-        # Count active alerts
-        active_alerts = Alert.query.filter_by(engine_id=engine.id, resolved=False).count()
-        
+    result = []
+    for engine, latest_cycle, rul, failure_probability, open_alerts in query.all():
         engine_data = engine.to_dict()
-        engine_data['alerts'] = active_alerts
+        engine_data['alerts'] = open_alerts or 0
         
-        if latest_cycle:
+        if latest_cycle is not None:
             engine_data.update({
-                'latest_cycle': latest_cycle.cycle,
-                'rul': latest_cycle.rul,
-                'failure_probability': latest_cycle.failure_probability,
-                'maintenance_due': latest_cycle.failure_probability > 0.7 if latest_cycle.failure_probability else False
+                'latest_cycle': latest_cycle,
+                'rul': rul,
+                'failure_probability': failure_probability,
+                'maintenance_due': failure_probability > 0.7 if failure_probability else False
             })
         
+        if fields:
+            engine_data = {field: engine_data[field] for field in fields if field in engine_data}
+        
         result.append(engine_data)
     
-    return jsonify(result), 200
+    return jsonify(result), 200, headers
 
 @engines_bp.route('/engines/<int:engine_id>', methods=['GET'])
 @jwt_required()
+@use_replica
 def get_engine(engine_id):
     engine = Engine.query.get_or_404(engine_id)
     
@@ -52,9 +114,12 @@ def get_engine(engine_id):
     maintenance_records = Maintenance.query.filter_by(engine_id=engine.id).all()
     maintenance_data = [record.to_dict() for record in maintenance_records]
     
+    rul_estimate = RulEstimate.query.get(engine.id)
+    
     result = engine.to_dict()
     result['cycles'] = cycles_data
     result['maintenance_history'] = maintenance_data
+    result['rul_estimate'] = rul_estimate.to_dict() if rul_estimate else None
     
     return jsonify(result), 200
 
@@ -94,7 +159,10 @@ def add_engine():
     )
     
     db.session.add(new_engine)
+    db.session.flush()
+    refresh_engine_health([new_engine.id])
     db.session.commit()
+    response_cache.invalidate('dashboard')
     
     return jsonify({
         'message': 'Engine added successfully',
@@ -121,7 +189,7 @@ def add_cycle_data(engine_id):
     
     # Check if cycle already exists for this engine
     existing_cycle = EngineCycle.query.filter_by(engine_id=engine_id, cycle=cycle).first()
-    if existing_cycle:
+    if existing_cycle or cycle <= archived_max_cycles([engine_id]).get(engine_id, 0):
         return jsonify({
             'error': f'Cycle data for this engine already exists for cycle {cycle}. Try using cycle {engine.total_cycles + 1}.'
         }), 409
@@ -143,6 +211,12 @@ def add_cycle_data(engine_id):
         sensor_data=sensor_data
     )
     
+    # Score the readings against the engine model's sensor baseline
+    scored_row = {'engine_id': engine_id, 'cycle': cycle, **sensor_data}
+    engine_models = {engine_id: engine.model}
+    anomalies = anomaly_detector.score_rows([scored_row], engine_models)
+    new_cycle.anomaly_score = scored_row['anomaly_score']
+    
     db.session.add(new_cycle)
     
     # Update engine's total cycles if new cycle is higher
@@ -150,25 +224,210 @@ def add_cycle_data(engine_id):
         engine.total_cycles = cycle
     
     try:
+        alerts_created = create_anomaly_alerts(anomalies)
+        update_rollups([scored_row])
+        refresh_engine_health([engine_id])
+        # Read before the commit expires them, saving two reloads
+        cycle_data = new_cycle.to_dict()
+        required = model_registry.spec_for(engine.model).window
         db.session.commit()
+        # Only stored readings feed the baseline
+        anomaly_detector.absorb([scored_row], engine_models)
+        anomaly_detector.flush()
+        response_cache.invalidate('dashboard')
+        if alerts_created:
+            response_cache.invalidate('alerts')
+        window_cache.append(engine_id, cycle, sensor_data['s2'])
         
-        # Run predictions asynchronously if we have enough data
-        cycles_count = EngineCycle.query.filter_by(engine_id=engine_id).count()
-        if cycles_count >= 50:  # We need at least 50 cycles for prediction
-            run_predictions(engine_id)
-            message = 'Cycle data added and predictions updated'
+        # Queue predictions in the background if we have enough data
+        job = None
+        cycles_count = len(window_cache.get(engine_id)[1])
+        if cycles_count >= min(required, window_cache.size):  # We need a full window for prediction
+            job = prediction_queue.enqueue(engine_id)
+            message = 'Cycle data added and predictions queued'
         else:
-            message = f'Cycle data added. Need {50 - cycles_count} more cycles for predictions'
+            message = f'Cycle data added. Need {required - cycles_count} more cycles for predictions'
         
         return jsonify({
             'message': message,
-            'cycle': new_cycle.to_dict()
+            'cycle': cycle_data,
+            'prediction_job': job.to_dict() if job else None
         }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to save cycle data: {str(e)}'}), 500
+
+@engines_bp.route('/engines/<int:engine_id>/cycles/bulk', methods=['POST'])
+@jwt_required()
+def add_engine_cycles_bulk(engine_id):
+    Engine.query.get_or_404(engine_id)
+    return _ingest_cycle_batch(engine_id)
+
+@engines_bp.route('/cycles/bulk', methods=['POST'])
+@jwt_required()
+def add_fleet_cycles_bulk():
+    return _ingest_cycle_batch()
+
+def _ingest_cycle_batch(engine_id=None):
+    """Validate, insert and score a batch of cycles sent as a JSON array or NDJSON"""
+    try:
+        records = parse_cycle_payload(request.get_data(), request.content_type)
+        rows = build_cycle_rows(records, engine_id=engine_id)
+    except CycleValidationError as e:
+        return jsonify({'error': str(e), 'details': e.errors}), 400
+
+    if not rows:
+        return jsonify({'error': 'No cycle records provided'}), 400
+
+    max_rows = current_app.config['CYCLE_BULK_MAX_ROWS']
+    if len(rows) > max_rows:
+        return jsonify({'error': f'Batch too large. Send at most {max_rows} cycles per request'}), 413
+
+    missing_engines = find_missing_engines(rows)
+    if missing_engines:
+        return jsonify({'error': f'Unknown engine ids: {", ".join(str(i) for i in sorted(missing_engines))}'}), 404
+
+    # Detect cycles that are already stored with a single query for the whole batch
+    skip_duplicates = request.args.get('skip_duplicates', 'false').lower() == 'true'
+    existing = find_existing_cycles(rows)
+    if existing and not skip_duplicates:
+        return jsonify({
+            'error': 'Cycle data already exists for some records. Retry with skip_duplicates=true to ignore them.',
+            'duplicates': [{'engine_id': e, 'cycle': c} for e, c in sorted(existing)]
+        }), 409
+    rows = [row for row in rows if (row['engine_id'], row['cycle']) not in existing]
     
+    # Score every row before the insert so anomaly_score is written with it
+    engine_models = load_engine_models(row['engine_id'] for row in rows)
+    anomalies = anomaly_detector.score_rows(rows, engine_models)
+
+    chunk_size = request.args.get('chunk_size', current_app.config['CYCLE_BULK_CHUNK_SIZE'], type=int)
+    chunk_size = max(1, chunk_size)
+
+    try:
+        inserted = bulk_insert_cycles(rows, chunk_size=chunk_size)
+        alerts_created = create_anomaly_alerts(anomalies)
+        update_rollups(rows)
+        refresh_engine_health(inserted.keys())
+        db.session.commit()
+        anomaly_detector.absorb(rows, engine_models)
+        anomaly_detector.flush()
+        response_cache.invalidate('dashboard')
+        if alerts_created:
+            response_cache.invalidate('alerts')
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to save cycle data: {str(e)}'}), 500
+
+    for affected_engine_id in inserted:
+        window_cache.extend(affected_engine_id, [(row['cycle'], row['s2']) for row in rows
+                                                 if row['engine_id'] == affected_engine_id])
+
+    # Queue one prediction per affected engine instead of one per row
+    jobs = {str(affected_engine_id): prediction_queue.enqueue(affected_engine_id).id
+            for affected_engine_id in inserted}
+
+    return jsonify({
+        'message': f'{len(rows)} cycle records added',
+        'inserted': len(rows),
+        'skipped': len(existing),
+        'anomalies': len(anomalies),
+        'engines': {str(k): v for k, v in inserted.items()},
+        'prediction_jobs': jobs
+    }), 201
+
+
+@engines_bp.route('/engines/<int:engine_id>/cycles/export', methods=['GET'])
+@jwt_required()
+@use_replica
+def export_engine_cycles(engine_id):
+    Engine.query.get_or_404(engine_id)
+    return _export_cycles([engine_id], f'engine_{engine_id}_cycles')
+
+@engines_bp.route('/cycles/export', methods=['GET'])
+@jwt_required()
+@use_replica
+def export_fleet_cycles():
+    engine_ids = request.args.get('engine_ids')
+    if engine_ids:
+        try:
+            engine_ids = [int(engine_id) for engine_id in engine_ids.split(',')]
+        except ValueError:
+            return jsonify({'error': 'engine_ids must be a comma-separated list of integers'}), 400
+    else:
+        engine_ids = None
     
+    return _export_cycles(engine_ids, 'fleet_cycles')
+
+def _export_cycles(engine_ids, filename):
+    """Stream cycle history as NDJSON, CSV or C-MAPSS text"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Invalid format. Must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    from_cycle = request.args.get('from_cycle', type=int)
+    to_cycle = request.args.get('to_cycle', type=int)
+    
+    sensors = request.args.get('sensors')
+    if sensors:
+        sensors = [sensor.strip() for sensor in sensors.split(',') if sensor.strip()]
+        unknown = [sensor for sensor in sensors if sensor not in SENSOR_KEYS]
+        if unknown:
+            return jsonify({'error': f'Unknown sensors: {", ".join(unknown)}'}), 400
+    else:
+        sensors = SENSOR_KEYS
+    
+    rows = iter_cycle_rows(engine_ids, from_cycle=from_cycle, to_cycle=to_cycle, sensors=sensors,
+                           chunk_size=current_app.config['CYCLE_EXPORT_CHUNK_SIZE'])
+    extension = 'txt' if fmt == 'cmapss' else fmt
+    
+    return Response(
+        stream_with_context(format_rows(rows, fmt, sensors=sensors)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}.{extension}'}
+    )
+
+
+@engines_bp.route('/engines/<int:engine_id>/trends', methods=['GET'])
+@jwt_required()
+@use_replica
+def get_engine_trends(engine_id):
+    engine = Engine.query.get_or_404(engine_id)
+    
+    sensors = request.args.get('sensors') or 's2'
+    sensors = [sensor.strip() for sensor in sensors.split(',') if sensor.strip()]
+    unknown = [sensor for sensor in sensors if sensor not in SENSOR_KEYS]
+    if unknown:
+        return jsonify({'error': f'Unknown sensors: {", ".join(unknown)}'}), 400
+    
+    from_cycle = request.args.get('from_cycle', type=int)
+    to_cycle = request.args.get('to_cycle', type=int)
+    max_points = min(request.args.get('points', current_app.config['TREND_DEFAULT_POINTS'], type=int),
+                     current_app.config['TREND_MAX_POINTS'])
+    if max_points <= 0:
+        return jsonify({'error': 'points must be a positive integer'}), 400
+    
+    # bucket=auto picks the finest resolution that fits the point budget
+    bucket = request.args.get('bucket', 'auto')
+    resolutions = (1,) + ROLLUP_RESOLUTIONS
+    if bucket == 'auto':
+        resolution = choose_resolution(from_cycle or 1, to_cycle or engine.total_cycles or 0, max_points)
+    elif bucket.isdigit() and int(bucket) in resolutions:
+        resolution = int(bucket)
+    else:
+        return jsonify({'error': f'Invalid bucket. Must be auto or one of: {", ".join(str(r) for r in resolutions)}'}), 400
+    
+    trend = get_trend(engine_id, sensors, resolution, from_cycle=from_cycle, to_cycle=to_cycle)
+    
+    return jsonify({
+        'engine_id': engine_id,
+        'bucket': resolution,
+        'sensors': sensors,
+        'points': len(trend['cycle']),
+        **trend
+    }), 200
+
+
 @engines_bp.route('/engines/<int:engine_id>', methods=['PUT'])
 @jwt_required()
 def update_engine(engine_id):
@@ -201,6 +460,7 @@ def update_engine(engine_id):
             return jsonify({'error': 'Invalid date format for installation_date. Use ISO format (YYYY-MM-DD)'}), 400
     
     db.session.commit()
+    response_cache.invalidate('dashboard')
     
     return jsonify({
         'message': 'Engine updated successfully',
@@ -231,9 +491,19 @@ def delete_engine(engine_id):
         from app.models.alert import Alert
         Alert.query.filter_by(engine_id=engine_id).delete()
         
+        # Delete the health snapshot and trend rollups
+        EngineHealth.query.filter_by(engine_id=engine_id).delete()
+        CycleRollup.query.filter_by(engine_id=engine_id).delete()
+        RulEstimate.query.filter_by(engine_id=engine_id).delete()
+        CycleArchive.query.filter_by(engine_id=engine_id).delete()
+        
         # Finally delete the engine
         db.session.delete(engine)
+        events.publish_on_commit('engine.deleted', {'engine_id': engine_id})
         db.session.commit()
+        delete_archive_files(engine_id)
+        response_cache.invalidate('dashboard', 'alerts')
+        window_cache.invalidate(engine_id)
         
         return jsonify({'message': 'Engine and all associated data deleted successfully'}), 200
     except Exception as e:
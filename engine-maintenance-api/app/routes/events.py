@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+from flask import Blueprint, request, jsonify, Response, current_app
+from flask_jwt_extended import (
+    jwt_required, get_jwt, get_jwt_identity, get_jwt_request_location, create_access_token
+)
+from app import events, jwt
+from app.utils.events import format_comment
+
+events_bp = Blueprint('events', __name__)
+
+EVENT_TYPES = {'alert', 'maintenance', 'engine'}
+EVENTS_SCOPE = 'events'
+
+@jwt.token_verification_loader
+def check_token_scope(jwt_header, jwt_data):
+    # Stream tokens end up in URLs, so they are short-lived and open nothing else
+    return jwt_data.get('scope') != EVENTS_SCOPE or request.endpoint == 'events.stream_events'
+
+@events_bp.route('/events/token', methods=['POST'])
+@jwt_required()
+def create_events_token():
+    seconds = current_app.config['EVENTS_TOKEN_SECONDS']
+    token = create_access_token(identity=get_jwt_identity(), additional_claims={'scope': EVENTS_SCOPE},
+                                expires_delta=timedelta(seconds=seconds))
+    return jsonify({'token': token, 'expires_in': seconds}), 200
+
+@events_bp.route('/events', methods=['GET'])
+# EventSource cannot set headers, so browsers pass a token from
+# POST /api/events/token as ?jwt=
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    if get_jwt_request_location() == 'query_string' and get_jwt().get('scope') != EVENTS_SCOPE:
+        return jsonify({'error': 'Pass a token from POST /api/events/token in the query string'}), 401
+
+    types = None
+    if request.args.get('types'):
+        types = {name.strip() for name in request.args['types'].split(',') if name.strip()}
+        unknown = types - EVENT_TYPES
+        if unknown:
+            return jsonify({'error': f'Unknown event types: {", ".join(sorted(unknown))}'}), 400
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    stream = events.subscribe(last_event_id, types)
+    if stream is None:
+        return jsonify({'error': 'Too many event stream clients'}), 503, {'Retry-After': '30'}
+
+    heartbeat = events.heartbeat
+    stream_seconds = events.stream_seconds
+
+    def generate():
+        # Runs after the request context is gone, so it must not touch the
+        # database. Streams end after stream_seconds; EventSource reconnects
+        # with Last-Event-ID, which re-checks the token and frees idle threads.
+        yield 'retry: 3000\n' + format_comment('connected')
+        deadline = time.monotonic() + stream_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            batch = stream.get(min(heartbeat, remaining))
+            yield ''.join(event.encoded for event in batch) if batch else format_comment('keepalive')
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+    })
+    # Called when the client disconnects (noticed at the next write) or the stream ends
+    response.call_on_close(lambda: events.unsubscribe(stream))
+    return response
@@ -1,15 +1,18 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
+from app import db, response_cache, events
 from app.models.maintenance import Maintenance
 from app.models.engine import Engine
 from app.models.alert import Alert
+from app.services.health import refresh_engine_health
+from app.utils.db_routing import use_replica
 from datetime import datetime
 
 maintenance_bp = Blueprint('maintenance', __name__)
 
 @maintenance_bp.route('/maintenance', methods=['GET'])
 @jwt_required()
+@use_replica
 def get_all_maintenance():
     # Optional query parameters
     engine_id = request.args.get('engine_id', type=int)
@@ -33,6 +36,7 @@ def get_all_maintenance():
 
 @maintenance_bp.route('/maintenance/<int:maintenance_id>', methods=['GET'])
 @jwt_required()
+@use_replica
 def get_maintenance(maintenance_id):
     maintenance = Maintenance.query.get_or_404(maintenance_id)
     return jsonify(maintenance.to_dict()), 200
@@ -92,8 +96,14 @@ def add_maintenance():
             alert.resolved = True
             alert.resolved_by = current_user['user_id']
             alert.resolved_at = datetime.utcnow()
+            events.publish_on_commit('alert.updated', alert.to_dict())
+        
+        refresh_engine_health([engine.id])
     
+    db.session.flush()
+    events.publish_on_commit('maintenance.created', new_maintenance.to_dict())
     db.session.commit()
+    response_cache.invalidate('dashboard', 'alerts')
     
     return jsonify({
         'message': 'Maintenance record added successfully',
@@ -135,6 +145,9 @@ def update_maintenance(maintenance_id):
                     alert.resolved = True
                     alert.resolved_by = current_user['user_id']
                     alert.resolved_at = datetime.utcnow()
+                    events.publish_on_commit('alert.updated', alert.to_dict())
+                
+                refresh_engine_health([maintenance.engine_id])
         except ValueError:
             return jsonify({'error': 'Invalid date format for end_date. Use ISO format (YYYY-MM-DD)'}), 400
     
@@ -144,7 +157,9 @@ def update_maintenance(maintenance_id):
     if 'parts_replaced' in data:
         maintenance.parts_replaced = data['parts_replaced']
     
+    events.publish_on_commit('maintenance.updated', maintenance.to_dict())
     db.session.commit()
+    response_cache.invalidate('dashboard', 'alerts')
     
     return jsonify({
         'message': 'Maintenance record updated successfully',
@@ -0,0 +1,13 @@
+from flask import Blueprint, request, jsonify, current_app, Response
+from app import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Scrapers do not log in; protect the endpoint with a static token if set
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
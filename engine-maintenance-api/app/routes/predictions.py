@@ -0,0 +1,60 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import db, model_registry
+from app.models.prediction_job import PredictionJob
+from app.services.prediction import run_batch_predictions
+
+predictions_bp = Blueprint('predictions', __name__)
+
+@predictions_bp.route('/predictions/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_prediction_job(job_id):
+    job = db.session.get(PredictionJob, job_id)
+
+    if job is None:
+        return jsonify({'error': 'Prediction job not found'}), 404
+
+    return jsonify(job.to_dict()), 200
+
+@predictions_bp.route('/predictions/models', methods=['GET'])
+@jwt_required()
+def get_prediction_models():
+    loaded = set(model_registry.loaded())
+
+    return jsonify({
+        engine_model: dict(spec.to_dict(), loaded=spec.path in loaded)
+        for engine_model, spec in model_registry.specs().items()
+    }), 200
+
+@predictions_bp.route('/predictions/rescore', methods=['POST'])
+@jwt_required()
+def rescore_fleet():
+    current_user = get_jwt_identity()
+
+    # Check if user has admin role
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'Unauthorized. Only admin can re-score the fleet'}), 403
+
+    data = request.get_json(silent=True) or {}
+    engine_ids = data.get('engine_ids')
+    if engine_ids is not None and (not isinstance(engine_ids, list) or
+                                   not all(_is_int(engine_id) for engine_id in engine_ids)):
+        return jsonify({'error': 'engine_ids must be a list of engine ids'}), 400
+
+    batch_size = data.get('batch_size', current_app.config['PREDICTION_BATCH_SIZE'])
+    if not _is_int(batch_size) or batch_size < 1:
+        return jsonify({'error': 'batch_size must be a positive integer'}), 400
+
+    try:
+        summary = run_batch_predictions(engine_ids, batch_size=batch_size)
+    except Exception as e:
+        return jsonify({'error': f'Failed to re-score fleet: {str(e)}'}), 500
+
+    return jsonify({
+        'message': 'Fleet re-scored successfully',
+        'summary': summary
+    }), 200
+
+def _is_int(value):
+    # JSON true/false arrive as bool, which is a subclass of int
+    return isinstance(value, int) and not isinstance(value, bool)
@@ -0,0 +1,150 @@
+import numpy as np
+from sqlalchemy import select, update
+from app import db, anomaly_detector, events
+from app.models.engine import Engine, EngineCycle, SENSOR_KEYS
+from app.models.alert import Alert
+from app.models.baseline import SensorBaseline
+from app.services.anomaly_detector import RunningStats, UNKNOWN_MODEL
+
+
+def load_engine_models(engine_ids):
+    """Return {engine_id: engine model} for the given engines"""
+    engine_ids = set(engine_ids)
+    if not engine_ids:
+        return {}
+    return dict(db.session.query(Engine.id, Engine.model).filter(Engine.id.in_(engine_ids)).all())
+
+
+def load_all_engine_models():
+    """Return {engine_id: engine model} for the whole fleet"""
+    return dict(db.session.query(Engine.id, Engine.model).all())
+
+
+def create_anomaly_alerts(anomalies):
+    """
+    Add an anomaly_detected alert for each engine in anomalies that has no
+    open one. The caller commits; an alert.created event is sent for each
+    alert once it does.
+
+    Args:
+        anomalies (list): Anomalous rows returned by AnomalyDetector.score_rows
+
+    Returns:
+        int: Number of alerts created
+    """
+    # Keep the worst reading per engine
+    worst = {}
+    for anomaly in anomalies:
+        current = worst.get(anomaly['engine_id'])
+        if current is None or anomaly['score'] > current['score']:
+            worst[anomaly['engine_id']] = anomaly
+    if not worst:
+        return 0
+
+    already_alerted = {engine_id for (engine_id,) in db.session.query(Alert.engine_id).filter(
+        Alert.engine_id.in_(worst.keys()),
+        Alert.alert_type == 'anomaly_detected',
+        Alert.resolved == False).distinct()}
+
+    engines = Engine.query.filter(Engine.id.in_(set(worst) - already_alerted)).all()
+    alerts = []
+    for engine in engines:
+        anomaly = worst[engine.id]
+        alerts.append(Alert(
+            engine_id=engine.id,
+            alert_type='anomaly_detected',
+            message=f"Engine {engine.serial_number} cycle {anomaly['cycle']}: "
+                    f"{', '.join(anomaly['sensors'])} readings deviate from the {engine.model or 'fleet'} baseline "
+                    f"(z-score {anomaly['score']:.1f})."
+        ))
+
+    db.session.add_all(alerts)
+    db.session.flush()
+    for alert in alerts:
+        events.publish_on_commit('alert.created', alert.to_dict())
+    return len(alerts)
+
+
+def fit_baselines(chunk_size=5000):
+    """
+    Rebuild every engine model's baseline from the full cycle history,
+    replacing the stored ones.
+
+    Returns:
+        dict: Number of readings absorbed per engine model
+    """
+    engine_models = load_all_engine_models()
+    fitted = {}
+    for ids, engine_id_column, X in _iter_sensor_chunks(None, chunk_size):
+        complete = ~np.isnan(X).any(axis=1)
+        for engine_model, mask in _group_by_model(engine_id_column, engine_models).items():
+            fitted.setdefault(engine_model, RunningStats()).update(X[mask & complete])
+
+    SensorBaseline.query.delete()
+    for engine_model, stats in fitted.items():
+        db.session.add(SensorBaseline(engine_model=engine_model, count=stats.count,
+                                      mean=stats.mean.tolist(), m2=stats.m2.tolist()))
+    db.session.commit()
+    anomaly_detector.reset()
+
+    return {engine_model: stats.count for engine_model, stats in fitted.items()}
+
+
+def backscore_anomalies(engine_ids=None, chunk_size=5000):
+    """
+    Write anomaly_score for historical cycles against the current baselines.
+
+    Cycles are read in primary key chunks, scored with one vectorised pass
+    per engine model and written back with a bulk UPDATE per chunk. No alerts
+    are raised for history.
+
+    Args:
+        engine_ids (list): Engines to score, or None for the whole fleet
+        chunk_size (int): Cycles read and written per round trip
+
+    Returns:
+        int: Number of cycles scored
+    """
+    engine_models = load_engine_models(engine_ids) if engine_ids is not None else load_all_engine_models()
+    stats = {engine_model: anomaly_detector.baseline(engine_model)
+             for engine_model in {model or UNKNOWN_MODEL for model in engine_models.values()}}
+
+    scored = 0
+    for ids, engine_id_column, X in _iter_sensor_chunks(engine_ids, chunk_size):
+        scores = np.full(len(ids), np.nan)
+        for engine_model, mask in _group_by_model(engine_id_column, engine_models).items():
+            model_stats = stats[engine_model]
+            if model_stats.count >= anomaly_detector.min_samples:
+                scores[mask] = model_stats.zscores(X[mask], anomaly_detector.min_std).max(axis=1)
+
+        db.session.execute(update(EngineCycle), [
+            {'id': int(cycle_id), 'anomaly_score': None if np.isnan(score) else float(score)}
+            for cycle_id, score in zip(ids, scores)
+        ])
+        db.session.commit()
+        scored += int((~np.isnan(scores)).sum())
+
+    return scored
+
+
+def _group_by_model(engine_id_column, engine_models):
+    """Boolean row masks per engine model"""
+    row_models = np.array([engine_models.get(int(engine_id)) or UNKNOWN_MODEL for engine_id in engine_id_column])
+    return {str(engine_model): row_models == engine_model for engine_model in np.unique(row_models)}
+
+
+def _iter_sensor_chunks(engine_ids, chunk_size):
+    """Yield (ids, engine_ids, X) arrays for cycles in primary key order"""
+    columns = [EngineCycle.id, EngineCycle.engine_id] + [getattr(EngineCycle, key) for key in SENSOR_KEYS]
+    last_id = 0
+    while True:
+        stmt = select(*columns).where(EngineCycle.id > last_id)
+        if engine_ids is not None:
+            stmt = stmt.where(EngineCycle.engine_id.in_(engine_ids))
+        rows = db.session.execute(stmt.order_by(EngineCycle.id).limit(chunk_size)).all()
+        if not rows:
+            return
+
+        data = np.array(rows, dtype=np.float64)  # NULL readings become NaN
+        last_id = int(data[-1, 0])
+        yield data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2:]
@@ -0,0 +1,255 @@
+import threading
+import numpy as np
+from sqlalchemy import select
+
+UNKNOWN_MODEL = 'unknown'
+SENSOR_COUNT = 21  # s1-s21
+
+
+class RunningStats:
+    """
+    Running mean and variance of the sensor vector.
+
+    A single reading is a Welford update; a batch is reduced to its own
+    (count, mean, M2) and merged with the parallel form of the same update
+    (Chan et al.), so both cost O(sensors) per reading.
+    """
+
+    def __init__(self, count=0, mean=None, m2=None, size=SENSOR_COUNT):
+        self.count = count
+        self.mean = np.zeros(size) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.m2 = np.zeros(size) if m2 is None else np.asarray(m2, dtype=np.float64)
+
+    def update(self, X):
+        """Absorb readings of shape (n, sensors)"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if len(X) == 0:
+            return
+        batch_mean = X.mean(axis=0)
+        self.merge(len(X), batch_mean, ((X - batch_mean) ** 2).sum(axis=0))
+
+    def merge(self, count, mean, m2):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    def copy(self):
+        return RunningStats(self.count, self.mean.copy(), self.m2.copy())
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return np.sqrt(self.m2 / (self.count - 1))
+
+    def zscores(self, X, min_std=1e-3):
+        """Absolute z-scores of readings of shape (n, sensors); missing readings score 0"""
+        z = np.abs(np.asarray(X, dtype=np.float64) - self.mean) / np.maximum(self.std, min_std)
+        return np.nan_to_num(z, nan=0.0)
+
+
+class AnomalyDetector:
+    """
+    Scores cycles against a per-engine-model sensor baseline.
+
+    Each reading gets the largest absolute z-score across the 21 sensors,
+    measured against the running mean/variance of its engine model. Readings
+    above the threshold are not absorbed, so a failing engine cannot drag the
+    baseline towards itself.
+
+    Scoring and learning are separate steps: score_rows() runs before the
+    insert and absorb() only once the rows are committed, so readings that
+    were rolled back never reach the baseline.
+
+    Baselines are kept in process memory and persisted in the sensor_baseline
+    table. Readings absorbed since the last sync are flushed as a delta that
+    is merged into the stored row, which also picks up what other worker
+    processes have added. Processes flush with force=True when they exit.
+    """
+
+    FLUSH_ATTEMPTS = 5  # Per model, when other processes keep winning the write
+
+    def __init__(self, app=None):
+        self.threshold = 5.0
+        self.min_samples = 100
+        self.min_std = 1e-3
+        self.flush_rows = 500
+        self._stats = {}  # engine model -> RunningStats used for scoring
+        self._pending = {}  # engine model -> RunningStats absorbed since the last flush
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.threshold = app.config.get('ANOMALY_Z_THRESHOLD', 5.0)
+        self.min_samples = app.config.get('ANOMALY_MIN_SAMPLES', 100)
+        self.min_std = app.config.get('ANOMALY_MIN_STD', 1e-3)
+        self.flush_rows = app.config.get('ANOMALY_BASELINE_FLUSH_ROWS', 500)
+        app.extensions['anomaly_detector'] = self
+
+    def _get_stats(self, engine_model):
+        stats = self._stats.get(engine_model)
+        if stats is None:
+            stats = self._load(engine_model)
+            self._stats[engine_model] = stats
+        return stats
+
+    @staticmethod
+    def _load(engine_model):
+        from app.models.baseline import SensorBaseline
+
+        baseline = SensorBaseline.query.get(engine_model)
+        if baseline is None or not baseline.count:
+            return RunningStats()
+        return RunningStats(baseline.count, baseline.mean, baseline.m2)
+
+    def score_rows(self, rows, engine_models):
+        """
+        Score cycle rows in place against the current baselines, without
+        changing them; call absorb() once the rows are committed.
+
+        Args:
+            rows (list): Row dicts with s1-s21; 'anomaly_score' is set on each
+                (None while the model's baseline has too few readings)
+            engine_models (dict): Engine model per engine id
+
+        Returns:
+            list: One dict per anomalous row with engine_id, cycle, score and
+                the sensors that deviate most
+        """
+        from app.models.engine import SENSOR_KEYS
+
+        groups = {}
+        for row in rows:
+            engine_model = engine_models.get(row['engine_id']) or UNKNOWN_MODEL
+            groups.setdefault(engine_model, []).append(row)
+
+        anomalies = []
+        with self._lock:
+            for engine_model, group in groups.items():
+                stats = self._get_stats(engine_model)
+                if stats.count < self.min_samples:
+                    for row in group:
+                        row['anomaly_score'] = None
+                    continue
+
+                X = np.array([[row[key] for key in SENSOR_KEYS] for row in group], dtype=np.float64)
+                z = stats.zscores(X, self.min_std)
+                scores = z.max(axis=1)
+                for index, row in enumerate(group):
+                    row['anomaly_score'] = float(scores[index])
+                    if scores[index] > self.threshold:
+                        top = [i for i in np.argsort(z[index])[::-1][:3] if z[index, i] > self.threshold]
+                        anomalies.append({
+                            'engine_id': row['engine_id'],
+                            'cycle': row['cycle'],
+                            'score': float(scores[index]),
+                            'sensors': [SENSOR_KEYS[i] for i in top]
+                        })
+
+        return anomalies
+
+    def absorb(self, rows, engine_models):
+        """
+        Fold committed rows scored by score_rows() into the baselines, one
+        merge per engine model. Anomalous rows are left out.
+
+        Args:
+            rows (list): Row dicts with s1-s21 and anomaly_score
+            engine_models (dict): Engine model per engine id
+        """
+        from app.models.engine import SENSOR_KEYS
+
+        groups = {}
+        for row in rows:
+            score = row.get('anomaly_score')
+            if score is not None and score > self.threshold:
+                continue
+            engine_model = engine_models.get(row['engine_id']) or UNKNOWN_MODEL
+            groups.setdefault(engine_model, []).append(row)
+
+        with self._lock:
+            for engine_model, group in groups.items():
+                X = np.array([[row[key] for key in SENSOR_KEYS] for row in group], dtype=np.float64)
+                # Incomplete legacy rows are scored but never absorbed
+                X = X[~np.isnan(X).any(axis=1)]
+                self._get_stats(engine_model).update(X)
+                self._pending.setdefault(engine_model, RunningStats()).update(X)
+
+    def flush(self, force=False):
+        """
+        Merge pending readings into the stored baselines and commit. Only
+        models with at least ANOMALY_BASELINE_FLUSH_ROWS pending readings are
+        written unless force is set. If the write fails it is rolled back and
+        logged, and the readings stay pending for the next flush.
+        """
+        from flask import current_app
+        from app import db
+
+        with self._lock:
+            for engine_model, pending in list(self._pending.items()):
+                if pending.count == 0 or (not force and pending.count < self.flush_rows):
+                    continue
+
+                stored = None
+                for attempt in range(self.FLUSH_ATTEMPTS):
+                    try:
+                        stored = self._save(engine_model, pending)
+                        if stored is not None:
+                            db.session.commit()
+                            break
+                    except Exception:
+                        stored = None
+                        if attempt == self.FLUSH_ATTEMPTS - 1:
+                            current_app.logger.exception('Could not save the %s anomaly baseline', engine_model)
+                    # Start over from the row another process wrote
+                    db.session.rollback()
+                if stored is None:
+                    continue
+
+                self._stats[engine_model] = stored
+                del self._pending[engine_model]
+
+    @staticmethod
+    def _save(engine_model, pending):
+        """
+        Merge pending readings into a model's stored baseline.
+
+        The write only applies if the stored count is still the one that was
+        read (counts only grow), so a concurrent flush from another process
+        cannot be overwritten even where SELECT ... FOR UPDATE does not lock
+        (SQLite). Returns the merged RunningStats, or None when another
+        process got there first and the merge has to be redone.
+        """
+        from app import db
+        from app.models.baseline import SensorBaseline
+
+        table = SensorBaseline.__table__
+        row = db.session.execute(select(table.c.count, table.c.mean, table.c.m2).where(
+            table.c.engine_model == engine_model).with_for_update()).first()
+        stored = RunningStats(row.count or 0, row.mean, row.m2) if row is not None else RunningStats()
+        stored.merge(pending.count, pending.mean, pending.m2)
+
+        values = {'count': stored.count, 'mean': stored.mean.tolist(), 'm2': stored.m2.tolist()}
+        if row is None:
+            # Fails on the primary key if another process inserted it meanwhile
+            db.session.execute(table.insert().values(engine_model=engine_model, **values))
+            return stored
+        result = db.session.execute(table.update().where(
+            table.c.engine_model == engine_model, table.c.count == row.count).values(**values))
+        return stored if result.rowcount == 1 else None
+
+    def baseline(self, engine_model):
+        """A copy of the baseline currently used for an engine model"""
+        with self._lock:
+            return self._get_stats(engine_model).copy()
+
+    def reset(self):
+        """Forget in-memory baselines so they are reloaded from the database"""
+        with self._lock:
+            self._stats.clear()
+            self._pending.clear()
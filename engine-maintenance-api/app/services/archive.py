@@ -0,0 +1,256 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, delete, case
+from app import db
+from app.models.engine import Engine, EngineCycle, SENSOR_KEYS, SETTING_KEYS
+from app.models.archive import CycleArchive
+
+FLOAT_COLUMNS = SETTING_KEYS + SENSOR_KEYS + ['rul', 'failure_probability', 'anomaly_score']
+ARCHIVE_COLUMNS = ['cycle', 'timestamp'] + FLOAT_COLUMNS
+
+
+def archive_cycles(before=None, keep_cycles=None, engine_ids=None, min_cycles=None, dry_run=False,
+                   chunk_size=500):
+    """
+    Move old cycles out of engine_cycle into compressed per-engine archive
+    segments, keeping the hot table small.
+
+    For each engine the cycles up to the newest one recorded before `before`
+    are moved, except that the latest keep_cycles cycles and the cycles
+    holding the last RUL_HISTORY_POINTS predictions always stay in the table
+    (prediction windows and RUL trends read them). Engines with fewer than
+    min_cycles cycles to move are left alone so segments do not get tiny.
+    Trend rollups are not touched.
+
+    Each segment is written to disk before its rows are deleted, and the
+    delete and the cycle_archive row commit together, so an interrupted run
+    at worst leaves an unreferenced file behind.
+
+    Args:
+        before (datetime): Archive cycles recorded before this time, defaults
+            to ARCHIVE_AFTER_DAYS ago
+        keep_cycles (int): Latest cycles per engine that are never archived,
+            defaults to ARCHIVE_KEEP_CYCLES
+        engine_ids (list): Engines to archive, or None for the whole fleet
+        min_cycles (int): Smallest segment worth writing, defaults to
+            ARCHIVE_MIN_CYCLES
+        dry_run (bool): Only count what would be archived
+
+    Returns:
+        dict: Number of engines, cycles and bytes archived
+    """
+    config = current_app.config
+    if before is None:
+        before = datetime.utcnow() - timedelta(days=config['ARCHIVE_AFTER_DAYS'])
+    keep_cycles = config['ARCHIVE_KEEP_CYCLES'] if keep_cycles is None else keep_cycles
+    min_cycles = config['ARCHIVE_MIN_CYCLES'] if min_cycles is None else min_cycles
+
+    if engine_ids is None:
+        engine_ids = [engine_id for (engine_id,) in db.session.query(Engine.id).order_by(Engine.id).all()]
+    engine_ids = list(engine_ids)
+
+    summary = {'engines': 0, 'cycles': 0, 'bytes': 0}
+    for start in range(0, len(engine_ids), chunk_size):
+        cutoffs = _plan_cutoffs(engine_ids[start:start + chunk_size], before, keep_cycles,
+                                config['RUL_HISTORY_POINTS'])
+
+        if dry_run:
+            counts = _count_cycles(cutoffs)
+            movable = [count for count in counts.values() if count >= min_cycles]
+            summary['engines'] += len(movable)
+            summary['cycles'] += sum(movable)
+            continue
+
+        for engine_id, cutoff in cutoffs.items():
+            segment = _archive_engine(engine_id, cutoff, min_cycles)
+            if segment is not None:
+                summary['engines'] += 1
+                summary['cycles'] += segment.cycle_count
+                summary['bytes'] += segment.size_bytes
+
+    return summary
+
+
+def find_segments(engine_ids=None, from_cycle=None, to_cycle=None):
+    """
+    Archive segments overlapping a cycle range, in (engine_id, cycle) order.
+
+    Returned as a list so callers can stream other queries afterwards
+    without keeping this one open.
+    """
+    query = CycleArchive.query
+    if engine_ids is not None:
+        query = query.filter(CycleArchive.engine_id.in_(engine_ids))
+    if from_cycle is not None:
+        query = query.filter(CycleArchive.last_cycle >= from_cycle)
+    if to_cycle is not None:
+        query = query.filter(CycleArchive.first_cycle <= to_cycle)
+    return query.order_by(CycleArchive.engine_id, CycleArchive.first_cycle).all()
+
+
+def iter_segment_arrays(segments, columns=ARCHIVE_COLUMNS, from_cycle=None, to_cycle=None):
+    """
+    Read archived columns one segment at a time. Only the requested columns
+    are decompressed.
+
+    Args:
+        segments (list): CycleArchive rows from find_segments
+        columns (list): Names from ARCHIVE_COLUMNS
+        from_cycle (int): First cycle to include
+        to_cycle (int): Last cycle to include
+
+    Yields:
+        tuple: (engine_id, dict of column name -> ndarray); NULL readings are
+            NaN and NULL timestamps NaT
+    """
+    archive_dir = current_app.config['ARCHIVE_DIR']
+    for segment in segments:
+        with np.load(os.path.join(archive_dir, segment.path)) as data:
+            cycles = data['cycle']
+            selected = np.ones(len(cycles), dtype=bool)
+            if from_cycle is not None:
+                selected &= cycles >= from_cycle
+            if to_cycle is not None:
+                selected &= cycles <= to_cycle
+            yield segment.engine_id, {column: data[column][selected] for column in columns}
+
+
+def iter_archived_rows(segments, columns=ARCHIVE_COLUMNS, from_cycle=None, to_cycle=None):
+    """
+    Archived cycles as row dicts shaped like engine_cycle rows (engine_id,
+    then the requested columns, None for NULL), in (engine_id, cycle) order.
+    """
+    columns = ['cycle'] + [column for column in columns if column != 'cycle']
+    for engine_id, arrays in iter_segment_arrays(segments, columns, from_cycle, to_cycle):
+        values = [_to_python(arrays[column]) for column in columns]
+        for row in zip(*values):
+            yield {'engine_id': engine_id, **dict(zip(columns, row))}
+
+
+def archived_max_cycles(engine_ids):
+    """
+    The last archived cycle of each engine. Cycles up to it are treated as
+    already stored, so archived history cannot be ingested a second time.
+    """
+    return dict(db.session.query(CycleArchive.engine_id, db.func.max(CycleArchive.last_cycle)).filter(
+        CycleArchive.engine_id.in_(engine_ids)).group_by(CycleArchive.engine_id).all())
+
+
+def delete_archive_files(engine_id):
+    """Remove an engine's archive files, after its cycle_archive rows are deleted"""
+    shutil.rmtree(os.path.join(current_app.config['ARCHIVE_DIR'], _engine_path(engine_id)), ignore_errors=True)
+
+
+def _plan_cutoffs(engine_ids, before, keep_cycles, history_points):
+    """The last cycle to archive per engine, for engines with anything to archive"""
+    hot = db.session.query(
+        EngineCycle.engine_id,
+        db.func.max(EngineCycle.cycle),
+        db.func.max(case((EngineCycle.timestamp < before, EngineCycle.cycle)))
+    ).filter(EngineCycle.engine_id.in_(engine_ids)).group_by(EngineCycle.engine_id).all()
+
+    # Oldest of each engine's last history_points predictions
+    row_number = db.func.row_number().over(
+        partition_by=EngineCycle.engine_id,
+        order_by=EngineCycle.cycle.desc()
+    ).label('row_number')
+    ranked = db.session.query(EngineCycle.engine_id, EngineCycle.cycle, row_number).filter(
+        EngineCycle.engine_id.in_(engine_ids), EngineCycle.failure_probability != None).subquery()
+    oldest_kept_prediction = dict(db.session.query(ranked.c.engine_id, db.func.min(ranked.c.cycle)).filter(
+        ranked.c.row_number <= history_points).group_by(ranked.c.engine_id).all())
+
+    cutoffs = {}
+    for engine_id, max_cycle, newest_old_cycle in hot:
+        if newest_old_cycle is None:
+            continue
+        cutoff = min(newest_old_cycle, max_cycle - keep_cycles)
+        if engine_id in oldest_kept_prediction:
+            cutoff = min(cutoff, oldest_kept_prediction[engine_id] - 1)
+        if cutoff > 0:
+            cutoffs[engine_id] = cutoff
+    return cutoffs
+
+
+def _count_cycles(cutoffs):
+    counts = {}
+    for engine_id, cutoff in cutoffs.items():
+        counts[engine_id] = db.session.query(db.func.count(EngineCycle.id)).filter(
+            EngineCycle.engine_id == engine_id, EngineCycle.cycle <= cutoff).scalar()
+    return counts
+
+
+def _archive_engine(engine_id, cutoff, min_cycles):
+    columns = [getattr(EngineCycle, column) for column in ARCHIVE_COLUMNS]
+    # Locks the range until the delete commits, so no cycle can land in it meanwhile
+    rows = db.session.execute(select(*columns).where(
+        EngineCycle.engine_id == engine_id, EngineCycle.cycle <= cutoff).order_by(EngineCycle.cycle).
+        with_for_update()).all()
+    if len(rows) < min_cycles:
+        return None
+
+    # Plain tuples first: NumPy probes each Row for the array interface, which is slow
+    rows = [tuple(row) for row in rows]
+    cycles = np.array([row[0] for row in rows], dtype=np.int64)
+    timestamps = np.array([row[1] for row in rows], dtype='datetime64[us]')
+    values = np.array([row[2:] for row in rows], dtype=np.float64)  # NULL becomes NaN
+    arrays = {'cycle': cycles, 'timestamp': timestamps}
+    arrays.update({column: np.ascontiguousarray(values[:, i]) for i, column in enumerate(FLOAT_COLUMNS)})
+
+    first_cycle, last_cycle = int(cycles[0]), int(cycles[-1])
+    relative_path = os.path.join(_engine_path(engine_id), f'{first_cycle:08d}-{last_cycle:08d}.npz')
+    path = os.path.join(current_app.config['ARCHIVE_DIR'], relative_path)
+    size_bytes = _write_segment(path, arrays)
+
+    known = timestamps[~np.isnat(timestamps)]
+    segment = CycleArchive(
+        engine_id=engine_id,
+        first_cycle=first_cycle,
+        last_cycle=last_cycle,
+        cycle_count=len(rows),
+        first_timestamp=known.min().item() if len(known) else None,
+        last_timestamp=known.max().item() if len(known) else None,
+        path=relative_path,
+        size_bytes=size_bytes
+    )
+    try:
+        db.session.add(segment)
+        db.session.execute(delete(EngineCycle).where(
+            EngineCycle.engine_id == engine_id, EngineCycle.cycle <= last_cycle))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(path)
+        raise
+    return segment
+
+
+def _engine_path(engine_id):
+    # Sharded so no directory holds more than 1000 engines
+    return os.path.join(f'{engine_id // 1000:04d}', str(engine_id))
+
+
+def _write_segment(path, arrays):
+    """Write arrays to a compressed .npz atomically; returns its size in bytes"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return os.path.getsize(path)
+
+
+def _to_python(values):
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[us]').tolist()  # NaT becomes None
+    if values.dtype.kind == 'f':
+        return np.where(np.isnan(values), None, values).tolist()
+    return values.tolist()
@@ -0,0 +1,535 @@
+import codecs
+import csv
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import time
+from app import db, anomaly_detector, response_cache
+from app.models.engine import Engine, SENSOR_KEYS, SETTING_KEYS
+from app.services.ingest import (
+    CycleValidationError, build_cycle_rows, find_missing_engines, find_existing_cycles, bulk_insert_cycles
+)
+from app.services.anomaly import load_engine_models
+from app.services.rollups import update_rollups
+from app.services.health import refresh_engine_health
+
+INGEST_FORMATS = ('json', 'ndjson', 'csv', 'cmapss')
+
+# Columns of a C-MAPSS train/test file: unit, cycle, 3 settings, 21 sensors
+CMAPSS_COLUMNS = ['engine_id', 'cycle'] + SETTING_KEYS + SENSOR_KEYS
+
+_JSON_SEPARATORS = re.compile(r'[\s,\[]*')
+
+
+class IngestError(ValueError):
+    """Raised when a dataset file cannot be parsed or loaded"""
+
+
+def detect_format(path):
+    """Guess the format of a dataset file from its extension and first byte"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if extension == '.csv':
+        return 'csv'
+    if extension == '.json':
+        with open(path, 'rb') as f:
+            # A JSON array, or one object per line
+            head = f.read(4096).lstrip()
+        return 'json' if head.startswith(b'[') else 'ndjson'
+    return 'cmapss'
+
+
+def iter_records(path, fmt, offset=0, chunk_bytes=1 << 20):
+    """
+    Stream cycle records from a dataset file without reading it whole.
+
+    Supported formats are a JSON array of records (as in
+    engine_cycle_data.json), NDJSON, CSV with a header row (as written by the
+    export endpoints) and C-MAPSS text (space-separated "unit cycle settings
+    sensors", NaN for missing readings).
+
+    Args:
+        path (str): Dataset file
+        fmt (str): One of INGEST_FORMATS
+        offset (int): Byte offset to resume from; must be a value previously
+            yielded for the same file
+        chunk_bytes (int): Read size for JSON arrays
+
+    Yields:
+        tuple: (record dict, byte offset just past the record)
+    """
+    if fmt == 'json':
+        yield from _iter_json_array(path, offset, chunk_bytes)
+        return
+    if fmt not in INGEST_FORMATS:
+        raise IngestError(f'Unknown ingest format: {fmt}')
+
+    with open(path, 'rb') as f:
+        header = None
+        if fmt == 'csv':
+            header = [column.strip() for column in next(csv.reader([f.readline().decode('utf-8')]), [])]
+            offset = max(offset, f.tell())
+        f.seek(offset)
+        position = offset
+
+        for line in f:
+            start = position
+            position += len(line)
+            text = line.decode('utf-8').strip()
+            if not text:
+                continue
+
+            if fmt == 'ndjson':
+                try:
+                    record = json.loads(text)
+                except json.JSONDecodeError as e:
+                    raise IngestError(f'Invalid JSON at byte {start}: {str(e)}')
+            elif fmt == 'csv':
+                # Empty cells are missing readings
+                record = {column: value if value != '' else 'NaN'
+                          for column, value in zip(header, next(csv.reader([text])))}
+            else:
+                values = text.split()
+                if len(values) != len(CMAPSS_COLUMNS):
+                    raise IngestError(f'Expected {len(CMAPSS_COLUMNS)} columns at byte {start}, got {len(values)}')
+                record = dict(zip(CMAPSS_COLUMNS, values))
+
+            yield record, position
+
+
+def _iter_json_array(path, offset, chunk_bytes):
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        position = offset
+        buffer = ''
+        index = 0
+        eof = False
+
+        while True:
+            # Skip the opening bracket, commas and whitespace between records
+            skipped = _JSON_SEPARATORS.match(buffer, index).end()
+            position += len(buffer[index:skipped].encode('utf-8'))
+            index = skipped
+
+            if index < len(buffer):
+                if buffer[index] == ']':
+                    return
+                try:
+                    record, end = decoder.raw_decode(buffer, index)
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise IngestError(f'Invalid JSON at byte {position}: {str(e)}')
+                else:
+                    if not isinstance(record, dict):
+                        raise IngestError(f'Expected an array of cycle records, found {type(record).__name__} '
+                                          f'at byte {position}')
+                    position += len(buffer[index:end].encode('utf-8'))
+                    index = end
+                    yield record, position
+                    continue
+            elif eof:
+                return
+
+            # The next record is incomplete: read more
+            data = f.read(chunk_bytes)
+            eof = not data
+            buffer = buffer[index:] + utf8.decode(data, final=eof)
+            index = 0
+
+
+def load_records(records, create_engines=False, engine_model=None, chunk_size=500):
+    """
+    Validate and insert a batch of records in one transaction, without
+    predictions.
+
+    Cycles that are already stored are skipped, so a batch can be replayed
+    safely after an interruption. Readings are scored against the anomaly
+    baselines and folded into the trend rollups, and into the baselines once
+    committed, but no alerts are raised for history.
+
+    Args:
+        records (list): Cycle records from iter_records
+        create_engines (bool): Create engines the database does not have
+        engine_model (str): Model of the engines created
+        chunk_size (int): Maximum number of rows per INSERT statement
+
+    Returns:
+        tuple: (rows inserted per engine id, number of rows skipped)
+    """
+    try:
+        rows = build_cycle_rows(records)
+    except CycleValidationError as e:
+        raise IngestError(f'{str(e)}: {e.errors[:5]}')
+
+    # NaN readings (C-MAPSS, CSV) are stored as NULL
+    for row in rows:
+        for key in SETTING_KEYS + SENSOR_KEYS:
+            if math.isnan(row[key]):
+                row[key] = None
+
+    missing = find_missing_engines(rows)
+    if missing and not create_engines:
+        raise IngestError(f'Unknown engine ids: {", ".join(str(i) for i in sorted(missing))}')
+
+    try:
+        for engine_id in sorted(missing):
+            db.session.add(Engine(id=engine_id, serial_number=f'UNIT-{engine_id:06d}', model=engine_model,
+                                  total_cycles=0, status='active'))
+        db.session.flush()
+
+        existing = find_existing_cycles(rows)
+        rows = [row for row in rows if (row['engine_id'], row['cycle']) not in existing]
+        inserted = {}
+        if rows:
+            engine_models = load_engine_models(row['engine_id'] for row in rows)
+            anomaly_detector.score_rows(rows, engine_models)
+            inserted = bulk_insert_cycles(rows, chunk_size=chunk_size)
+            update_rollups(rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if rows:
+        anomaly_detector.absorb(rows, engine_models)
+        anomaly_detector.flush()
+
+    return inserted, len(existing)
+
+
+def default_checkpoint_path(path):
+    """
+    Where a load of `path` checkpoints unless told otherwise: the instance
+    folder's ingest/ directory, named after the file and a hash of its
+    absolute path, so datasets with the same name do not collide and
+    nothing is written next to the data.
+    """
+    from flask import current_app
+
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    return os.path.join(current_app.instance_path, 'ingest', f'{os.path.basename(path)}.{digest}.checkpoint.json')
+
+
+def ingest_file(path, fmt=None, workers=0, batch_size=5000, checkpoint_path=None, restart=False,
+                engine_offset=0, create_engines=False, engine_model=None, chunk_size=500,
+                progress=None, progress_interval=2.0):
+    """
+    Bulk-load a dataset file, partitioned by engine across worker processes.
+
+    Records are streamed from the file and routed to a worker by engine id,
+    so each engine's cycles, rollup buckets and total_cycles are only ever
+    written by one process. Every batch is committed on its own. The
+    checkpoint stores the byte offset before which every record is
+    committed; a rerun resumes from there, and batches committed past that
+    point are skipped as duplicates. Predictions are not run; score the
+    returned engines afterwards with one batched pass.
+
+    Args:
+        path (str): Dataset file
+        fmt (str): One of INGEST_FORMATS, or None to detect it
+        workers (int): Worker processes; 0 loads in this process
+        batch_size (int): Records per transaction
+        checkpoint_path (str): Checkpoint file, or None to disable resuming
+        restart (bool): Ignore an existing checkpoint
+        engine_offset (int): Added to every engine id (e.g. to load several
+            C-MAPSS subsets, whose units all start at 1)
+        create_engines (bool): Create engines the database does not have
+        engine_model (str): Model of the engines created
+        chunk_size (int): Maximum number of rows per INSERT statement
+        progress (callable): Called with the running summary every
+            progress_interval seconds
+
+    Returns:
+        dict: Summary with rows inserted and skipped, engine ids touched,
+            elapsed seconds and rows/s
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in INGEST_FORMATS:
+        raise IngestError(f'Unknown ingest format: {fmt}')
+
+    stat = os.stat(path)
+    state = {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'format': fmt,
+        'engine_offset': engine_offset,
+        'offset': 0,
+        'rows': 0,
+        'skipped': 0,
+        'engines': [],
+        'complete': False
+    }
+    checkpoint = _load_checkpoint(checkpoint_path) if checkpoint_path and not restart else None
+    if checkpoint is not None:
+        keys = ('path', 'size', 'mtime', 'format', 'engine_offset')
+        if any(checkpoint.get(key) != state[key] for key in keys):
+            raise IngestError(f'Checkpoint {checkpoint_path} belongs to another file or other options; '
+                              f'rerun with restart to start over')
+        state = checkpoint
+    resumed_from = state['offset']
+
+    engines = set(state['engines'])
+    already_complete = state['complete']
+    started = time.perf_counter()
+    loaded_rows = 0
+
+    def summary():
+        elapsed = time.perf_counter() - started
+        return {
+            'format': fmt,
+            'rows': state['rows'],
+            'skipped': state['skipped'],
+            'engines': sorted(engines),
+            'resumed_from': resumed_from,
+            'offset': state['offset'],
+            'complete': state['complete'],
+            'already_complete': already_complete,
+            'elapsed': elapsed,
+            'rows_per_second': loaded_rows / elapsed if elapsed > 0 else 0.0
+        }
+
+    if already_complete:
+        return summary()
+
+    if workers > 1 and db.engine.dialect.name == 'sqlite':
+        # SQLite takes one writer at a time; parallel loaders only wait on its lock
+        workers = 1
+    loader = _ProcessLoader(workers, create_engines, engine_model, chunk_size) if workers > 0 else \
+        _InlineLoader(create_engines, engine_model, chunk_size)
+
+    # Start offset of the first record of every unfinished batch and buffer
+    in_flight = {}  # batch sequence -> start offset
+    buffers = {}  # partition -> (start offset, records)
+    sequence = 0
+    position = state['offset']
+    last_report = time.perf_counter()
+
+    def collect(results):
+        nonlocal loaded_rows, last_report
+        for batch, inserted, skipped in results:
+            in_flight.pop(batch)
+            engines.update(inserted)
+            loaded_rows += sum(inserted.values())
+            state['rows'] += sum(inserted.values())
+            state['skipped'] += skipped
+
+        # Everything before the oldest unfinished record is committed
+        pending = list(in_flight.values()) + [start for start, _ in buffers.values()]
+        state['offset'] = min(pending + [position])
+        if time.perf_counter() - last_report >= progress_interval:
+            last_report = time.perf_counter()
+            _save_checkpoint(checkpoint_path, state, engines)
+            if progress:
+                progress(summary())
+
+    def submit(partition):
+        nonlocal sequence
+        start, records = buffers.pop(partition)
+        in_flight[sequence] = start
+        collect(loader.submit(partition, sequence, records))
+        sequence += 1
+        if loader.error:
+            raise IngestError(loader.error)
+
+    try:
+        for record, end in iter_records(path, fmt, offset=position):
+            if engine_offset and 'engine_id' in record:
+                try:
+                    record['engine_id'] = int(record['engine_id']) + engine_offset
+                except (TypeError, ValueError):
+                    pass  # Reported by validation
+
+            partition = loader.partition(record)
+            buffers.setdefault(partition, (position, []))[1].append(record)
+            position = end
+            if len(buffers[partition][1]) >= batch_size:
+                submit(partition)
+
+        for partition in list(buffers):
+            submit(partition)
+        collect(loader.finish())
+        if loader.error:
+            raise IngestError(loader.error)
+        state['complete'] = True
+    except BaseException as e:
+        # Keep whatever has been committed, then report the failure
+        try:
+            collect(loader.abort())
+        finally:
+            _save_checkpoint(checkpoint_path, state, engines)
+        if isinstance(e, IngestError) and state['offset']:
+            raise IngestError(f"{str(e)} (records before byte {state['offset']} are loaded)") from e
+        raise
+
+    _save_checkpoint(checkpoint_path, state, engines)
+    refresh_health(sorted(engines))
+    return summary()
+
+
+def refresh_health(engine_ids, chunk_size=500):
+    """Refresh the health snapshot of many engines in chunks"""
+    for start in range(0, len(engine_ids), chunk_size):
+        refresh_engine_health(engine_ids[start:start + chunk_size])
+        db.session.commit()
+    response_cache.invalidate('dashboard', 'alerts')
+
+
+class _InlineLoader:
+    """Loads every batch in the calling process as it is submitted"""
+
+    def __init__(self, create_engines, engine_model, chunk_size):
+        self.options = (create_engines, engine_model, chunk_size)
+        self.error = None
+
+    def partition(self, record):
+        return 0
+
+    def submit(self, partition, sequence, records):
+        inserted, skipped = load_records(records, *self.options)
+        return [(sequence, inserted, skipped)]
+
+    def finish(self):
+        anomaly_detector.flush(force=True)
+        return []
+
+    def abort(self):
+        anomaly_detector.flush(force=True)
+        return []
+
+
+class _ProcessLoader:
+    """
+    One forked worker process per partition, each with a small bounded task
+    queue so reading the file never runs far ahead of the database.
+    """
+
+    def __init__(self, workers, create_engines, engine_model, chunk_size):
+        from flask import current_app
+
+        context = multiprocessing.get_context('fork')
+        app = current_app._get_current_object()
+        self.results = context.Queue()
+        self.tasks = [context.Queue(maxsize=2) for _ in range(workers)]
+        self.processes = [
+            context.Process(target=_worker, args=(app, tasks, self.results, create_engines, engine_model, chunk_size),
+                            daemon=True)
+            for tasks in self.tasks
+        ]
+        # Forked children must not share the parent's pooled connections
+        db.session.remove()
+        db.engine.dispose()
+        for process in self.processes:
+            process.start()
+        self.outstanding = 0
+        self.error = None
+
+    def partition(self, record):
+        try:
+            return int(record.get('engine_id')) % len(self.tasks)
+        except (TypeError, ValueError):
+            return 0
+
+    def submit(self, partition, sequence, records):
+        tasks, process = self.tasks[partition], self.processes[partition]
+        # A full queue empties only while its worker runs; do not wait on a dead one
+        while True:
+            try:
+                tasks.put((sequence, records), timeout=1)
+                break
+            except queue.Full:
+                if not process.is_alive():
+                    raise IngestError(f'An ingest worker exited unexpectedly (exit code {process.exitcode})')
+        self.outstanding += 1
+        return self._drain(block=False)
+
+    def finish(self):
+        return self._stop()
+
+    def abort(self):
+        # The workers finish the batches they hold, so those can be checkpointed
+        return self._stop()
+
+    def _stop(self):
+        for tasks in self.tasks:
+            try:
+                tasks.put(None, timeout=5)
+            except queue.Full:
+                pass  # A worker that died; terminated below
+        try:
+            return self._drain(block=True)
+        finally:
+            for process in self.processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+    def _drain(self, block):
+        results = []
+        while self.outstanding:
+            try:
+                sequence, inserted, skipped, message = self.results.get(timeout=1) if block else \
+                    self.results.get_nowait()
+            except queue.Empty:
+                if not block:
+                    break
+                if not any(process.is_alive() for process in self.processes):
+                    self.error = self.error or 'An ingest worker exited unexpectedly'
+                    break
+                continue
+
+            self.outstanding -= 1
+            if message is not None:
+                self.error = self.error or message
+            else:
+                results.append((sequence, inserted, skipped))
+        return results
+
+
+def _worker(app, tasks, results, create_engines, engine_model, chunk_size):
+    # Ctrl-C stops the parent, which then lets the workers finish their batch
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    with app.app_context():
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            sequence, records = task
+            try:
+                inserted, skipped = load_records(records, create_engines, engine_model, chunk_size)
+                results.put((sequence, inserted, skipped, None))
+            except Exception as e:
+                db.session.rollback()
+                results.put((sequence, {}, 0, str(e)))
+        # Readings below ANOMALY_BASELINE_FLUSH_ROWS would die with the process
+        anomaly_detector.flush(force=True)
+        db.session.remove()
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_checkpoint(path, state, engines):
+    if not path:
+        return
+    state['engines'] = sorted(engines)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write then rename, so an interruption never leaves a truncated checkpoint
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(state, f)
+    os.replace(temporary, path)
@@ -0,0 +1,106 @@
+import csv
+import heapq
+import io
+import json
+from operator import itemgetter
+from sqlalchemy import select
+from app import db
+from app.models.engine import EngineCycle, SENSOR_KEYS, SETTING_KEYS
+from app.services.archive import find_segments, iter_archived_rows
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'cmapss': 'text/plain'
+}
+
+PREDICTION_KEYS = ['rul', 'failure_probability', 'anomaly_score']
+
+
+def iter_cycle_rows(engine_ids=None, from_cycle=None, to_cycle=None, sensors=None, chunk_size=1000):
+    """
+    Stream cycle rows in (engine_id, cycle) order through a server-side cursor.
+
+    Only the requested columns are selected and rows are fetched chunk_size at
+    a time, so memory use stays constant however long the history is.
+    Archived cycles are read from their segment files, one at a time, and
+    merged in.
+
+    Args:
+        engine_ids (list): Engines to export, or None for the whole fleet
+        from_cycle (int): First cycle to include
+        to_cycle (int): Last cycle to include
+        sensors (list): Sensor keys to include, defaults to all 21
+        chunk_size (int): Rows fetched per round trip
+
+    Yields:
+        dict: One row per cycle
+    """
+    sensors = sensors or SENSOR_KEYS
+    columns = ['engine_id', 'cycle', 'timestamp'] + SETTING_KEYS + sensors + PREDICTION_KEYS
+
+    stmt = select(*[getattr(EngineCycle, column) for column in columns])
+    if engine_ids is not None:
+        stmt = stmt.where(EngineCycle.engine_id.in_(engine_ids))
+    if from_cycle is not None:
+        stmt = stmt.where(EngineCycle.cycle >= from_cycle)
+    if to_cycle is not None:
+        stmt = stmt.where(EngineCycle.cycle <= to_cycle)
+    stmt = stmt.order_by(EngineCycle.engine_id, EngineCycle.cycle).\
+        execution_options(yield_per=chunk_size)
+
+    # Looked up before the streaming query starts, which holds the connection
+    segments = find_segments(engine_ids, from_cycle, to_cycle)
+    rows = (dict(zip(columns, row)) for row in db.session.execute(stmt))
+    if segments:
+        archived = iter_archived_rows(segments, columns[1:], from_cycle, to_cycle)
+        rows = heapq.merge(archived, rows, key=itemgetter('engine_id', 'cycle'))
+
+    yield from rows
+
+
+def format_rows(rows, fmt, sensors=None):
+    """
+    Render streamed rows in an export format.
+
+    Args:
+        rows (iterable): Row dicts from iter_cycle_rows
+        fmt (str): 'ndjson', 'csv' or 'cmapss' (space-separated
+            "unit cycle settings sensors", as in the C-MAPSS train files)
+        sensors (list): Sensor keys included in rows
+
+    Yields:
+        str: Chunks of the response body
+    """
+    sensors = sensors or SENSOR_KEYS
+
+    if fmt == 'ndjson':
+        for row in rows:
+            row['timestamp'] = row['timestamp'].isoformat() if row['timestamp'] else None
+            yield json.dumps(row) + '\n'
+
+    elif fmt == 'csv':
+        columns = ['engine_id', 'cycle', 'timestamp'] + SETTING_KEYS + sensors + PREDICTION_KEYS
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows:
+            row['timestamp'] = row['timestamp'].isoformat() if row['timestamp'] else None
+            writer.writerow([row[column] for column in columns])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    elif fmt == 'cmapss':
+        columns = SETTING_KEYS + sensors
+        for row in rows:
+            values = ' '.join(_format_number(row[column]) for column in columns)
+            yield f"{row['engine_id']} {row['cycle']} {values}\n"
+
+    else:
+        raise ValueError(f'Unknown export format: {fmt}')
+
+
+def _format_number(value):
+    return 'NaN' if value is None else f'{value:.4f}'
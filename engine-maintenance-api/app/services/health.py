@@ -0,0 +1,90 @@
+from app import db, events, response_cache
+from app.models.engine import Engine, EngineCycle
+from app.models.alert import Alert
+from app.models.health import EngineHealth
+
+def refresh_engine_health(engine_ids):
+    """
+    Recompute the health snapshot for the given engines.
+
+    Called from every write path that changes an engine's latest cycle,
+    prediction or open alerts. Only the touched engines are read, so the cost
+    does not depend on the size of the cycle history. Engines whose snapshot
+    changed get an engine.health event once the caller commits.
+
+    Args:
+        engine_ids (iterable): IDs of the engines whose data changed
+    """
+    engine_ids = set(engine_ids)
+    if not engine_ids:
+        return
+
+    latest_cycles = db.session.query(
+        EngineCycle.engine_id,
+        db.func.max(EngineCycle.cycle).label('max_cycle')
+    ).filter(EngineCycle.engine_id.in_(engine_ids)).group_by(EngineCycle.engine_id).subquery()
+
+    latest = db.session.query(
+        EngineCycle.engine_id,
+        EngineCycle.id,
+        EngineCycle.cycle,
+        EngineCycle.rul,
+        EngineCycle.failure_probability
+    ).join(latest_cycles, (EngineCycle.engine_id == latest_cycles.c.engine_id) &
+           (EngineCycle.cycle == latest_cycles.c.max_cycle)).all()
+    latest = {row[0]: row for row in latest}
+
+    open_alerts = dict(db.session.query(Alert.engine_id, db.func.count(Alert.id)).filter(
+        Alert.engine_id.in_(engine_ids),
+        Alert.resolved == False
+    ).group_by(Alert.engine_id).all())
+
+    existing = {health.engine_id: health for health in
+                EngineHealth.query.filter(EngineHealth.engine_id.in_(engine_ids)).all()}
+    # A snapshot row means the engine exists; only look up the others
+    known_engines = set(existing)
+    if engine_ids - known_engines:
+        known_engines.update(engine_id for (engine_id,) in db.session.query(Engine.id).filter(
+            Engine.id.in_(engine_ids - known_engines)).all())
+
+    for engine_id in known_engines:
+        health = existing.get(engine_id)
+        if health is None:
+            health = EngineHealth(engine_id=engine_id)
+            db.session.add(health)
+
+        row = latest.get(engine_id)
+        before = (health.latest_cycle, health.rul, health.failure_probability, health.open_alerts)
+        health.latest_cycle_id = row[1] if row else None
+        health.latest_cycle = row[2] if row else None
+        health.rul = row[3] if row else None
+        health.failure_probability = row[4] if row else None
+        health.open_alerts = open_alerts.get(engine_id, 0)
+
+        if (health.latest_cycle, health.rul, health.failure_probability, health.open_alerts) != before:
+            events.publish_on_commit('engine.health', {
+                'engine_id': engine_id,
+                'latest_cycle': health.latest_cycle,
+                'rul': health.rul,
+                'failure_probability': health.failure_probability,
+                'open_alerts': health.open_alerts
+            })
+
+def rebuild_engine_health(chunk_size=500):
+    """
+    Rebuild the health snapshot for the whole fleet, e.g. to backfill it for
+    an existing database.
+
+    Returns:
+        int: Number of engines processed
+    """
+    EngineHealth.query.delete()
+    engine_ids = [engine_id for (engine_id,) in db.session.query(Engine.id).order_by(Engine.id).all()]
+
+    for start in range(0, len(engine_ids), chunk_size):
+        refresh_engine_health(engine_ids[start:start + chunk_size])
+        db.session.commit()
+
+    db.session.commit()
+    response_cache.invalidate('dashboard', 'alerts')
+    return len(engine_ids)
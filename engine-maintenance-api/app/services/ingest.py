@@ -0,0 +1,211 @@
+import json
+from datetime import datetime
+from app import db
+from app.models.engine import Engine, EngineCycle, SENSOR_KEYS, SETTING_KEYS
+from app.services.archive import archived_max_cycles
+
+
+class CycleValidationError(ValueError):
+    """Raised when a batch of cycle records fails validation"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid cycle record(s)')
+        self.errors = errors
+
+
+def parse_cycle_payload(raw_body, content_type=None):
+    """
+    Decode a bulk cycle payload into a list of records.
+
+    Accepts a JSON array, a JSON object with a 'cycles' array, or NDJSON
+    (one JSON object per line).
+
+    Args:
+        raw_body (bytes|str): Request body
+        content_type (str): Request content type, used to detect NDJSON
+
+    Returns:
+        list: Decoded cycle records
+    """
+    if isinstance(raw_body, bytes):
+        raw_body = raw_body.decode('utf-8')
+
+    if content_type and 'ndjson' in content_type:
+        return _parse_ndjson(raw_body)
+
+    try:
+        payload = json.loads(raw_body)
+    except json.JSONDecodeError:
+        # Fall back to NDJSON when the body is not a single JSON document
+        return _parse_ndjson(raw_body)
+
+    if isinstance(payload, dict) and 'cycles' in payload:
+        payload = payload['cycles']
+
+    if not isinstance(payload, list):
+        raise CycleValidationError([{'index': None, 'error': 'Expected an array of cycle records'}])
+
+    return payload
+
+
+def _parse_ndjson(raw_body):
+    records = []
+    errors = []
+    for line_number, line in enumerate(raw_body.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            errors.append({'index': line_number, 'error': f'Invalid JSON: {str(e)}'})
+
+    if errors:
+        raise CycleValidationError(errors)
+
+    return records
+
+
+def build_cycle_rows(records, engine_id=None):
+    """
+    Validate a batch of cycle records and convert them to EngineCycle rows.
+
+    The whole batch is validated before anything is written; every problem is
+    collected so the client can fix the batch in one pass.
+
+    Args:
+        records (list): Decoded cycle records
+        engine_id (int): Engine to attach every record to. When None, each
+            record must carry its own engine_id.
+
+    Returns:
+        list: Row dicts ready for a multi-row INSERT into engine_cycle
+    """
+    rows = []
+    errors = []
+    seen = set()
+    now = datetime.utcnow()
+
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'error': 'Record must be a JSON object'})
+            continue
+
+        try:
+            row_engine_id = int(engine_id if engine_id is not None else record['engine_id'])
+        except KeyError:
+            errors.append({'index': index, 'error': 'Missing required field: engine_id'})
+            continue
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'engine_id must be a valid integer'})
+            continue
+
+        if 'cycle' not in record:
+            errors.append({'index': index, 'error': 'Cycle number is required'})
+            continue
+
+        try:
+            cycle = int(record['cycle'])
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'Cycle must be a valid integer'})
+            continue
+
+        if cycle <= 0:
+            errors.append({'index': index, 'error': 'Cycle must be a positive integer'})
+            continue
+
+        if (row_engine_id, cycle) in seen:
+            errors.append({'index': index, 'error': f'Duplicate cycle {cycle} for engine {row_engine_id} in batch'})
+            continue
+        seen.add((row_engine_id, cycle))
+
+        try:
+            # Use 0.0 as default for any setting or sensor not provided
+            settings = {key: float(record.get(key, 0.0)) for key in SETTING_KEYS}
+            sensors = {key: float(record.get(key, 0.0)) for key in SENSOR_KEYS}
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'Settings and sensor readings must be numeric'})
+            continue
+
+        rows.append({
+            'engine_id': row_engine_id,
+            'cycle': cycle,
+            'timestamp': now,
+            **settings,
+            **sensors
+        })
+
+    if errors:
+        raise CycleValidationError(errors)
+
+    return rows
+
+
+def find_missing_engines(rows):
+    """Return the engine ids referenced by rows that do not exist"""
+    engine_ids = {row['engine_id'] for row in rows}
+    if not engine_ids:
+        return set()
+
+    existing = db.session.query(Engine.id).filter(Engine.id.in_(engine_ids)).all()
+    return engine_ids - {engine_id for (engine_id,) in existing}
+
+
+def find_existing_cycles(rows):
+    """
+    Detect which (engine_id, cycle) pairs in rows are already stored.
+
+    Uses a single range query per batch rather than one lookup per row.
+    Cycles up to an engine's last archived cycle count as stored.
+    """
+    if not rows:
+        return set()
+
+    engine_ids = {row['engine_id'] for row in rows}
+    cycles = [row['cycle'] for row in rows]
+    wanted = {(row['engine_id'], row['cycle']) for row in rows}
+
+    stored = db.session.query(EngineCycle.engine_id, EngineCycle.cycle).\
+        filter(EngineCycle.engine_id.in_(engine_ids)).\
+        filter(EngineCycle.cycle.between(min(cycles), max(cycles))).all()
+
+    archived = archived_max_cycles(engine_ids)
+    return wanted & {(engine_id, cycle) for engine_id, cycle in stored} | \
+        {(engine_id, cycle) for engine_id, cycle in wanted if cycle <= archived.get(engine_id, 0)}
+
+
+def bulk_insert_cycles(rows, chunk_size=500):
+    """
+    Write cycle rows with executemany INSERTs and bump each engine's
+    total_cycles once. The caller is responsible for committing.
+
+    The statement is compiled once and cached; the driver batches the rows
+    (PyMySQL rewrites executemany into multi-row INSERTs). Building one
+    literal VALUES list per chunk instead costs a full SQL compile per chunk,
+    which dominated bulk loads.
+
+    Args:
+        rows (list): Row dicts produced by build_cycle_rows
+        chunk_size (int): Maximum number of rows per INSERT statement
+
+    Returns:
+        dict: Number of rows inserted per engine id
+    """
+    table = EngineCycle.__table__
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(table.insert(), rows[start:start + chunk_size])
+
+    inserted = {}
+    max_cycles = {}
+    for row in rows:
+        engine_id = row['engine_id']
+        inserted[engine_id] = inserted.get(engine_id, 0) + 1
+        max_cycles[engine_id] = max(max_cycles.get(engine_id, 0), row['cycle'])
+
+    # Update each engine's total cycles if the batch went past it
+    engines = Engine.query.filter(Engine.id.in_(max_cycles.keys())).all()
+    for engine in engines:
+        if max_cycles[engine.id] > (engine.total_cycles or 0):
+            engine.total_cycles = max_cycles[engine.id]
+
+    return inserted
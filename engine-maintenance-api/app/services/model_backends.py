@@ -0,0 +1,158 @@
+import json
+import os
+import numpy as np
+
+BACKENDS = ('numpy', 'keras')
+
+
+class NumpyRNNBackend:
+    """
+    Pure-NumPy forward pass for the RNN_fwd architecture:
+    SimpleRNN(tanh) -> Dropout -> Dense(sigmoid).
+
+    Dropout is a no-op at inference time, so only the recurrent cell and the
+    dense head are evaluated. Loading needs either the exported .npz weights
+    or h5py to read them straight from the .h5 file; TensorFlow is never
+    imported.
+    """
+
+    name = 'numpy'
+
+    def __init__(self, kernel, recurrent_kernel, bias, dense_kernel, dense_bias):
+        self.kernel = np.asarray(kernel, dtype=np.float32)
+        self.recurrent_kernel = np.asarray(recurrent_kernel, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.dense_kernel = np.asarray(dense_kernel, dtype=np.float32)
+        self.dense_bias = np.asarray(dense_bias, dtype=np.float32)
+
+    @classmethod
+    def load(cls, model_path):
+        """
+        Load weights from the exported .npz next to model_path, unless the
+        .h5 is newer (a swapped-in model not exported yet), then from the .h5
+        """
+        npz_path = os.path.splitext(model_path)[0] + '.npz'
+        if os.path.exists(npz_path) and (not os.path.exists(model_path) or
+                                         os.stat(npz_path).st_mtime_ns >= os.stat(model_path).st_mtime_ns):
+            return cls.from_npz(npz_path)
+        return cls.from_h5(model_path)
+
+    @classmethod
+    def from_npz(cls, path):
+        with np.load(path) as weights:
+            return cls(**{key: weights[key] for key in weights.files})
+
+    @classmethod
+    def from_h5(cls, path):
+        return cls(**read_h5_weights(path))
+
+    def predict(self, X, **kwargs):
+        """
+        Run the forward pass.
+
+        Args:
+            X (array): Input windows of shape (batch_size, time_steps, features)
+
+        Returns:
+            ndarray: Failure probabilities of shape (batch_size, 1)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        h = np.zeros((X.shape[0], self.recurrent_kernel.shape[0]), dtype=np.float32)
+
+        # Project every time step through the input kernel in one matmul
+        projected = X @ self.kernel + self.bias
+        for t in range(X.shape[1]):
+            h = np.tanh(projected[:, t, :] + h @ self.recurrent_kernel)
+
+        logits = h @ self.dense_kernel + self.dense_bias
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def export(self, path):
+        np.savez(
+            path,
+            kernel=self.kernel,
+            recurrent_kernel=self.recurrent_kernel,
+            bias=self.bias,
+            dense_kernel=self.dense_kernel,
+            dense_bias=self.dense_bias
+        )
+
+
+class KerasBackend:
+    """Full Keras model; TensorFlow is imported only when this backend is used"""
+
+    name = 'keras'
+
+    def __init__(self, model):
+        self.model = model
+
+    @classmethod
+    def load(cls, model_path):
+        import tensorflow as tf
+        return cls(tf.keras.models.load_model(model_path))
+
+    def predict(self, X, **kwargs):
+        kwargs.setdefault('verbose', 0)
+        return self.model.predict(np.asarray(X, dtype=np.float32), **kwargs)
+
+
+def read_h5_weights(path):
+    """
+    Read the SimpleRNN and Dense weights of RNN_fwd from a Keras .h5 file.
+
+    Handles both the Keras 2 (`layer/layer/kernel:0`) and Keras 3
+    (`layer/sequential/layer/cell/kernel`) weight layouts.
+    """
+    import h5py
+
+    with h5py.File(path, 'r') as f:
+        config = json.loads(f.attrs['model_config'])
+        layers = [layer['class_name'] for layer in config['config']['layers']]
+        supported = [name for name in layers if name not in ('InputLayer', 'Dropout')]
+        if supported != ['SimpleRNN', 'Dense']:
+            raise ValueError(f'Unsupported architecture for the NumPy backend: {layers}')
+
+        root = f['model_weights'] if 'model_weights' in f else f
+        rnn_name, dense_name = [
+            layer['config']['name'] for layer in config['config']['layers']
+            if layer['class_name'] in ('SimpleRNN', 'Dense')
+        ]
+        rnn = _collect_datasets(root[rnn_name])
+        dense = _collect_datasets(root[dense_name])
+
+    return {
+        'kernel': rnn['kernel'],
+        'recurrent_kernel': rnn['recurrent_kernel'],
+        'bias': rnn['bias'],
+        'dense_kernel': dense['kernel'],
+        'dense_bias': dense['bias']
+    }
+
+
+def _collect_datasets(group):
+    import h5py
+
+    datasets = {}
+
+    def visit(name, obj):
+        if isinstance(obj, h5py.Dataset):
+            key = name.rsplit('/', 1)[-1].split(':')[0]
+            datasets[key] = obj[()]
+
+    group.visititems(visit)
+    return datasets
+
+
+def load_backend(name, model_path):
+    """
+    Load the model at model_path with the requested backend.
+
+    Args:
+        name (str): 'numpy' or 'keras'
+        model_path (str): Path to the Keras .h5 model file
+    """
+    if name == 'numpy':
+        return NumpyRNNBackend.load(model_path)
+    if name == 'keras':
+        return KerasBackend.load(model_path)
+    raise ValueError(f'Unknown model backend: {name}. Must be one of: {", ".join(BACKENDS)}')
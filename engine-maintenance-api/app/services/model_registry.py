@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_SPEC = 'default'
+
+
+class ModelSpec:
+    """What a predictor expects: its model file, input features and window length"""
+
+    def __init__(self, name, path, features=None, window=50, backend=None):
+        self.name = name
+        self.path = path
+        self.features = list(features or ['s2'])
+        self.window = int(window)
+        self.backend = backend
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'path': self.path,
+            'features': self.features,
+            'window': self.window,
+            'backend': self.backend
+        }
+
+
+class LoadedModel:
+    def __init__(self, spec, predictor, mtime):
+        self.spec = spec
+        self.predictor = predictor
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+
+
+class ModelRegistry:
+    """
+    Predictors keyed by engine model.
+
+    The manifest (ML_MODEL_REGISTRY) maps engine models to a ModelSpec; engine
+    models it does not list use its 'default' entry, and without a manifest
+    every engine uses ML_MODEL_PATH on s2 with a 50-cycle window:
+
+        {
+          "default": {"path": "RNN_fwd.h5", "features": ["s2"], "window": 50},
+          "models": {
+            "Trent 1000": {"path": "trent_1000.h5", "features": ["s2", "s7"], "window": 30}
+          }
+        }
+
+    Models are loaded on first use and at most ML_MODEL_CACHE_SIZE stay
+    resident (LRU). Every ML_MODEL_RELOAD_INTERVAL seconds a lookup checks the
+    file's mtime; a changed file is loaded on the side and swapped in with a
+    single reference assignment, so in-flight predictions finish on the old
+    model and no worker needs a restart. If the new file fails to load (e.g.
+    it is still being copied) the old model stays in service. The manifest
+    itself is reloaded the same way.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # (path, backend) -> LoadedModel, least recently used first
+        self._specs = {}
+        self._default = None
+        self._manifest_mtime = None
+        self._manifest_checked_at = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.manifest_path = app.config.get('ML_MODEL_REGISTRY')
+        self.default_path = app.config['ML_MODEL_PATH']
+        self.default_backend = app.config.get('ML_MODEL_BACKEND', 'numpy')
+        self.max_models = app.config.get('ML_MODEL_CACHE_SIZE', 4)
+        self.reload_interval = app.config.get('ML_MODEL_RELOAD_INTERVAL', 10)
+        self._load_manifest()
+        app.extensions['model_registry'] = self
+
+    def _load_manifest(self):
+        default = ModelSpec(DEFAULT_SPEC, self.default_path)
+        specs = {}
+        mtime = _mtime(self.manifest_path) if self.manifest_path else None
+
+        if mtime is not None:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            base_dir = os.path.dirname(os.path.abspath(self.manifest_path))
+
+            def build(name, entry):
+                return ModelSpec(name, os.path.join(base_dir, entry['path']),
+                                 entry.get('features'), entry.get('window', 50), entry.get('backend'))
+
+            if 'default' in manifest:
+                default = build(DEFAULT_SPEC, manifest['default'])
+            specs = {name: build(name, entry) for name, entry in manifest.get('models', {}).items()}
+
+        _validate_features([default] + list(specs.values()))
+        with self._lock:
+            self._default = default
+            self._specs = specs
+            self._manifest_mtime = mtime
+            self._manifest_checked_at = time.monotonic()
+            # Specs may have changed, so rebuild predictors on next use
+            self._models.clear()
+
+    def _check_manifest(self):
+        if not self.manifest_path or time.monotonic() - self._manifest_checked_at < self.reload_interval:
+            return
+        self._manifest_checked_at = time.monotonic()
+        if _mtime(self.manifest_path) != self._manifest_mtime:
+            try:
+                self._load_manifest()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Keeping previous model registry, failed to reload manifest: {str(e)}")
+
+    def spec_for(self, engine_model):
+        """The ModelSpec that scores engines of the given model"""
+        self._check_manifest()
+        return self._specs.get(engine_model, self._default)
+
+    def get(self, engine_model):
+        """
+        Return the spec and predictor for an engine model, loading or
+        hot-swapping the model file as needed.
+
+        Returns:
+            tuple: (ModelSpec, predictor with a predict(X) method)
+        """
+        spec = self.spec_for(engine_model)
+        # Engine models that share a model file share one loaded predictor
+        key = (spec.path, spec.backend or self.default_backend)
+
+        with self._lock:
+            loaded = self._models.get(key)
+            if loaded is not None:
+                self._models.move_to_end(key)
+                if time.monotonic() - loaded.checked_at < self.reload_interval:
+                    return spec, loaded.predictor
+                loaded.checked_at = time.monotonic()
+
+        mtime = self._model_mtime(spec)
+        if loaded is not None and mtime == loaded.mtime:
+            return spec, loaded.predictor
+
+        try:
+            predictor = self._load(spec)
+        except Exception:
+            if loaded is None:
+                raise
+            print(f"Keeping loaded model for {spec.name}, failed to load {spec.path}")
+            return spec, loaded.predictor
+
+        with self._lock:
+            self._models[key] = LoadedModel(spec, predictor, mtime)
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        if loaded is not None:
+            print(f"Reloaded model {spec.name} from {spec.path}")
+        return spec, predictor
+
+    def _load(self, spec):
+        from app.services.model_backends import load_backend
+        return load_backend(spec.backend or self.default_backend, spec.path)
+
+    def _model_mtime(self, spec):
+        # The NumPy backend reads the newer of the .h5 and its exported .npz,
+        # so a change to either is a new model
+        paths = [spec.path, os.path.splitext(spec.path)[0] + '.npz']
+        return max((_mtime(path) or 0) for path in paths)
+
+    def specs(self):
+        """Every declared spec keyed by engine model, plus the default"""
+        self._check_manifest()
+        specs = {DEFAULT_SPEC: self._default}
+        specs.update(self._specs)
+        return specs
+
+    def loaded(self):
+        """Paths of the resident model files, least recently used first"""
+        with self._lock:
+            return [path for path, backend in self._models]
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _validate_features(specs):
+    from app.models.engine import SENSOR_KEYS, SETTING_KEYS
+
+    for spec in specs:
+        unknown = [feature for feature in spec.features if feature not in SETTING_KEYS + SENSOR_KEYS]
+        if unknown:
+            raise ValueError(f'Model {spec.name} declares unknown features: {", ".join(unknown)}')
@@ -1,81 +1,262 @@
+import time
 import numpy as np
-from app import db
+from flask import current_app
+from app import db, response_cache, window_cache, model_registry, metrics, events
 from app.models.engine import EngineCycle, Engine
 from app.models.alert import Alert
+from app.services.health import refresh_engine_health
+from app.services.rul import estimate_rul, save_rul_estimates
 from datetime import datetime
+from sqlalchemy import update
 
-def run_predictions(engine_id):
+WINDOW_SIZE = 50
+
+def run_predictions(engine_id, timings=None):
     """
-    Process engine cycle data and make predictions using the RNN_fwd model.
-    This model was trained only on the s2 sensor value.
+    Process engine cycle data and make predictions with the model registered
+    for the engine's model (RNN_fwd on s2 unless the registry says otherwise).
     
     Args:
         engine_id (int): ID of the engine to analyze
+        timings (dict): If given, filled with the seconds spent in each stage:
+            fetch, build, predict and write
+
+    Returns:
+        dict: {'status': 'completed', 'failure_probability': ...}, or
+            {'status': 'skipped', 'reason': ...} when the engine, its model or
+            enough cycles are missing
+
+    Raises:
+        Exception: Whatever failed while predicting or writing the result,
+            after the session is rolled back
     """
-    # Import ml_model from the global scope
-    from app import ml_model
-    
-    if ml_model is None:
-        print("ML model not loaded yet")
-        return
-    
-    # Get the latest 50 cycles (or fewer if not available)
-    cycles = EngineCycle.query.filter_by(engine_id=engine_id).order_by(EngineCycle.cycle.desc()).limit(50).all()
-    
-    if len(cycles) < 50:
-        print(f"Not enough data for engine {engine_id}. Need 50 cycles, got {len(cycles)}")
-        return
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    engine = Engine.query.get(engine_id)
+    if engine is None:
+        return {'status': 'skipped', 'reason': f'Engine {engine_id} not found'}
     
-    # Reverse to get chronological order
-    cycles.reverse()
-    
-    # For RNN_fwd.h5, we only need the s2 sensor (it was trained on just one feature)
-    sequence_data = []
-    for cycle in cycles:
-        # Only extract s2 value from sensor_data
-        s2_value = cycle.sensor_data.get('s2', 0)
-        sequence_data.append([s2_value])
+    try:
+        spec, ml_model = model_registry.get(engine.model)
+    except Exception as e:
+        reason = f'ML model not available for engine {engine_id}: {str(e)}'
+        current_app.logger.warning(reason)
+        return {'status': 'skipped', 'reason': reason}
     
-    # Reshape for RNN input [samples, time steps, features]
-    # The model expects shape (batch_size, 50, 1) since it was trained with just s2
-    X = np.array([sequence_data])
+    if spec.features == ['s2'] and spec.window == window_cache.size:
+        # Latest 50 s2 readings in chronological order, kept up to date on ingest
+        latest_cycle, window = window_cache.get(engine_id)
+        timings['fetch'] = time.perf_counter() - started
+        
+        if len(window) < spec.window:
+            reason = f'Not enough data for engine {engine_id}. Need {spec.window} cycles, got {len(window)}'
+            current_app.logger.info(reason)
+            return {'status': 'skipped', 'reason': reason}
+        
+        # Reshape for RNN input [samples, time steps, features]
+        X = window.reshape(1, spec.window, 1)
+        latest_cycle_filter = {'engine_id': engine_id, 'cycle': latest_cycle}
+    else:
+        scored_ids, latest_cycle_ids, X = fetch_windows([engine_id], spec.features, spec.window)
+        timings['fetch'] = time.perf_counter() - started
+        
+        if not scored_ids:
+            reason = f'Not enough data for engine {engine_id}. Need {spec.window} cycles'
+            current_app.logger.info(reason)
+            return {'status': 'skipped', 'reason': reason}
+        
+        latest_cycle_filter = {'id': latest_cycle_ids[0]}
+    timings['build'] = time.perf_counter() - started - timings['fetch']
     
     try:
-        # Make prediction with the single feature RNN model
+        # Make prediction with the engine model's predictor
+        predict_started = time.perf_counter()
         failure_prob = float(ml_model.predict(X)[0][0])
-        print(f"Prediction for engine {engine_id}: {failure_prob:.4f}")
+        timings['predict'] = time.perf_counter() - predict_started
+        metrics.record_inference(spec.name, timings['predict'], 1)
+        current_app.logger.debug('Prediction for engine %s: %.4f', engine_id, failure_prob)
         
         # Update the database with prediction
-        latest_cycle = cycles[-1]  # Most recent cycle
-        latest_cycle_db = EngineCycle.query.get(latest_cycle.id)
+        write_started = time.perf_counter()
+        latest_cycle_db = EngineCycle.query.filter_by(**latest_cycle_filter).first()
         latest_cycle_db.failure_probability = failure_prob
+        db.session.flush()
         
-        # Calculate remaining useful life - this is a simplified approach
-        if failure_prob > 0.5:
-            # Rough estimate: assume linear relationship with failure probability
-            # 0.5 probability = 30 cycles remaining, 1.0 probability = 0 cycles remaining
-            rul_estimate = 30 * (2 - (2 * failure_prob))
-            latest_cycle_db.rul = max(0, rul_estimate)
-        else:
-            # If failure probability is low, we assume RUL is at least 30 cycles
-            latest_cycle_db.rul = 30
+        # RUL from the trend of the engine's prediction history, this one included
+        save_rul_estimates(estimate_rul([engine_id]))
         
         # If high probability of failure, create an alert
-        engine = Engine.query.get(engine_id)
         if failure_prob > 0.7 and not Alert.query.filter_by(
                 engine_id=engine_id, 
                 alert_type='maintenance_due',
                 resolved=False).first():
-            
-            new_alert = Alert(
-                engine_id=engine_id,
-                alert_type='maintenance_due',
-                message=f'Engine {engine.serial_number} has a {failure_prob*100:.1f}% probability of failure within 30 cycles. Maintenance recommended.'
-            )
-            db.session.add(new_alert)
+            alert = build_maintenance_alert(engine, failure_prob)
+            db.session.add(alert)
+            db.session.flush()
+            events.publish_on_commit('alert.created', alert.to_dict())
         
+        refresh_engine_health([engine_id])
         db.session.commit()
+        response_cache.invalidate('dashboard', 'alerts')
+        timings['write'] = time.perf_counter() - write_started
         
-    except Exception as e:
-        print(f"Error making prediction: {str(e)}")
-        db.session.rollback()   
\ No newline at end of file
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return {'status': 'completed', 'failure_probability': failure_prob}
+
+def build_maintenance_alert(engine, failure_prob):
+    """Create (but do not add) a maintenance_due alert for a high-risk engine"""
+    return Alert(
+        engine_id=engine.id,
+        alert_type='maintenance_due',
+        message=f'Engine {engine.serial_number} has a {failure_prob*100:.1f}% probability of failure within 30 cycles. Maintenance recommended.'
+    )
+
+def fetch_windows(engine_ids=None, features=('s2',), window=WINDOW_SIZE):
+    """
+    Load the latest `window` cycles of the given features for many engines
+    with a single windowed query.
+
+    Args:
+        engine_ids (list): Engines to load, or None for the whole fleet
+        features (list): Cycle columns to load, in model input order
+        window (int): Number of most recent cycles per engine
+
+    Returns:
+        tuple: (engine_ids, latest_cycle_ids, X) where X has shape
+            (N, window, len(features)). Engines with fewer than `window`
+            cycles are skipped.
+    """
+    features = list(features)
+    row_number = db.func.row_number().over(
+        partition_by=EngineCycle.engine_id,
+        order_by=EngineCycle.cycle.desc()
+    ).label('row_number')
+
+    ranked = db.session.query(
+        EngineCycle.id,
+        EngineCycle.engine_id,
+        *[getattr(EngineCycle, feature) for feature in features],
+        row_number
+    )
+    if engine_ids is not None:
+        ranked = ranked.filter(EngineCycle.engine_id.in_(engine_ids))
+    ranked = ranked.subquery()
+
+    rows = db.session.query(ranked.c.id, ranked.c.engine_id, *[ranked.c[feature] for feature in features]).\
+        filter(ranked.c.row_number <= window).\
+        order_by(ranked.c.engine_id, ranked.c.row_number.desc()).all()
+
+    scored_ids = []
+    latest_cycle_ids = []
+    sequences = []
+    start = 0
+    while start < len(rows):
+        engine_id = rows[start][1]
+        end = start
+        while end < len(rows) and rows[end][1] == engine_id:
+            end += 1
+
+        if end - start == window:
+            scored_ids.append(engine_id)
+            # Rows are chronological within an engine, so the last one is the latest
+            latest_cycle_ids.append(rows[end - 1][0])
+            sequences.append([[value if value is not None else 0 for value in row[2:]]
+                              for row in rows[start:end]])
+        start = end
+
+    X = np.array(sequences, dtype=np.float32).reshape(len(sequences), window, len(features))
+    return scored_ids, latest_cycle_ids, X
+
+def run_batch_predictions(engine_ids=None, batch_size=256):
+    """
+    Score many engines with one model forward pass per micro-batch and write
+    every result back in a single transaction. Engines are grouped by the
+    model registered for their engine model.
+
+    Args:
+        engine_ids (list): Engines to score, or None for the whole fleet
+        batch_size (int): Maximum number of windows per model call
+
+    Returns:
+        dict: Summary with the number of engines scored, skipped (unknown or
+            without a full window) and alerted, and the requested ids that
+            are not engines
+    """
+    engine_models = db.session.query(Engine.id, Engine.model)
+    if engine_ids is not None:
+        # A repeated id is still one engine
+        engine_ids = list(dict.fromkeys(engine_ids))
+        engine_models = engine_models.filter(Engine.id.in_(engine_ids))
+    engine_models = engine_models.all()
+    requested = len(engine_ids) if engine_ids is not None else len(engine_models)
+    found = {engine_id for engine_id, _ in engine_models}
+    missing = [engine_id for engine_id in engine_ids if engine_id not in found] if engine_ids is not None else []
+
+    # spec name -> (an engine model using it, engine ids)
+    groups = {}
+    for engine_id, engine_model in engine_models:
+        spec = model_registry.spec_for(engine_model)
+        groups.setdefault(spec.name, (engine_model, []))[1].append(engine_id)
+
+    scored_ids = []
+    latest_cycle_ids = []
+    predictions = []
+    for engine_model, group_ids in groups.values():
+        spec, ml_model = model_registry.get(engine_model)
+        # A fleet-wide run with a single model needs no IN list
+        group_filter = None if engine_ids is None and len(groups) == 1 else group_ids
+        group_scored, group_latest, X = fetch_windows(group_filter, spec.features, spec.window)
+        scored_ids.extend(group_scored)
+        latest_cycle_ids.extend(group_latest)
+        for start in range(0, len(X), batch_size):
+            predict_started = time.perf_counter()
+            predictions.append(np.asarray(ml_model.predict(X[start:start + batch_size], verbose=0)).reshape(-1))
+            metrics.record_inference(spec.name, time.perf_counter() - predict_started, len(X[start:start + batch_size]))
+
+    if not scored_ids:
+        return {'scored': 0, 'skipped': requested, 'missing': missing, 'alerts_created': 0}
+
+    predictions = np.concatenate(predictions)
+
+    try:
+        db.session.execute(update(EngineCycle), [
+            {'id': cycle_id, 'failure_probability': float(prob)}
+            for cycle_id, prob in zip(latest_cycle_ids, predictions)
+        ])
+        # One array pass over the prediction history of every scored engine
+        save_rul_estimates(estimate_rul(scored_ids))
+
+        # Create maintenance alerts for high-risk engines without an open one
+        at_risk = {engine_id: float(prob) for engine_id, prob in zip(scored_ids, predictions) if prob > 0.7}
+        alerts_created = 0
+        if at_risk:
+            already_alerted = {engine_id for (engine_id,) in db.session.query(Alert.engine_id).filter(
+                Alert.engine_id.in_(at_risk.keys()),
+                Alert.alert_type == 'maintenance_due',
+                Alert.resolved == False).distinct()}
+
+            engines = Engine.query.filter(Engine.id.in_(set(at_risk) - already_alerted)).all()
+            alerts = [build_maintenance_alert(engine, at_risk[engine.id]) for engine in engines]
+            db.session.add_all(alerts)
+            db.session.flush()
+            for alert in alerts:
+                events.publish_on_commit('alert.created', alert.to_dict())
+            alerts_created = len(alerts)
+
+        refresh_engine_health(scored_ids)
+        db.session.commit()
+        response_cache.invalidate('dashboard', 'alerts')
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'scored': len(scored_ids),
+        'skipped': requested - len(scored_ids),
+        'missing': missing,
+        'alerts_created': alerts_created,
+        'scored_at': datetime.utcnow().isoformat()
+    }
@@ -0,0 +1,150 @@
+import os
+import queue
+import threading
+from datetime import datetime
+
+
+class PredictionQueue:
+    """
+    In-process background queue that runs predictions off the request thread.
+
+    Requests for an engine that already has a queued (not yet running) job are
+    coalesced into that job, so a burst of cycles for one engine costs a single
+    inference. Job status is stored in the prediction_job table, so any
+    worker process can answer a poll. With PREDICTION_QUEUE_WORKERS set to 0
+    jobs run inline, which keeps tests and CLI scripts deterministic.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._queue = None
+        self._threads = []
+        self._pid = None
+        self._pending = {}  # engine_id -> id of its queued job
+        self._created = 0  # Jobs created by this process, to prune the history now and then
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('PREDICTION_QUEUE_WORKERS', 2)
+        self.history = app.config.get('PREDICTION_JOB_HISTORY', 1000)
+        app.extensions['prediction_queue'] = self
+
+    def enqueue(self, engine_id):
+        """
+        Schedule a prediction run for an engine. Commits the current
+        session, so call it after the request's own writes are committed.
+
+        Args:
+            engine_id (int): ID of the engine to score
+
+        Returns:
+            PredictionJob: The new job, or the queued job it was merged into
+        """
+        from app import db
+        from app.models.prediction_job import PredictionJob
+
+        with self._lock:
+            if self.workers > 0:
+                # Before touching _pending: starting the pool (first use or
+                # after a fork) resets it
+                self._ensure_workers()
+
+            job_id = self._pending.get(engine_id)
+            if job_id is not None:
+                PredictionJob.query.filter_by(id=job_id).update(
+                    {PredictionJob.requests: PredictionJob.requests + 1}, synchronize_session=False
+                )
+                db.session.commit()
+                return db.session.get(PredictionJob, job_id)
+
+            job = PredictionJob(engine_id=engine_id)
+            db.session.add(job)
+            db.session.commit()
+            job_id = job.id
+
+            self._created += 1
+            if self._created % max(self.history // 10, 1) == 0:
+                self._prune()
+
+            if self.workers <= 0:
+                run_inline = True
+            else:
+                run_inline = False
+                self._pending[engine_id] = job_id
+                self._queue.put((job_id, engine_id))
+
+        if run_inline:
+            self._run(job_id, engine_id)
+            # The run wrote the outcome through its own session
+            db.session.refresh(job)
+
+        return job
+
+    def _prune(self):
+        """Keep the status history bounded, dropping finished jobs past the newest PREDICTION_JOB_HISTORY"""
+        from app import db
+        from app.models.prediction_job import PredictionJob
+
+        cutoff = db.session.query(PredictionJob.created_at).order_by(
+            PredictionJob.created_at.desc()
+        ).offset(self.history).limit(1).scalar()
+        if cutoff is None:
+            return
+
+        PredictionJob.query.filter(
+            PredictionJob.created_at <= cutoff,
+            PredictionJob.status.notin_(('queued', 'running'))
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _ensure_workers(self):
+        # Threads do not survive a fork, so start a fresh pool per process
+        if self._pid == os.getpid() and self._threads:
+            return
+
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'prediction-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+        work = self._queue
+        while True:
+            job_id, engine_id = work.get()
+            with self._lock:
+                # Later requests for this engine must start a new job
+                if self._pending.get(engine_id) == job_id:
+                    del self._pending[engine_id]
+            try:
+                self._run(job_id, engine_id)
+            except Exception:
+                # Could not record the outcome; keep the worker alive
+                self.app.logger.exception('Could not update prediction job %s', job_id)
+            work.task_done()
+
+    def _run(self, job_id, engine_id):
+        from app import db
+        from app.models.prediction_job import PredictionJob
+        from app.services.prediction import run_predictions
+
+        def update(**values):
+            PredictionJob.query.filter_by(id=job_id).update(values, synchronize_session=False)
+            db.session.commit()
+
+        with self.app.app_context():
+            update(status='running', started_at=datetime.utcnow())
+            try:
+                outcome = run_predictions(engine_id)
+                values = {'status': outcome['status'], 'error': outcome.get('reason')}
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception('Prediction job %s for engine %s failed', job_id, engine_id)
+                values = {'status': 'failed', 'error': str(e)}
+            update(finished_at=datetime.utcnow(), **values)
@@ -0,0 +1,253 @@
+import heapq
+from operator import itemgetter
+import numpy as np
+from sqlalchemy import select, and_, or_, bindparam
+from app import db
+from app.models.engine import Engine, EngineCycle, SENSOR_KEYS
+from app.models.rollup import CycleRollup, ROLLUP_RESOLUTIONS
+from app.services.archive import find_segments, iter_segment_arrays, iter_archived_rows
+
+
+def update_rollups(rows):
+    """
+    Fold newly inserted cycles into the rollup buckets of their engines.
+
+    Only the buckets the new cycles fall into are read and rewritten, so the
+    cost does not depend on the length of the history: one query reads the
+    touched buckets of every resolution, then one multi-row UPDATE and one
+    multi-row INSERT write them. Every cycle must be new: a cycle that is
+    already counted would be counted twice. The caller commits.
+
+    Args:
+        rows (list): Cycle row dicts with engine_id, cycle and s1-s21
+    """
+    if not rows:
+        return
+
+    engine_ids = np.array([row['engine_id'] for row in rows], dtype=np.int64)
+    cycles = np.array([row['cycle'] for row in rows], dtype=np.int64)
+    X = np.array([[row.get(key) for key in SENSOR_KEYS] for row in rows], dtype=np.float64)
+
+    aggregates = {resolution: _aggregate(engine_ids, cycles, X, resolution) for resolution in ROLLUP_RESOLUTIONS}
+
+    table = CycleRollup.__table__
+    bucket_ranges = []
+    for resolution, buckets in aggregates.items():
+        numbers = [bucket for _, bucket in buckets]
+        bucket_ranges.append(and_(table.c.resolution == resolution,
+                                  table.c.bucket.between(min(numbers), max(numbers))))
+    stored = db.session.execute(select(
+        table.c.engine_id, table.c.resolution, table.c.bucket, table.c.cycle_count,
+        table.c.counts, table.c.min, table.c.max, table.c.total
+    ).where(table.c.engine_id.in_(set(engine_ids.tolist())), or_(*bucket_ranges)).with_for_update()).all()
+    existing = {(row.engine_id, row.resolution, row.bucket): row for row in stored}
+
+    inserts = []
+    updates = []
+    for resolution, buckets in aggregates.items():
+        for (engine_id, bucket), (cycle_count, counts, low, high, total) in buckets.items():
+            row = existing.get((engine_id, resolution, bucket))
+            if row is None:
+                inserts.append({
+                    'engine_id': engine_id, 'resolution': resolution, 'bucket': bucket, 'cycle_count': cycle_count,
+                    'counts': counts.tolist(), 'min': _to_json(low), 'max': _to_json(high), 'total': total.tolist()})
+                continue
+
+            updates.append({
+                'key_engine_id': engine_id, 'key_resolution': resolution, 'key_bucket': bucket,
+                'cycle_count': row.cycle_count + cycle_count,
+                'counts': (np.array(row.counts) + counts).tolist(),
+                'min': _to_json(np.fmin(_from_json(row.min), low)),
+                'max': _to_json(np.fmax(_from_json(row.max), high)),
+                'total': (np.array(row.total) + total).tolist()})
+
+    if updates:
+        db.session.execute(table.update().where(
+            table.c.engine_id == bindparam('key_engine_id'),
+            table.c.resolution == bindparam('key_resolution'),
+            table.c.bucket == bindparam('key_bucket')), updates)
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+
+
+def rebuild_rollups(engine_ids=None, chunk_size=50):
+    """
+    Recompute the rollups from the stored cycle history, archived cycles
+    included, e.g. to backfill them for an existing database.
+
+    Args:
+        engine_ids (list): Engines to rebuild, or None for the whole fleet
+        chunk_size (int): Engines read and written per round trip
+
+    Returns:
+        int: Number of engines processed
+    """
+    if engine_ids is None:
+        engine_ids = [engine_id for (engine_id,) in db.session.query(Engine.id).order_by(Engine.id).all()]
+        CycleRollup.query.delete()
+    else:
+        engine_ids = list(engine_ids)
+        CycleRollup.query.filter(CycleRollup.engine_id.in_(engine_ids)).delete()
+
+    columns = [EngineCycle.engine_id, EngineCycle.cycle] + [getattr(EngineCycle, key) for key in SENSOR_KEYS]
+    for start in range(0, len(engine_ids), chunk_size):
+        chunk = engine_ids[start:start + chunk_size]
+        rows = db.session.execute(select(*columns).where(EngineCycle.engine_id.in_(chunk))).all()
+        # Convert Rows to plain tuples first: NumPy probes each Row for the array
+        # interface, which is slow. NULL readings become NaN.
+        data = np.array([tuple(row) for row in rows], dtype=np.float64).reshape(-1, len(columns))
+        engine_column, cycles, X = [data[:, 0].astype(np.int64)], [data[:, 1].astype(np.int64)], [data[:, 2:]]
+
+        for engine_id, arrays in iter_segment_arrays(find_segments(chunk), ['cycle'] + SENSOR_KEYS):
+            engine_column.append(np.full(len(arrays['cycle']), engine_id, dtype=np.int64))
+            cycles.append(arrays['cycle'])
+            X.append(np.column_stack([arrays[key] for key in SENSOR_KEYS]))
+
+        rollups = build_rollup_rows(np.concatenate(engine_column), np.concatenate(cycles), np.concatenate(X))
+        if rollups:
+            db.session.execute(CycleRollup.__table__.insert(), rollups)
+        db.session.commit()
+
+    return len(engine_ids)
+
+
+def build_rollup_rows(engine_ids, cycles, X):
+    """
+    Rollup rows for the complete history of some engines, at every
+    resolution, ready for a multi-row INSERT into cycle_rollup.
+
+    Args:
+        engine_ids (ndarray): Engine ID of each cycle
+        cycles (ndarray): Cycle numbers
+        X (ndarray): Sensor readings s1-s21, one row per cycle, NaN for NULL
+
+    Returns:
+        list: Row dicts
+    """
+    rollups = []
+    for resolution in ROLLUP_RESOLUTIONS:
+        rollups.extend({
+            'engine_id': engine_id, 'resolution': resolution, 'bucket': bucket, 'cycle_count': cycle_count,
+            'counts': counts.tolist(), 'min': _to_json(low), 'max': _to_json(high), 'total': total.tolist()
+        } for (engine_id, bucket), (cycle_count, counts, low, high, total)
+            in _aggregate(engine_ids, cycles, X, resolution).items())
+    return rollups
+
+
+def choose_resolution(first_cycle, last_cycle, max_points):
+    """
+    The finest resolution that returns at most max_points points for a cycle
+    range: 1 (raw cycles) or one of ROLLUP_RESOLUTIONS. The coarsest rollup
+    is used when none fits.
+    """
+    span = max(0, last_cycle - first_cycle + 1)
+    if span <= max_points:
+        return 1
+    for resolution in ROLLUP_RESOLUTIONS:
+        # A range that is not bucket-aligned touches one extra bucket
+        if span // resolution + 1 <= max_points:
+            return resolution
+    return ROLLUP_RESOLUTIONS[-1]
+
+
+def get_trend(engine_id, sensors, resolution, from_cycle=None, to_cycle=None):
+    """
+    Min, max and mean of some sensors over an engine's history, one point per
+    bucket of `resolution` cycles.
+
+    Resolution 1 returns the raw readings (min, max and mean are equal),
+    archived ones included; the others read the rollup tables and never
+    touch the cycle history.
+    Buckets only partly inside [from_cycle, to_cycle] are returned whole.
+
+    Args:
+        engine_id (int): Engine ID
+        sensors (list): Sensor keys, e.g. ['s2', 's7']
+        resolution (int): 1 or one of ROLLUP_RESOLUTIONS
+        from_cycle (int): First cycle, inclusive
+        to_cycle (int): Last cycle, inclusive
+
+    Returns:
+        dict: Columnar series: 'cycle' (first cycle of each bucket),
+            'cycle_count', and {'min', 'max', 'mean'} lists per sensor
+    """
+    trend = {'cycle': [], 'cycle_count': []}
+    trend.update({sensor: {'min': [], 'max': [], 'mean': []} for sensor in sensors})
+
+    if resolution == 1:
+        stmt = select(EngineCycle.cycle, *[getattr(EngineCycle, sensor) for sensor in sensors]).where(
+            EngineCycle.engine_id == engine_id)
+        if from_cycle is not None:
+            stmt = stmt.where(EngineCycle.cycle >= from_cycle)
+        if to_cycle is not None:
+            stmt = stmt.where(EngineCycle.cycle <= to_cycle)
+
+        rows = db.session.execute(stmt.order_by(EngineCycle.cycle)).all()
+        segments = find_segments([engine_id], from_cycle, to_cycle)
+        if segments:
+            archived = (tuple(row[key] for key in ['cycle'] + sensors)
+                        for row in iter_archived_rows(segments, ['cycle'] + sensors, from_cycle, to_cycle))
+            rows = heapq.merge(archived, rows, key=itemgetter(0))
+
+        for row in rows:
+            trend['cycle'].append(row[0])
+            trend['cycle_count'].append(1)
+            for sensor, value in zip(sensors, row[1:]):
+                for stat in ('min', 'max', 'mean'):
+                    trend[sensor][stat].append(value)
+        return trend
+
+    query = CycleRollup.query.filter_by(engine_id=engine_id, resolution=resolution)
+    if from_cycle is not None:
+        query = query.filter(CycleRollup.bucket >= (from_cycle - 1) // resolution)
+    if to_cycle is not None:
+        query = query.filter(CycleRollup.bucket <= (to_cycle - 1) // resolution)
+
+    indexes = [SENSOR_KEYS.index(sensor) for sensor in sensors]
+    for rollup in query.order_by(CycleRollup.bucket):
+        trend['cycle'].append(rollup.bucket * resolution + 1)
+        trend['cycle_count'].append(rollup.cycle_count)
+        for sensor, index in zip(sensors, indexes):
+            count = rollup.counts[index]
+            trend[sensor]['min'].append(rollup.min[index])
+            trend[sensor]['max'].append(rollup.max[index])
+            trend[sensor]['mean'].append(rollup.total[index] / count if count else None)
+    return trend
+
+
+def _aggregate(engine_ids, cycles, X, resolution):
+    """
+    Per-bucket cycle count and per-sensor non-NULL counts, min, max and sum.
+
+    Returns:
+        dict: (engine_id, bucket) -> (cycle_count, counts, min, max, total)
+    """
+    if not len(cycles):
+        return {}
+
+    buckets = (cycles - 1) // resolution
+    order = np.lexsort((buckets, engine_ids))
+    engine_ids, buckets, X = engine_ids[order], buckets[order], X[order]
+
+    # Rows are now contiguous per (engine, bucket); aggregate each run with reduceat
+    starts = np.flatnonzero(np.r_[True, (engine_ids[1:] != engine_ids[:-1]) | (buckets[1:] != buckets[:-1])])
+    present = ~np.isnan(X)
+    cycle_counts = np.diff(np.r_[starts, len(cycles)])
+    counts = np.add.reduceat(present.astype(np.int64), starts)
+    low = np.fmin.reduceat(X, starts)
+    high = np.fmax.reduceat(X, starts)
+    total = np.add.reduceat(np.where(present, X, 0.0), starts)
+
+    return {
+        (int(engine_ids[start]), int(buckets[start])): (int(cycle_counts[i]), counts[i], low[i], high[i], total[i])
+        for i, start in enumerate(starts)
+    }
+
+
+def _to_json(values):
+    # All-NULL sensors have no min or max
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def _from_json(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
@@ -0,0 +1,324 @@
+import numpy as np
+from statistics import NormalDist
+from flask import current_app
+from sqlalchemy import update
+from app import db, response_cache
+from app.models.engine import Engine, EngineCycle
+from app.models.maintenance import Maintenance
+from app.models.rul import RulEstimate, RulCalibration
+from app.services.health import refresh_engine_health
+from app.services.archive import find_segments, iter_segment_arrays
+
+# Maintenance that ends a degradation run, used as the failure event for calibration
+FAILURE_MAINTENANCE_TYPES = ('unscheduled',)
+
+
+def heuristic_rul(failure_prob):
+    """
+    RUL from the latest failure probability alone: 30 cycles at p <= 0.5,
+    falling linearly to 0 at p = 1. Used when an engine has too little
+    prediction history for a trend.
+
+    Args:
+        failure_prob (ndarray): Failure probabilities
+
+    Returns:
+        ndarray: RUL in cycles
+    """
+    failure_prob = np.asarray(failure_prob, dtype=np.float64)
+    return np.where(failure_prob > 0.5, np.maximum(0.0, 30 * (2 - 2 * failure_prob)), 30.0)
+
+
+def fit_trends(cycles, probs):
+    """
+    Least-squares line through each row of failure probability history, for
+    all rows at once.
+
+    Args:
+        cycles (ndarray): (N, K) cycle numbers, NaN where a row has fewer
+            than K points
+        probs (ndarray): (N, K) failure probabilities, NaN alike
+
+    Returns:
+        tuple: (count, slope, fitted probability at the latest cycle,
+            standard error of the slope), each of shape (N,). Slope and
+            standard error are NaN for rows with fewer than 3 points or a
+            single distinct cycle.
+    """
+    present = ~np.isnan(cycles) & ~np.isnan(probs)
+    count = present.sum(axis=1)
+    safe_count = np.maximum(count, 1)
+
+    x = np.where(present, cycles, 0.0)
+    y = np.where(present, probs, 0.0)
+    x_mean = x.sum(axis=1) / safe_count
+    y_mean = y.sum(axis=1) / safe_count
+    dx = np.where(present, x - x_mean[:, None], 0.0)
+    dy = np.where(present, y - y_mean[:, None], 0.0)
+    sxx = (dx * dx).sum(axis=1)
+    sxy = (dx * dy).sum(axis=1)
+
+    valid = (count >= 3) & (sxx > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(valid, sxy / sxx, np.nan)
+        residuals = np.where(present, dy - slope[:, None] * dx, 0.0)
+        variance = (residuals * residuals).sum(axis=1) / np.maximum(count - 2, 1)
+        stderr = np.where(valid, np.sqrt(variance / sxx), np.nan)
+
+    latest = np.where(present, cycles, -np.inf).max(axis=1)
+    fitted = y_mean + np.nan_to_num(slope) * (latest - x_mean)
+    return count, slope, fitted, stderr
+
+
+def trend_rul(cycles, probs, threshold=1.0, min_points=5):
+    """
+    Uncalibrated RUL for each history row: cycles until the fitted failure
+    probability line reaches `threshold`. NaN where the row has fewer than
+    min_points points or no rising trend.
+
+    Returns:
+        tuple: (rul, slope, fitted probability at the latest cycle, stderr)
+    """
+    count, slope, fitted, stderr = fit_trends(cycles, probs)
+    fitted = np.clip(fitted, 0.0, threshold)
+    rising = (count >= min_points) & (slope > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rul = np.where(rising, (threshold - fitted) / slope, np.nan)
+    return rul, slope, fitted, stderr
+
+
+def load_probability_history(engine_ids=None, points=20):
+    """
+    The latest `points` predictions of many engines with one windowed query.
+
+    Returns:
+        tuple: (engine_ids, latest_cycle_ids, cycles, probs) where cycles and
+            probs are (N, points) arrays in chronological order, left-padded
+            with NaN for engines with fewer predictions
+    """
+    row_number = db.func.row_number().over(
+        partition_by=EngineCycle.engine_id,
+        order_by=EngineCycle.cycle.desc()
+    ).label('row_number')
+
+    ranked = db.session.query(
+        EngineCycle.id, EngineCycle.engine_id, EngineCycle.cycle, EngineCycle.failure_probability, row_number
+    ).filter(EngineCycle.failure_probability != None)
+    if engine_ids is not None:
+        ranked = ranked.filter(EngineCycle.engine_id.in_(engine_ids))
+    ranked = ranked.subquery()
+
+    rows = db.session.query(ranked.c.id, ranked.c.engine_id, ranked.c.cycle, ranked.c.failure_probability,
+                            ranked.c.row_number).\
+        filter(ranked.c.row_number <= points).\
+        order_by(ranked.c.engine_id, ranked.c.row_number).all()
+    if not rows:
+        return [], [], np.empty((0, points)), np.empty((0, points))
+
+    data = np.array([tuple(row) for row in rows], dtype=np.float64)
+    ids, row_index = np.unique(data[:, 1].astype(np.int64), return_inverse=True)
+    # row_number 1 is the latest prediction; put it in the last column
+    column = points - data[:, 4].astype(np.int64)
+
+    cycles = np.full((len(ids), points), np.nan)
+    probs = np.full((len(ids), points), np.nan)
+    cycles[row_index, column] = data[:, 2]
+    probs[row_index, column] = data[:, 3]
+    latest_cycle_ids = np.zeros(len(ids), dtype=np.int64)
+    latest = data[:, 4] == 1
+    latest_cycle_ids[row_index[latest]] = data[latest, 0].astype(np.int64)
+
+    return ids.tolist(), latest_cycle_ids.tolist(), cycles, probs
+
+
+def estimate_rul(engine_ids=None):
+    """
+    RUL with a confidence interval for many engines in one array pass.
+
+    A line is fitted through each engine's latest RUL_HISTORY_POINTS failure
+    probabilities; RUL is the number of cycles until it reaches
+    RUL_FAILURE_THRESHOLD, scaled by the engine model's calibration. The
+    interval combines the slope's standard error with the calibration's
+    residual spread at RUL_CONFIDENCE. Engines with fewer than
+    RUL_MIN_POINTS predictions or no rising trend fall back to the
+    heuristic on their latest probability, without an interval.
+
+    Args:
+        engine_ids (list): Engines to estimate, or None for the whole fleet
+
+    Returns:
+        list: One dict per engine with a prediction: engine_id,
+            latest_cycle_id, cycle, rul, rul_lower, rul_upper, slope, method
+    """
+    config = current_app.config
+    threshold = config['RUL_FAILURE_THRESHOLD']
+    max_cycles = config['RUL_MAX_CYCLES']
+    z = NormalDist().inv_cdf(0.5 + config['RUL_CONFIDENCE'] / 2)
+
+    ids, latest_cycle_ids, cycles, probs = load_probability_history(engine_ids, config['RUL_HISTORY_POINTS'])
+    if not ids:
+        return []
+
+    rul, slope, fitted, stderr = trend_rul(cycles, probs, threshold, config['RUL_MIN_POINTS'])
+
+    # Per-engine calibration, looked up through the engine model
+    calibrations = {calibration.engine_model: calibration for calibration in RulCalibration.query.all()}
+    engine_models = dict(db.session.query(Engine.id, Engine.model).filter(Engine.id.in_(ids)).all())
+    scale = np.array([calibrations[engine_models.get(engine_id)].scale
+                      if engine_models.get(engine_id) in calibrations else 1.0 for engine_id in ids])
+    spread = np.array([calibrations[engine_models.get(engine_id)].spread
+                       if engine_models.get(engine_id) in calibrations else 0.0 for engine_id in ids])
+
+    remaining = threshold - fitted
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # A steeper slope means an earlier failure, so the upper slope bounds the lower RUL
+        lower = scale * remaining / (slope + z * stderr)
+        upper = np.where(slope - z * stderr > 0, scale * remaining / (slope - z * stderr), max_cycles)
+    rul = np.clip(scale * rul, 0.0, max_cycles)
+    lower = np.clip(np.minimum(lower, rul * (1 - z * spread)), 0.0, max_cycles)
+    upper = np.clip(np.maximum(upper, rul * (1 + z * spread)), 0.0, max_cycles)
+
+    trend = ~np.isnan(rul)
+    latest_probs = probs[:, -1]
+    fallback = heuristic_rul(latest_probs)
+
+    return [{
+        'engine_id': engine_id,
+        'latest_cycle_id': latest_cycle_ids[i],
+        'cycle': int(cycles[i, -1]),
+        'rul': float(rul[i]) if trend[i] else float(fallback[i]),
+        'rul_lower': float(lower[i]) if trend[i] else None,
+        'rul_upper': float(upper[i]) if trend[i] else None,
+        'slope': None if np.isnan(slope[i]) else float(slope[i]),
+        'method': 'trend' if trend[i] else 'heuristic'
+    } for i, engine_id in enumerate(ids)]
+
+
+def save_rul_estimates(estimates):
+    """
+    Store estimates in rul_estimate and on the latest predicted cycle's rul
+    column. The caller refreshes the health snapshot and commits.
+    """
+    if not estimates:
+        return
+
+    db.session.execute(update(EngineCycle), [
+        {'id': estimate['latest_cycle_id'], 'rul': estimate['rul']} for estimate in estimates
+    ])
+
+    existing = {row.engine_id: row for row in RulEstimate.query.filter(
+        RulEstimate.engine_id.in_([estimate['engine_id'] for estimate in estimates]))}
+    for estimate in estimates:
+        row = existing.get(estimate['engine_id'])
+        if row is None:
+            row = RulEstimate(engine_id=estimate['engine_id'])
+            db.session.add(row)
+        for key in ('cycle', 'rul', 'rul_lower', 'rul_upper', 'slope', 'method'):
+            setattr(row, key, estimate[key])
+
+
+def refresh_rul(engine_ids=None, chunk_size=1000):
+    """
+    Recompute RUL for many engines from their stored prediction history,
+    e.g. after a new calibration.
+
+    Returns:
+        dict: Number of engines per estimation method
+    """
+    if engine_ids is None:
+        engine_ids = [engine_id for (engine_id,) in db.session.query(Engine.id).order_by(Engine.id).all()]
+    engine_ids = list(engine_ids)
+
+    methods = {'trend': 0, 'heuristic': 0}
+    for start in range(0, len(engine_ids), chunk_size):
+        chunk = engine_ids[start:start + chunk_size]
+        estimates = estimate_rul(chunk)
+        save_rul_estimates(estimates)
+        refresh_engine_health(chunk)
+        db.session.commit()
+        for estimate in estimates:
+            methods[estimate['method']] += 1
+
+    response_cache.invalidate('dashboard', 'alerts')
+    return methods
+
+
+def fit_rul_calibration(min_samples=20):
+    """
+    Fit each engine model's RUL calibration on past failures, replacing the
+    stored ones.
+
+    Every unscheduled maintenance record with a cycle count ends a run.
+    Prediction history is read from engine_cycle and from archived cycles,
+    since older runs have usually been archived. For each prediction in that run a trend RUL is computed from the
+    history available at the time (one array pass per run) and compared
+    with the cycles that actually remained. The scale is the least-squares
+    ratio of observed to estimated RUL; the spread is the standard
+    deviation of the remaining relative error. Engine models with fewer
+    than min_samples comparisons are not calibrated.
+
+    Returns:
+        dict: {engine_model: (scale, spread, samples)} for the models fitted
+    """
+    config = current_app.config
+    points = config['RUL_HISTORY_POINTS']
+    threshold = config['RUL_FAILURE_THRESHOLD']
+    max_cycles = config['RUL_MAX_CYCLES']
+
+    failures = db.session.query(Maintenance.engine_id, Maintenance.cycle_count, Engine.model).\
+        join(Engine, Engine.id == Maintenance.engine_id).\
+        filter(Maintenance.maintenance_type.in_(FAILURE_MAINTENANCE_TYPES), Maintenance.cycle_count != None).\
+        order_by(Maintenance.engine_id, Maintenance.cycle_count).all()
+
+    failed_engines = {engine_id for engine_id, _, _ in failures}
+    history = {}
+    # Archived cycles are older than every cycle left in the table
+    for engine_id, arrays in iter_segment_arrays(find_segments(failed_engines),
+                                                 columns=['cycle', 'failure_probability']):
+        predicted = ~np.isnan(arrays['failure_probability'])
+        history.setdefault(engine_id, []).extend(
+            zip(arrays['cycle'][predicted].tolist(), arrays['failure_probability'][predicted].tolist())
+        )
+    for engine_id, cycle, prob in db.session.query(EngineCycle.engine_id, EngineCycle.cycle,
+                                                   EngineCycle.failure_probability).\
+            filter(EngineCycle.engine_id.in_(failed_engines),
+                   EngineCycle.failure_probability != None).\
+            order_by(EngineCycle.engine_id, EngineCycle.cycle):
+        history.setdefault(engine_id, []).append((cycle, prob))
+
+    samples = {}  # engine model -> ([estimated], [observed])
+    previous_failure = {}
+    for engine_id, failure_cycle, engine_model in failures:
+        run_start = previous_failure.get(engine_id, 0)
+        previous_failure[engine_id] = failure_cycle
+        run = np.array([point for point in history.get(engine_id, [])
+                        if run_start < point[0] <= failure_cycle], dtype=np.float64).reshape(-1, 2)
+        if len(run) == 0:
+            continue
+
+        # Row j holds the latest `points` predictions up to prediction j
+        padded = np.vstack([np.full((points - 1, 2), np.nan), run])
+        windows = np.lib.stride_tricks.sliding_window_view(padded, points, axis=0)  # (len(run), 2, points)
+        estimated, _, _, _ = trend_rul(windows[:, 0, :], windows[:, 1, :], threshold, config['RUL_MIN_POINTS'])
+        observed = failure_cycle - run[:, 0]
+
+        usable = ~np.isnan(estimated) & (estimated > 0) & (estimated < max_cycles)
+        model_samples = samples.setdefault(engine_model, ([], []))
+        model_samples[0].extend(estimated[usable])
+        model_samples[1].extend(observed[usable])
+
+    RulCalibration.query.delete()
+    fitted = {}
+    for engine_model, (estimated, observed) in samples.items():
+        if engine_model is None or len(estimated) < min_samples:
+            continue
+        estimated = np.array(estimated)
+        observed = np.array(observed)
+        scale = float((estimated * observed).sum() / (estimated * estimated).sum())
+        spread = float(np.std(observed / (scale * estimated) - 1))
+        db.session.add(RulCalibration(engine_model=engine_model, scale=scale, spread=spread,
+                                      samples=len(estimated)))
+        fitted[engine_model] = (scale, spread, len(estimated))
+    db.session.commit()
+
+    return fitted
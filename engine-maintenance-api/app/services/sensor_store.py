@@ -0,0 +1,348 @@
+import os
+import tempfile
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.models.engine import Engine, EngineCycle, SENSOR_KEYS, SETTING_KEYS
+from app.services.archive import find_segments, iter_segment_arrays
+
+# Matrix columns: sensor s<i> is column i - 1, then the three settings
+STORE_COLUMNS = SENSOR_KEYS + SETTING_KEYS
+
+# Data files carry a generation number that changes on every rebuild, so a
+# rebuild never truncates a file that readers may have mapped
+SENSORS_FILE = 'sensors.{generation}.f32'  # float32 [rows x 24], row-major
+CYCLES_FILE = 'cycles.{generation}.i32'  # int32 cycle number of each row
+INDEX_FILE = 'index.npz'
+
+ROW_BYTES = len(STORE_COLUMNS) * 4
+
+
+class SensorStore:
+    """
+    Read-only, memory-mapped view of the fleet's sensor history, written by
+    update_sensor_store().
+
+    Each engine's cycles are contiguous rows of one float32 matrix in cycle
+    order, so history() and windows() return views into the mapped file:
+    nothing is copied or read until the model touches it. NULL readings are
+    NaN. The store is a snapshot as of the last update; open it again to see
+    appended cycles.
+
+        store = SensorStore.open()
+        spec, ml_model = model_registry.get(engine_model)
+        cycles, X = store.windows(engine_id, spec.window, spec.features)
+        probs = ml_model.predict(X)
+    """
+
+    def __init__(self, path, index, sensors, cycles):
+        self.path = path
+        self.engine_ids = index['engine_id']
+        self.offsets = index['offset']
+        self.lengths = index['length']
+        self.sensors = sensors
+        self.cycles = cycles
+        self._positions = {int(engine_id): i for i, engine_id in enumerate(self.engine_ids)}
+
+    @classmethod
+    def open(cls, path=None):
+        """
+        Map the store at path (default SENSOR_STORE_DIR).
+
+        Raises:
+            FileNotFoundError: If no store has been written there yet
+        """
+        path = path or current_app.config['SENSOR_STORE_DIR']
+        index = _read_index(path)
+        if index is None:
+            raise FileNotFoundError(f'No sensor store at {path}; run flask export-sensor-store first')
+
+        rows = int(index['rows'])
+        generation = int(index['generation'])
+        if rows == 0:
+            sensors = np.empty((0, len(STORE_COLUMNS)), dtype=np.float32)
+            cycles = np.empty(0, dtype=np.int32)
+        else:
+            sensors = np.memmap(os.path.join(path, SENSORS_FILE.format(generation=generation)), dtype=np.float32,
+                                mode='r', shape=(rows, len(STORE_COLUMNS)))
+            cycles = np.memmap(os.path.join(path, CYCLES_FILE.format(generation=generation)), dtype=np.int32,
+                               mode='r', shape=(rows,))
+        return cls(path, index, sensors, cycles)
+
+    def __contains__(self, engine_id):
+        return engine_id in self._positions
+
+    def __len__(self):
+        return len(self.engine_ids)
+
+    def history(self, engine_id, features=None):
+        """
+        An engine's full history.
+
+        Args:
+            engine_id (int): Engine ID
+            features (list): Columns to return, e.g. ['s2'], defaults to all
+                of STORE_COLUMNS. Adjacent columns (e.g. s2-s4) come back as a
+                view; any other selection is copied.
+
+        Returns:
+            tuple: (cycles, X) with shapes (n,) and (n, features)
+        """
+        position = self._positions.get(engine_id)
+        if position is None:
+            raise KeyError(f'Engine {engine_id} is not in the sensor store')
+
+        start = int(self.offsets[position])
+        end = start + int(self.lengths[position])
+        return self.cycles[start:end], _select_columns(self.sensors[start:end], features)
+
+    def windows(self, engine_id, window, features=('s2',), step=1):
+        """
+        Sliding windows over an engine's history, shaped for model input.
+
+        Windows follow row order; if the stored history has gaps in its cycle
+        numbers, a window spans them (compare the cycles of its ends to skip
+        such windows).
+
+        Args:
+            engine_id (int): Engine ID
+            window (int): Time steps per window, e.g. ModelSpec.window
+            features (list): Input features, e.g. ModelSpec.features
+            step (int): Cycles between consecutive windows
+
+        Returns:
+            tuple: (cycles, X) where cycles[i] is the last cycle of window i
+                and X is a (windows, window, features) float32 view
+        """
+        cycles, X = self.history(engine_id, features)
+        if len(X) < window:
+            return cycles[:0], np.empty((0, window, X.shape[1]), dtype=np.float32)
+
+        # (n - window + 1, features, window) -> (n - window + 1, window, features), still a view
+        views = sliding_window_view(X, window, axis=0).transpose(0, 2, 1)
+        return cycles[window - 1::step], views[::step]
+
+    def iter_windows(self, window, features=('s2',), step=1, engine_ids=None):
+        """
+        windows() for many engines, e.g. to back-test a model over the fleet
+        or to build a training set.
+
+        Yields:
+            tuple: (engine_id, cycles, X) for every engine with at least one
+                full window
+        """
+        for engine_id in self.engine_ids if engine_ids is None else engine_ids:
+            engine_id = int(engine_id)
+            if engine_id not in self._positions:
+                continue
+            cycles, X = self.windows(engine_id, window, features, step)
+            if len(X):
+                yield engine_id, cycles, X
+
+
+def update_sensor_store(path=None, engine_ids=None, rebuild=False, chunk_size=200):
+    """
+    Append every cycle newer than the store's last cycle of each engine,
+    reading the cycle table and the archive. The first run (or rebuild=True)
+    writes the whole fleet history.
+
+    Each engine owns a contiguous block of rows with spare capacity, so
+    appends are written in place. An engine that outgrows its block is moved
+    to the end of the file with room to grow; its old block is left behind
+    until the next rebuild. Data is written before the index, which is
+    replaced atomically, so readers never see a partial update; a rebuild
+    writes new files and removes the old ones once the index points away
+    from them. Only one update may run at a time.
+
+    Cycles older than an engine's last stored cycle (late backfills) are not
+    picked up; run with rebuild=True after loading such history.
+
+    Args:
+        path (str): Store directory, defaults to SENSOR_STORE_DIR
+        engine_ids (list): Engines to update, or None for the whole fleet
+        rebuild (bool): Discard the store and write it from scratch; always
+            covers the whole fleet
+        chunk_size (int): Engines read per round trip
+
+    Returns:
+        dict: Number of engines and cycles appended, and rows in the file
+    """
+    if rebuild and engine_ids is not None:
+        raise ValueError('A rebuild covers the whole fleet; do not pass engine_ids')
+
+    path = path or current_app.config['SENSOR_STORE_DIR']
+    os.makedirs(path, exist_ok=True)
+
+    index = _read_index(path)
+    previous_generation = None if index is None else int(index['generation'])
+    if index is None or rebuild:
+        generation = 0 if index is None else previous_generation + 1
+        entries = {}
+        rows = 0
+        for name in (SENSORS_FILE, CYCLES_FILE):
+            open(os.path.join(path, name.format(generation=generation)), 'wb').close()
+    else:
+        generation = previous_generation
+        entries = {int(engine_id): [int(offset), int(length), int(capacity), int(last_cycle)]
+                   for engine_id, offset, length, capacity, last_cycle in zip(
+                       index['engine_id'], index['offset'], index['length'], index['capacity'], index['last_cycle'])}
+        rows = int(index['rows'])
+
+    if engine_ids is None:
+        engine_ids = [engine_id for (engine_id,) in db.session.query(Engine.id).order_by(Engine.id).all()]
+    engine_ids = list(engine_ids)
+
+    summary = {'engines': 0, 'cycles': 0}
+    with open(os.path.join(path, SENSORS_FILE.format(generation=generation)), 'r+b') as sensors_file, \
+            open(os.path.join(path, CYCLES_FILE.format(generation=generation)), 'r+b') as cycles_file:
+        files = (sensors_file, cycles_file)
+
+        for start in range(0, len(engine_ids), chunk_size):
+            chunk = engine_ids[start:start + chunk_size]
+            # New engines read their whole history, the others only what is
+            # newer than the least advanced of them
+            new_engines = {engine_id: 0 for engine_id in chunk if engine_id not in entries}
+            known_engines = {engine_id: entries[engine_id][3] for engine_id in chunk if engine_id in entries}
+
+            for engine_id, cycles, X in _read_new_cycles(new_engines) + _read_new_cycles(known_engines):
+                entry = entries.get(engine_id)
+                if entry is None:
+                    entry = entries[engine_id] = [rows, 0, _capacity(len(cycles)), 0]
+                    rows += entry[2]
+                    _resize(files, rows)
+                elif entry[1] + len(cycles) > entry[2]:
+                    # Out of room: move the block to the end, with room to grow
+                    offset, length, _, _ = entry
+                    entry[0], entry[2] = rows, _capacity(length + len(cycles))
+                    rows += entry[2]
+                    _resize(files, rows)
+                    old_cycles, old_X = _read_rows(files, offset, length)
+                    _write_rows(files, entry[0], old_cycles, old_X)
+
+                _write_rows(files, entry[0] + entry[1], cycles, X)
+                entry[1] += len(cycles)
+                entry[3] = int(cycles[-1])
+                summary['engines'] += 1
+                summary['cycles'] += len(cycles)
+
+        for f in files:
+            f.flush()
+            os.fsync(f.fileno())
+
+    _write_index(path, entries, rows, generation)
+    if previous_generation is not None and previous_generation != generation:
+        # Readers that mapped the old files keep them until they close them
+        for name in (SENSORS_FILE, CYCLES_FILE):
+            os.remove(os.path.join(path, name.format(generation=previous_generation)))
+
+    summary['rows'] = rows
+    return summary
+
+
+def _read_new_cycles(last_cycles):
+    """
+    Cycles after each engine's last stored cycle, from the cycle table and
+    the archive.
+
+    Returns:
+        list: (engine_id, cycles, X) per engine with new cycles, in cycle
+            order, X as float32 with NaN for NULL
+    """
+    if not last_cycles:
+        return []
+
+    engine_ids = list(last_cycles)
+    # One range query for the chunk; engines that are further along are
+    # trimmed below
+    lowest = min(last_cycles.values())
+
+    columns = [EngineCycle.engine_id, EngineCycle.cycle] + [getattr(EngineCycle, key) for key in STORE_COLUMNS]
+    rows = db.session.execute(select(*columns).where(
+        EngineCycle.engine_id.in_(engine_ids), EngineCycle.cycle > lowest)).all()
+    # Plain tuples first: NumPy probes each Row for the array interface, which is slow
+    data = np.array([tuple(row) for row in rows], dtype=np.float64).reshape(-1, len(columns))
+    engine_column, cycles, X = [data[:, 0].astype(np.int64)], [data[:, 1].astype(np.int64)], [data[:, 2:]]
+
+    for engine_id, arrays in iter_segment_arrays(find_segments(engine_ids, from_cycle=lowest + 1),
+                                                 ['cycle'] + STORE_COLUMNS, from_cycle=lowest + 1):
+        engine_column.append(np.full(len(arrays['cycle']), engine_id, dtype=np.int64))
+        cycles.append(arrays['cycle'])
+        X.append(np.column_stack([arrays[key] for key in STORE_COLUMNS]))
+
+    engine_column, cycles, X = np.concatenate(engine_column), np.concatenate(cycles), np.concatenate(X)
+    last = np.array([last_cycles[engine_id] for engine_id in engine_column.tolist()], dtype=np.int64)
+    new = cycles > last
+    engine_column, cycles, X = engine_column[new], cycles[new], X[new]
+
+    if not len(cycles):
+        return []
+
+    order = np.lexsort((cycles, engine_column))
+    engine_column, cycles, X = engine_column[order], cycles[order], X[order].astype(np.float32)
+    starts = np.flatnonzero(np.r_[True, engine_column[1:] != engine_column[:-1]])
+    ends = np.r_[starts[1:], len(cycles)]
+    return [(int(engine_column[start]), cycles[start:end], X[start:end]) for start, end in zip(starts, ends)]
+
+
+def _capacity(length):
+    # A quarter (at least 64 cycles) of headroom keeps moves rare
+    return length + max(64, length // 4)
+
+
+def _resize(files, rows):
+    sensors_file, cycles_file = files
+    sensors_file.truncate(rows * ROW_BYTES)
+    cycles_file.truncate(rows * 4)
+
+
+def _write_rows(files, offset, cycles, X):
+    sensors_file, cycles_file = files
+    sensors_file.seek(offset * ROW_BYTES)
+    sensors_file.write(np.ascontiguousarray(X, dtype=np.float32).tobytes())
+    cycles_file.seek(offset * 4)
+    cycles_file.write(np.ascontiguousarray(cycles, dtype=np.int32).tobytes())
+
+
+def _read_rows(files, offset, length):
+    sensors_file, cycles_file = files
+    sensors_file.seek(offset * ROW_BYTES)
+    X = np.frombuffer(sensors_file.read(length * ROW_BYTES), dtype=np.float32).reshape(length, len(STORE_COLUMNS))
+    cycles_file.seek(offset * 4)
+    cycles = np.frombuffer(cycles_file.read(length * 4), dtype=np.int32)
+    return cycles, X
+
+
+def _read_index(path):
+    index_path = os.path.join(path, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    with np.load(index_path) as index:
+        if list(index['columns']) != STORE_COLUMNS:
+            raise ValueError(f'Sensor store at {path} has a different column layout; rebuild it')
+        return {key: index[key] for key in index.files}
+
+
+def _write_index(path, entries, rows, generation):
+    engine_ids = sorted(entries)
+    values = np.array([entries[engine_id] for engine_id in engine_ids], dtype=np.int64).reshape(-1, 4)
+    fd, temp_path = tempfile.mkstemp(dir=path, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, engine_id=np.array(engine_ids, dtype=np.int64), offset=values[:, 0], length=values[:, 1],
+                     capacity=values[:, 2], last_cycle=values[:, 3], rows=np.int64(rows),
+                     generation=np.int64(generation), columns=np.array(STORE_COLUMNS))
+        os.replace(temp_path, os.path.join(path, INDEX_FILE))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _select_columns(X, features):
+    if features is None:
+        return X
+    positions = [STORE_COLUMNS.index(feature) for feature in features]
+    if positions == list(range(positions[0], positions[0] + len(positions))):
+        return X[:, positions[0]:positions[0] + len(positions)]
+    return X[:, positions]
@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class EngineWindow:
+    """
+    Ring buffer holding the latest `size` s2 readings of one engine.
+
+    Every value is written twice, at i and i + size, so the chronological
+    window is always the contiguous slice buffer[head:head + size] and never
+    needs to be rebuilt.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = np.zeros(2 * size, dtype=np.float32)
+        self.head = 0  # Index of the oldest value in the window
+        self.count = 0
+        self.latest_cycle = None
+
+    def append(self, cycle, value):
+        """
+        Push the reading for a new cycle in O(1).
+
+        Returns:
+            bool: False if the cycle is not the next one in sequence (a gap,
+                a duplicate or an out-of-order write); the caller then
+                reloads the window from the database.
+        """
+        if self.latest_cycle is not None and cycle != self.latest_cycle + 1:
+            return False
+
+        value = 0.0 if value is None else value
+        if self.count < self.size:
+            position = self.count
+            self.count += 1
+        else:
+            position = self.head
+            self.head = (self.head + 1) % self.size
+
+        self.values[position] = value
+        self.values[position + self.size] = value
+        self.latest_cycle = cycle
+        return True
+
+    def window(self):
+        """The readings in chronological order, oldest first"""
+        return self.values[self.head:self.head + self.count]
+
+
+class WindowCache:
+    """
+    Per-engine cache of the model input window, kept in process memory.
+
+    The database stays the durable copy: an engine is loaded from its latest
+    cycles on first use, and reloaded whenever an append does not follow the
+    cached window (e.g. another worker process ingested cycles meanwhile, or a
+    cycle arrived out of order). The number of cached engines is capped with
+    LRU eviction.
+    """
+
+    def __init__(self, app=None, size=50):
+        self.size = size
+        self.max_engines = 10000
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_engines = app.config.get('PREDICTION_WINDOW_CACHE_ENGINES', 10000)
+        app.extensions['window_cache'] = self
+
+    def append(self, engine_id, cycle, value):
+        """Record a newly stored cycle for an engine whose window is cached"""
+        with self._lock:
+            window = self._windows.get(engine_id)
+            if window is not None and not window.append(cycle, value):
+                # Drop it; the next read reloads the correct window from the DB
+                del self._windows[engine_id]
+
+    def extend(self, engine_id, readings):
+        """Record several (cycle, value) pairs, e.g. from a bulk insert"""
+        for cycle, value in sorted(readings):
+            self.append(engine_id, cycle, value)
+
+    def invalidate(self, engine_id):
+        with self._lock:
+            self._windows.pop(engine_id, None)
+
+    def get(self, engine_id):
+        """
+        Return (latest_cycle, window) for an engine, loading it from the
+        database on a cold start.
+
+        Returns:
+            tuple: (latest_cycle, ndarray of up to `size` readings), or
+                (None, empty array) if the engine has no cycles
+        """
+        with self._lock:
+            window = self._windows.get(engine_id)
+            if window is not None:
+                self._windows.move_to_end(engine_id)
+                return window.latest_cycle, window.window().copy()
+
+        window = self._load(engine_id)
+
+        with self._lock:
+            self._windows[engine_id] = window
+            while len(self._windows) > self.max_engines:
+                self._windows.popitem(last=False)
+            return window.latest_cycle, window.window().copy()
+
+    def _load(self, engine_id):
+        from app import db
+        from app.models.engine import EngineCycle
+
+        rows = db.session.query(EngineCycle.cycle, EngineCycle.s2).\
+            filter_by(engine_id=engine_id).order_by(EngineCycle.cycle.desc()).limit(self.size).all()
+
+        window = EngineWindow(self.size)
+        for cycle, value in reversed(rows):
+            # Rebuild from storage as-is, even if stored cycles are not consecutive
+            window.latest_cycle = None
+            window.append(cycle, value)
+        return window
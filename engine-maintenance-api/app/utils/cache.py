@@ -0,0 +1,217 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from importlib import import_module
+from flask import request, current_app
+
+
+class MemoryCacheBackend:
+    """In-process cache with a TTL per key and LRU eviction"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileVersionStamps:
+    """
+    Tag versions shared by every process on the host, for the in-process
+    backend: each gunicorn worker has its own cache, but all of them (and CLI
+    commands) see the same stamps, so a write in one process invalidates the
+    others.
+
+    A tag is a file that grows by one byte per invalidation; its version is
+    (inode, size, mtime), read with a single stat(). Appends are atomic, so
+    concurrent invalidations are never lost. Past rotate_bytes the file is
+    replaced by a fresh one; the inode may be reused, but the newer mtime
+    still makes it a new version.
+    """
+
+    def __init__(self, directory, rotate_bytes=1 << 20):
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+
+    def get(self, tag):
+        try:
+            stat = os.stat(self._path(tag))
+        except FileNotFoundError:
+            return '0'
+        return f'{stat.st_ino}.{stat.st_size}.{stat.st_mtime_ns}'
+
+    def bump(self, tag):
+        path = self._path(tag)
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b'.')
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+        if size >= self.rotate_bytes:
+            fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=f'{tag}.', suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(b'.')
+            os.replace(temporary, path)
+
+    def _path(self, tag):
+        return os.path.join(self.directory, tag)
+
+
+class BackendVersions:
+    """Tag versions kept in the cache backend itself, for shared backends"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, tag):
+        return self.backend.get(f'version:{tag}') or 0
+
+    def bump(self, tag):
+        self.backend.set(f'version:{tag}', self.get(tag) + 1)
+
+
+class CachedResponse:
+    def __init__(self, body, status, mimetype, headers=None):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = headers or []
+        self.etag = hashlib.md5(body).hexdigest()
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+class ResponseCache:
+    """
+    Caches GET responses under named tags and drops them when a write path
+    calls invalidate() for that tag.
+
+    Each tag has a version that is part of every cache key. Bumping it makes
+    all earlier entries unreachable; they then age out through TTL and LRU
+    eviction. This also works for shared backends, where deleting keys by
+    prefix is not available. With the in-process backend the versions are
+    file stamps under RESPONSE_CACHE_VERSION_DIR (see FileVersionStamps), so
+    every process on the host drops its entries; shared backends keep them
+    as keys of their own. Responses carry an ETag and Last-Modified, so
+    polling clients get 304 Not Modified while nothing has changed.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.versions = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.default_ttl = app.config.get('RESPONSE_CACHE_TTL', 30)
+        self.backend = self._create_backend(
+            app.config.get('RESPONSE_CACHE_BACKEND', 'memory'),
+            app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        )
+        if isinstance(self.backend, MemoryCacheBackend):
+            self.versions = FileVersionStamps(app.config['RESPONSE_CACHE_VERSION_DIR'])
+        else:
+            self.versions = BackendVersions(self.backend)
+        app.extensions['response_cache'] = self
+
+    @staticmethod
+    def _create_backend(backend, max_entries):
+        if backend == 'memory':
+            return MemoryCacheBackend(max_entries=max_entries)
+
+        # Any object with get(key) and set(key, value, ttl), given as 'module:Class'
+        module_name, class_name = backend.split(':')
+        return getattr(import_module(module_name), class_name)()
+
+    def _version(self, tag):
+        return self.versions.get(tag)
+
+    def invalidate(self, *tags):
+        """
+        Drop every cached response stored under the given tags. Called after
+        the write commits; a failure is logged rather than failing the write,
+        and the entries then expire with their TTL.
+        """
+        if self.versions is None:
+            return
+        for tag in tags:
+            try:
+                self.versions.bump(tag)
+            except OSError:
+                current_app.logger.exception('Could not invalidate the %s response cache', tag)
+
+    def cached(self, tag, ttl=None):
+        """
+        Cache a view's response, keyed by tag and the full request path
+        including query string.
+
+        Args:
+            tag (str): Invalidation tag, e.g. 'dashboard'
+            ttl (int): Seconds to keep the response, defaults to RESPONSE_CACHE_TTL
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                key = f'response:{tag}:{self._version(tag)}:{request.full_path}'
+                entry = self.backend.get(key)
+
+                if entry is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+
+                    headers = [(name, value) for name, value in response.headers
+                               if name.startswith('X-')]
+                    entry = CachedResponse(response.get_data(), response.status_code, response.mimetype, headers)
+                    self.backend.set(key, entry, ttl or self.default_ttl)
+
+                return self._build_response(entry)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _build_response(entry):
+        response = current_app.response_class(entry.body, status=entry.status, mimetype=entry.mimetype,
+                                              headers=entry.headers)
+        response.set_etag(entry.etag)
+        response.last_modified = entry.last_modified
+        # Clients may keep the body but must revalidate it on every poll
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
@@ -0,0 +1,42 @@
+from functools import wraps
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the reads of replica-routed requests to the 'replica'
+    bind (SQLALCHEMY_BINDS) and everything else to the primary.
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary, so a
+    view that unexpectedly writes still writes to the right database.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _replica_requested() and not self._flushing and not isinstance(clause, UpdateBase):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _replica_requested():
+    return has_app_context() and g.get('use_replica', False)
+
+
+def use_replica(view):
+    """
+    Serve a read-only view from the read replica when one is configured.
+
+    The flag lives on g for the rest of the request, which also covers
+    streamed responses. The replica may lag behind the primary, so only use
+    it for views that tolerate slightly stale data.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = True
+        return view(*args, **kwargs)
+    return wrapper
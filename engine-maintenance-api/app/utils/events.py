@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class Event:
+    """A published change: id, type (e.g. 'alert.created') and a JSON-able payload"""
+
+    __slots__ = ('id', 'sequence', 'type', 'data', 'encoded')
+
+    def __init__(self, token, sequence, event_type, data):
+        self.id = f'{token}-{sequence}'
+        self.sequence = sequence
+        self.type = event_type
+        self.data = data
+        # Encoded once, however many clients receive it
+        self.encoded = f'id: {self.id}\nevent: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class EventStream:
+    """
+    One client's subscription: a bounded buffer filled by publishers and
+    drained by the client's response generator.
+
+    Publishers never wait for a client. When the buffer is full the client
+    has fallen behind, so its backlog is dropped and replaced with a single
+    'resync' event telling it to reload /api/dashboard and /api/alerts once.
+    """
+
+    def __init__(self, broker, maxsize, types=None):
+        self.broker = broker
+        self.maxsize = maxsize
+        self.types = types  # Event type prefixes to receive, or None for all
+        self.dropped = 0
+        self._events = deque()
+        self._condition = threading.Condition()
+
+    def wants(self, event_type):
+        return self.types is None or event_type == 'resync' or event_type.split('.', 1)[0] in self.types
+
+    def put(self, event):
+        with self._condition:
+            if len(self._events) >= self.maxsize:
+                self.dropped += len(self._events)
+                self._events.clear()
+                self._events.append(self.broker.resync_event())
+            else:
+                self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout):
+        """
+        Wait up to timeout seconds for events.
+
+        Returns:
+            list: Every buffered event, oldest first; empty on timeout
+        """
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+
+class EventBroker:
+    """
+    In-process pub/sub feeding the /api/events Server-Sent Events stream.
+
+    Write paths publish small deltas (alert created or updated, maintenance
+    record changed, engine health changed) with publish_on_commit(); they are
+    staged on the database session and only sent once it commits, so clients
+    never see a change that was rolled back. Each subscriber has its own
+    bounded buffer (EVENTS_CLIENT_BUFFER), see EventStream.
+
+    The last EVENTS_REPLAY events are kept so a client that reconnects with
+    Last-Event-ID gets what it missed. Event IDs carry a per-process token:
+    under gunicorn each worker process has its own broker and only sees the
+    writes made in that process, and a client that reconnects to a different
+    worker is told to resync.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque()
+        self._sequence = 0
+        self._pid = None
+        self._token = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('EVENTS_ENABLED', True)
+        self.client_buffer = app.config.get('EVENTS_CLIENT_BUFFER', 100)
+        self.max_clients = app.config.get('EVENTS_MAX_CLIENTS', 100)
+        self.heartbeat = app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+        self.stream_seconds = app.config.get('EVENTS_STREAM_SECONDS', 300)
+        self._recent = deque(maxlen=app.config.get('EVENTS_REPLAY', 500))
+        app.extensions['events'] = self
+
+        if not getattr(EventBroker, '_session_hooks_installed', False):
+            event.listen(Session, 'after_commit', _after_commit)
+            event.listen(Session, 'after_transaction_end', _after_transaction_end)
+            EventBroker._session_hooks_installed = True
+
+    def publish(self, event_type, data):
+        """Send an event to every subscriber now"""
+        if not getattr(self, 'enabled', False):
+            return None
+
+        with self._lock:
+            self._check_process()
+            self._sequence += 1
+            published = Event(self._token, self._sequence, event_type, data)
+            self._recent.append(published)
+            subscribers = list(self._subscribers)
+
+        for stream in subscribers:
+            if stream.wants(event_type):
+                stream.put(published)
+        return published
+
+    def publish_on_commit(self, event_type, data):
+        """
+        Send an event once the current database transaction commits; it is
+        dropped if the transaction rolls back.
+        """
+        if not getattr(self, 'enabled', False):
+            return
+
+        from app import db
+        db.session().info.setdefault('pending_events', []).append((event_type, data))
+
+    def subscribe(self, last_event_id=None, types=None):
+        """
+        Register a client.
+
+        Args:
+            last_event_id (str): ID of the last event the client received,
+                from the Last-Event-ID header of a reconnect
+            types (set): Event type prefixes to receive, e.g. {'alert'}
+
+        Returns:
+            EventStream: The subscription, or None when EVENTS_MAX_CLIENTS
+                clients are already connected
+        """
+        with self._lock:
+            self._check_process()
+            if len(self._subscribers) >= self.max_clients:
+                return None
+
+            # Queue the replay before the stream is visible to publishers, so
+            # newer events cannot overtake it
+            stream = EventStream(self, self.client_buffer, types)
+            if last_event_id:
+                missed = [missed for missed in self._missed_since(last_event_id) if stream.wants(missed.type)]
+                if len(missed) > self.client_buffer:
+                    missed = [self._resync('events_dropped')]
+                stream._events.extend(missed)
+            self._subscribers.add(stream)
+        return stream
+
+    def unsubscribe(self, stream):
+        with self._lock:
+            self._subscribers.discard(stream)
+
+    @property
+    def client_count(self):
+        return len(self._subscribers)
+
+    def resync_event(self, reason='events_dropped'):
+        """Tells a client its view is stale and it should reload from the REST API"""
+        with self._lock:
+            self._check_process()
+            return self._resync(reason)
+
+    def _resync(self, reason):
+        # Carries the latest ID, so a reconnect after it replays from here
+        return Event(self._token, self._sequence, 'resync', {'reason': reason})
+
+    def _missed_since(self, last_event_id):
+        token, _, sequence = last_event_id.rpartition('-')
+        if token != self._token or not sequence.isdigit():
+            # From another worker process or before a restart
+            return [self._resync('unknown_last_event')]
+
+        sequence = int(sequence)
+        if sequence < self._sequence and (not self._recent or self._recent[0].sequence > sequence + 1):
+            return [self._resync('replay_unavailable')]
+        return [recent for recent in self._recent if recent.sequence > sequence]
+
+    def _check_process(self):
+        # Subscribers and sequence numbers do not survive a fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._token = uuid.uuid4().hex[:8]
+            self._sequence = 0
+            self._subscribers = set()
+            self._recent.clear()
+
+
+def format_comment(text):
+    """An SSE comment line, ignored by EventSource; used as a keepalive"""
+    return f': {text}\n\n'
+
+
+def _after_commit(session):
+    pending = session.info.pop('pending_events', None)
+    if not pending:
+        return
+
+    from app import events
+    if len(pending) > events.client_buffer:
+        # A bulk job (fleet rescore, backfill): one resync beats flooding every buffer
+        events.publish('resync', {'reason': 'bulk_update', 'changes': len(pending)})
+        return
+    for event_type, data in pending:
+        events.publish(event_type, data)
+
+
+def _after_transaction_end(session, transaction):
+    # Whatever is still staged when the outermost transaction ends was rolled
+    # back (or the session closed without committing)
+    if transaction.parent is None:
+        session.info.pop('pending_events', None)
@@ -0,0 +1,143 @@
+import numpy as np
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models.engine import Engine, EngineCycle, SENSOR_KEYS, SETTING_KEYS
+from app.models.alert import Alert
+from app.models.maintenance import Maintenance
+from app.models.user import User
+
+# The engine families in engine_test_data.json
+ENGINE_MODELS = ['CFM56-7B', 'CFM56-5B', 'Trent 1000', 'Trent XWB', 'LEAP-1B', 'PW1000G', 'GE90-115B', 'GE9X']
+
+# Per-sensor healthy mean, noise and drift at end of life, after C-MAPSS FD001
+SENSOR_MEANS = np.array([518.67, 642.68, 1590.52, 1408.93, 14.62, 21.61, 553.37, 2388.10, 9065.24, 1.30,
+                         47.54, 521.41, 2388.10, 8143.75, 8.44, 0.03, 393.21, 2388.0, 100.0, 38.82, 23.29])
+SENSOR_NOISE = np.array([0.0, 0.5, 6.1, 9.0, 0.0, 0.001, 0.885, 0.07, 22.08, 0.0,
+                         0.267, 0.737, 0.07, 19.08, 0.0375, 0.0, 1.55, 0.0, 0.0, 0.18, 0.108])
+SENSOR_DRIFT = np.array([0.0, 1.0, 20.0, 30.0, 0.0, 0.0, -2.5, 0.2, 40.0, 0.0,
+                         1.0, -2.0, 0.2, 30.0, 0.1, 0.0, 4.0, 0.0, 0.0, -0.6, -0.35])
+
+
+def seed_fleet(engines=1000, cycles=200, seed=0, chunk_size=20000, start=datetime(2024, 1, 1)):
+    """
+    Fill an empty database with a synthetic fleet for local runs and
+    benchmarks: users, engines, C-MAPSS-like cycle histories, maintenance
+    records, alerts, the health snapshot and the trend rollups.
+
+    Every engine degrades towards a randomly drawn end of life, so some are
+    close to failure by their last cycle. Cycles are generated with NumPy per
+    chunk of engines and written with executemany on the raw driver, which
+    takes about thirty seconds per million cycles on SQLite, most of it for
+    the trend rollups.
+
+    Args:
+        engines (int): Number of engines
+        cycles (int): Cycles per engine
+        seed (int): Random seed; the same seed gives the same data
+        chunk_size (int): Approximate number of cycle rows per INSERT batch
+        start (datetime): Timestamp of every engine's first cycle
+
+    Returns:
+        dict: Number of rows created per table
+    """
+    from app.services.health import rebuild_engine_health
+    from app.models.rollup import CycleRollup
+    from app.services.rollups import build_rollup_rows
+
+    rng = np.random.default_rng(seed)
+
+    password = generate_password_hash('password', method='scrypt')
+    db.session.add_all([
+        User(username=role, email=f'{role}@example.com', password=password, role=role)
+        for role in ('admin', 'engineer', 'technician')
+    ])
+    db.session.commit()
+
+    engine_rows = [{
+        'serial_number': f'ENG-{i:06d}',
+        'model': ENGINE_MODELS[i % len(ENGINE_MODELS)],
+        'aircraft_id': f'N{i // 2:05d}',
+        'installation_date': start - timedelta(days=int(rng.integers(30, 3000))),
+        'total_cycles': cycles,
+        'status': 'active',
+        'created_at': start,
+        'updated_at': start
+    } for i in range(engines)]
+    for offset in range(0, engines, chunk_size):
+        db.session.execute(Engine.__table__.insert(), engine_rows[offset:offset + chunk_size])
+    db.session.commit()
+    engine_ids = [engine_id for (engine_id,) in db.session.query(Engine.id).order_by(Engine.id).all()]
+
+    # Cycle at which each engine would fail; at least as long as its history
+    end_of_life = cycles * rng.uniform(1.0, 2.5, size=engines)
+
+    columns = ['engine_id', 'cycle', 'timestamp'] + SETTING_KEYS + SENSOR_KEYS
+    placeholder = '?' if db.engine.dialect.paramstyle == 'qmark' else '%s'
+    insert_sql = f"INSERT INTO {EngineCycle.__tablename__} ({', '.join(columns)}) " \
+                 f"VALUES ({', '.join([placeholder] * len(columns))})"
+    cycle_numbers = np.arange(1, cycles + 1)
+    # One cycle every 6 hours
+    timestamps = [str(start + timedelta(hours=6 * int(cycle))) for cycle in cycle_numbers - 1]
+
+    engines_per_chunk = max(1, chunk_size // max(1, cycles))
+    with db.engine.begin() as conn:
+        for offset in range(0, engines, engines_per_chunk):
+            ids = engine_ids[offset:offset + engines_per_chunk]
+            wear = (cycle_numbers / end_of_life[offset:offset + len(ids), None]) ** 2
+            sensors = SENSOR_MEANS + wear[..., None] * SENSOR_DRIFT + \
+                rng.standard_normal((len(ids), cycles, len(SENSOR_KEYS))) * SENSOR_NOISE
+            settings = np.stack([
+                rng.normal(0.0, 0.002, size=(len(ids), cycles)),
+                rng.normal(0.0, 0.0003, size=(len(ids), cycles)),
+                np.full((len(ids), cycles), 100.0)
+            ], axis=-1)
+            values = np.round(np.concatenate([settings, sensors], axis=-1), 4).tolist()
+
+            conn.exec_driver_sql(insert_sql, [
+                (engine_id, cycle, timestamps[index], *values[position][index])
+                for position, engine_id in enumerate(ids)
+                for index, cycle in enumerate(cycle_numbers.tolist())
+            ])
+
+            # Trend rollups straight from the generated readings
+            conn.execute(CycleRollup.__table__.insert(), build_rollup_rows(
+                np.repeat(ids, cycles), np.tile(cycle_numbers, len(ids)),
+                np.round(sensors, 4).reshape(-1, len(SENSOR_KEYS))))
+
+    # Maintenance on a third of the engines, open alerts on the most worn ones
+    admin_id = User.query.filter_by(username='admin').first().id
+    end_date = start + timedelta(hours=6 * cycles)
+    maintenance = [{
+        'engine_id': engine_id,
+        'maintenance_type': ['scheduled', 'unscheduled', 'overhaul'][position % 3],
+        'description': 'Synthetic maintenance record',
+        'performed_by': admin_id,
+        'start_date': start + timedelta(hours=6 * int(rng.integers(0, cycles))),
+        'cycle_count': int(rng.integers(1, cycles + 1)),
+        'parts_replaced': ['fuel nozzle'] if position % 2 else []
+    } for position, engine_id in enumerate(engine_ids) if position % 3 == 0]
+    worn = [engine_id for engine_id, life in zip(engine_ids, end_of_life) if cycles / life > 0.9]
+    alerts = [{
+        'engine_id': engine_id,
+        'alert_type': 'maintenance_due',
+        'message': 'Synthetic alert: engine is close to its end of life',
+        'created_at': end_date,
+        'is_read': False,
+        'resolved': False
+    } for engine_id in worn]
+
+    for table, rows in ((Maintenance.__table__, maintenance), (Alert.__table__, alerts)):
+        for offset in range(0, len(rows), chunk_size):
+            db.session.execute(table.insert(), rows[offset:offset + chunk_size])
+    db.session.commit()
+
+    rebuild_engine_health()
+
+    return {
+        'users': 3,
+        'engines': engines,
+        'cycles': engines * cycles,
+        'maintenance': len(maintenance),
+        'alerts': len(alerts)
+    }
@@ -0,0 +1,322 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+request_logger = logging.getLogger('app.requests')
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus sense: bucket counts, sum and count"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Per-process request, SQL and model inference metrics.
+
+    Every request records its latency and the number and total time of the
+    SQL statements it ran (counted with SQLAlchemy cursor events on every
+    engine, replicas included). A request that runs more than
+    METRICS_QUERY_BUDGET statements is counted and logged as a suspected N+1
+    pattern. Each request is also logged as one JSON line on the
+    'app.requests' logger.
+
+    render() produces the Prometheus text format for /api/metrics. Each
+    process keeps its own numbers; with METRICS_DIR set, every worker writes
+    a snapshot there (see start_worker) and render() sums the snapshots of
+    all of them, so any worker can answer the scrape. Snapshots of exited
+    workers are kept, so counters never go backwards.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._help = {}
+        self._changes = 0
+        self._flushed = None  # value of _changes when last written, None if never
+        self.directory = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.query_budget = app.config.get('METRICS_QUERY_BUDGET', 20)
+        self.log_requests = app.config.get('METRICS_LOG_REQUESTS', True)
+        self.directory = app.config.get('METRICS_DIR')
+        self.flush_seconds = app.config.get('METRICS_FLUSH_SECONDS', 5)
+        app.extensions['metrics'] = self
+
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+        if not getattr(Metrics, '_sql_hooks_installed', False):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            Metrics._sql_hooks_installed = True
+
+        if self.log_requests and not request_logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            request_logger.addHandler(handler)
+            request_logger.setLevel(logging.INFO)
+            request_logger.propagate = False
+
+    def inc(self, name, labels=None, value=1, help=None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._changes += 1
+            if help:
+                self._help.setdefault(name, ('counter', help))
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS, help=None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+            self._changes += 1
+            if help:
+                self._help.setdefault(name, ('histogram', help))
+
+    def record_inference(self, model, seconds, windows):
+        """Record one model forward pass over `windows` input windows"""
+        if not getattr(self, 'enabled', False):
+            return
+        self.observe('model_inference_seconds', seconds, {'model': model},
+                     help='Model forward pass duration in seconds')
+        self.inc('model_inference_windows_total', {'model': model}, value=windows,
+                 help='Input windows scored by the model')
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+    def _finish_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+
+        # A streamed body (exports, event streams) runs its SQL after this
+        # hook, so record the request once the server closes the response
+        stats = g._get_current_object()
+        method, path, status = request.method, request.path, response.status_code
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+
+        def record():
+            self._record_request(method, path, endpoint, status, time.perf_counter() - started,
+                                 stats.get('sql_statements', 0), stats.get('sql_seconds', 0.0))
+
+        if response.is_streamed:
+            response.call_on_close(record)
+        else:
+            record()
+        return response
+
+    def _record_request(self, method, path, endpoint, status, duration, statements, sql_seconds):
+        labels = {'method': method, 'endpoint': endpoint}
+
+        self.inc('http_requests_total', dict(labels, status=str(status)),
+                 help='HTTP requests by endpoint and status')
+        self.observe('http_request_duration_seconds', duration, labels,
+                     help='HTTP request latency in seconds')
+        self.observe('db_statements_per_request', statements, labels, buckets=QUERY_COUNT_BUCKETS,
+                     help='SQL statements executed per request')
+        self.inc('db_statement_seconds_total', labels, value=sql_seconds,
+                 help='Time spent in SQL statements in seconds')
+
+        over_budget = statements > self.query_budget
+        if over_budget:
+            self.inc('db_query_budget_exceeded_total', labels,
+                     help='Requests that ran more SQL statements than METRICS_QUERY_BUDGET (likely N+1)')
+
+        if self.log_requests:
+            record = {
+                'event': 'request',
+                'method': method,
+                'path': path,
+                'endpoint': endpoint,
+                'status': status,
+                'duration_ms': round(duration * 1000, 2),
+                'sql_statements': statements,
+                'sql_ms': round(sql_seconds * 1000, 2)
+            }
+            if over_budget:
+                record['query_budget_exceeded'] = self.query_budget
+                request_logger.warning(json.dumps(record))
+            else:
+                request_logger.info(json.dumps(record))
+
+    def start_worker(self):
+        """
+        Called in each freshly forked worker: drop the numbers inherited from
+        the master and, with METRICS_DIR set, write this process' snapshot
+        there every METRICS_FLUSH_SECONDS from a background thread.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._changes = 0
+            self._flushed = None
+
+        if self.directory:
+            threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except OSError:
+                request_logger.exception('Could not write metrics to %s', self.directory)
+
+    def flush(self):
+        """Write this process' snapshot to METRICS_DIR if it changed"""
+        if not self.directory:
+            return
+
+        with self._lock:
+            if self._flushed == self._changes:
+                return
+            snapshot = self._snapshot()
+            changes = self._changes
+
+        counters, histograms, described = snapshot
+        data = {
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': [[name, labels, *histogram] for (name, labels), histogram in histograms.items()],
+            'help': described
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        # Write then rename, so a scrape never reads a half-written snapshot
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(data, f)
+        os.replace(temporary, path)
+
+        with self._lock:
+            self._flushed = max(self._flushed or 0, changes)
+
+    def _snapshot(self):
+        # Caller holds self._lock
+        counters = dict(self._counters)
+        histograms = {key: (list(h.buckets), list(h.counts), h.total, h.count)
+                      for key, h in self._histograms.items()}
+        return counters, histograms, dict(self._help)
+
+    def _collect(self):
+        """This process' numbers, or the sum over every snapshot in METRICS_DIR"""
+        if not self.directory:
+            with self._lock:
+                return self._snapshot()
+
+        self.flush()
+        counters, histograms, described = {}, {}, {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            for name, labels, value in data['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets, counts, total, count in data['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                if key in histograms:
+                    _, summed, summed_total, summed_count = histograms[key]
+                    counts = [a + b for a, b in zip(summed, counts)]
+                    total, count = total + summed_total, count + summed_count
+                histograms[key] = (buckets, counts, total, count)
+            for name, (kind, text) in data['help'].items():
+                described.setdefault(name, (kind, text))
+
+        return counters, histograms, described
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        counters, histograms, described = self._collect()
+
+        lines = []
+        names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+        for name in names:
+            kind, text = described.get(name, ('untyped', ''))
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+
+            for (metric, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {bucket_count}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['metrics_started'].pop()
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_seconds += time.perf_counter() - started
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get('metrics_started'):
+        context.connection.info['metrics_started'].pop()
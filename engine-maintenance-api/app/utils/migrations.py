@@ -0,0 +1,62 @@
+import json
+from sqlalchemy import inspect, text
+from app import db
+from app.models.engine import SENSOR_KEYS
+
+
+def migrate_sensor_data_to_columns(chunk_size=1000, keep_json=False):
+    """
+    Move readings from the legacy engine_cycle.sensor_data JSON column into
+    the typed s1-s21 columns.
+
+    Safe to re-run: missing columns are added, and only rows that still
+    have sensor_data and no typed readings yet are copied, in id order, so
+    a second run after keep_json never overwrites readings written since.
+    The JSON column is dropped at the end unless keep_json is set.
+
+    Args:
+        chunk_size (int): Number of rows copied per UPDATE batch
+        keep_json (bool): Keep the sensor_data column after copying
+
+    Returns:
+        int: Number of rows copied, or None if there was nothing to migrate
+    """
+    columns = {column['name'] for column in inspect(db.engine).get_columns('engine_cycle')}
+    if 'sensor_data' not in columns:
+        return None
+
+    float_type = db.Float().compile(dialect=db.engine.dialect)
+    assignments = ', '.join(f'{key} = :{key}' for key in SENSOR_KEYS)
+    not_copied = ' AND '.join(f'{key} IS NULL' for key in SENSOR_KEYS)
+    copied = 0
+
+    with db.engine.begin() as conn:
+        for key in SENSOR_KEYS:
+            if key not in columns:
+                conn.execute(text(f'ALTER TABLE engine_cycle ADD COLUMN {key} {float_type}'))
+
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                text(f'SELECT id, sensor_data FROM engine_cycle WHERE id > :last_id '
+                     f'AND sensor_data IS NOT NULL AND {not_copied} ORDER BY id LIMIT :limit'),
+                {'last_id': last_id, 'limit': chunk_size}
+            ).all()
+            if not rows:
+                break
+
+            params = []
+            for row_id, sensor_data in rows:
+                if isinstance(sensor_data, (str, bytes)):
+                    sensor_data = json.loads(sensor_data)
+                sensor_data = sensor_data or {}
+                params.append({'row_id': row_id, **{key: sensor_data.get(key) for key in SENSOR_KEYS}})
+
+            conn.execute(text(f'UPDATE engine_cycle SET {assignments} WHERE id = :row_id'), params)
+            copied += len(rows)
+            last_id = rows[-1][0]
+
+        if not keep_json:
+            conn.execute(text('ALTER TABLE engine_cycle DROP COLUMN sensor_data'))
+
+    return copied
@@ -0,0 +1,86 @@
+"""
+Gunicorn settings for serving wsgi:app in production.
+
+Every value can be overridden from the environment. Predictions are
+CPU-bound NumPy work and the rest is mostly database I/O, so the defaults
+use one process per core with a few threads each. Threads share a process'
+in-memory caches (responses, prediction windows, models); processes scale
+the CPU-bound work past the GIL.
+"""
+import gc
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then to bound slow leaks; the jitter avoids
+# restarting all of them at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+# Build the app and load the model once in the master, before forking
+preload_app = True
+
+# Workers write their metrics here, so /api/metrics on any of them reports
+# the whole server; set before the app is loaded, which reads it at startup
+if not os.environ.get('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='engine-api-metrics-')
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None  # Empty disables it
+# The default format logs the full request line; query strings can carry
+# tokens (/api/events?jwt=), so only the path is logged
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # Every /api/events stream holds a thread for up to EVENTS_STREAM_SECONDS;
+    # with as many streams as threads no other request could be served
+    from wsgi import app
+
+    max_clients = app.config['EVENTS_MAX_CLIENTS'] if app.config['EVENTS_ENABLED'] else 0
+    if max_clients >= server.cfg.threads:
+        raise RuntimeError(f'EVENTS_MAX_CLIENTS ({max_clients}) must be lower than the threads per worker '
+                           f'({server.cfg.threads}); raise GUNICORN_THREADS or lower EVENTS_MAX_CLIENTS')
+
+    # Snapshots left by workers of an earlier server would be added to ours
+    if app.config['METRICS_DIR']:
+        for path in glob.glob(os.path.join(app.config['METRICS_DIR'], '*.json')):
+            os.remove(path)
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach, so its
+    # passes do not write to (and un-share) the preloaded pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (create_all, model warm-up) must not
+    # be shared between processes; each worker starts its own pool
+    from wsgi import app
+    from app import db, metrics
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    metrics.start_worker()
+
+
+def worker_exit(server, worker):
+    # Anomaly baseline readings below ANOMALY_BASELINE_FLUSH_ROWS are still
+    # only in this worker's memory; save them before it goes away
+    from wsgi import app
+    from app import anomaly_detector, metrics
+
+    with app.app_context():
+        anomaly_detector.flush(force=True)
+    # Keep the final numbers of this worker in the server totals
+    metrics.flush()
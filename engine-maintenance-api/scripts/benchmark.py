@@ -0,0 +1,227 @@
+"""
+Benchmark the ingest, prediction and read hot paths on a seeded fleet.
+
+For every fleet size a fresh interpreter seeds N engines x M cycles (in-memory
+SQLite unless --database-url is given) and measures:
+
+- add_cycle_data: POST /api/engines/<id>/cycles throughput on engines with
+  short histories, so no prediction is triggered
+- run_predictions: latency split into fetch, build, predict and write, with
+  a cold and a warm window cache
+- GET /api/engines, /api/engines?page=1 and /api/dashboard latency, with the
+  response cache disabled
+- peak RSS of the process
+
+Results are written as JSON together with the git commit, so runs can be
+compared across commits:
+
+    python scripts/benchmark.py --fleet-sizes 100,1000 --cycles 200 --output bench.json
+    python scripts/benchmark.py --fleet-sizes 100,1000 --cycles 200 --compare bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summarize(timings):
+    """Latency summary in milliseconds"""
+    timings = sorted(timings)
+    if not timings:
+        return {}
+
+    def percentile(fraction):
+        return timings[min(len(timings) - 1, int(len(timings) * fraction))] * 1000
+
+    return {
+        'count': len(timings),
+        'mean_ms': sum(timings) / len(timings) * 1000,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+        'max_ms': timings[-1] * 1000
+    }
+
+
+def run_fleet(engines, cycles, ingest, repeat, database_url):
+    """Seed one fleet and measure it; runs inside the worker interpreter"""
+    import resource
+    sys.path.insert(0, ROOT)
+    if database_url:
+        os.environ['TEST_DATABASE_URL'] = database_url
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db, window_cache
+
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        app = create_app('testing')
+    app.extensions['response_cache'].enabled = False
+    results = {'engines': engines, 'cycles_per_engine': cycles}
+
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        from app.models.engine import Engine
+        from app.services.prediction import run_predictions
+        from app.utils.fixtures import seed_fleet
+
+        started = time.perf_counter()
+        seed_fleet(engines=engines, cycles=cycles)
+        seeded = time.perf_counter() - started
+        results['seed'] = {'seconds': seeded, 'cycles_per_s': engines * cycles / seeded}
+
+        token = create_access_token(identity={'user_id': 1, 'username': 'admin', 'role': 'admin'})
+        headers = {'Authorization': f'Bearer {token}'}
+        client = app.test_client()
+
+        # Ingest into fresh engines kept below the 50-cycle prediction window
+        per_engine = 49
+        new_engines = [Engine(serial_number=f'BENCH-{i}', model='CFM56-7B')
+                       for i in range((ingest + per_engine - 1) // per_engine)]
+        db.session.add_all(new_engines)
+        db.session.commit()
+        posts = [(engine.id, cycle) for engine in new_engines for cycle in range(1, per_engine + 1)][:ingest]
+
+        timings = []
+        started = time.perf_counter()
+        for engine_id, cycle in posts:
+            request_started = time.perf_counter()
+            response = client.post(f'/api/engines/{engine_id}/cycles', headers=headers,
+                                   json={'cycle': cycle, 's2': 642.5, 's3': 1590.0, 's4': 1408.0})
+            timings.append(time.perf_counter() - request_started)
+            assert response.status_code == 201, response.get_data(as_text=True)
+        elapsed = time.perf_counter() - started
+        results['add_cycle_data'] = dict(summarize(timings), cycles_per_s=len(posts) / elapsed)
+
+        # Prediction stages, first with every window loaded from the database
+        engine_ids = [engine_id for (engine_id,) in
+                      db.session.query(Engine.id).order_by(Engine.id).limit(repeat).all()]
+        for label, cold in (('run_predictions_cold', True), ('run_predictions_warm', False)):
+            stages = {}
+            totals = []
+            for engine_id in engine_ids:
+                if cold:
+                    window_cache.invalidate(engine_id)
+                timings = {}
+                started = time.perf_counter()
+                run_predictions(engine_id, timings=timings)
+                totals.append(time.perf_counter() - started)
+                for stage, seconds in timings.items():
+                    stages.setdefault(stage, []).append(seconds)
+            results[label] = dict(summarize(totals), stages={stage: summarize(values)
+                                                             for stage, values in stages.items()})
+
+        for path in ('/api/engines', '/api/engines?page=1&per_page=50', '/api/dashboard'):
+            client.get(path, headers=headers)  # warm up
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.get(path, headers=headers)
+                timings.append(time.perf_counter() - started)
+                assert response.status_code == 200
+            results[f'GET {path}'] = summarize(timings)
+
+    results['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1}, keeping numeric leaves only"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, current):
+    """Print the change of every timing, throughput and memory metric"""
+    old = flatten(baseline['fleets'])
+    new = flatten(current['fleets'])
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    print(f'  {"metric":<70} {"before":>10} {"after":>10} {"change":>8}')
+    for name in sorted(set(old) & set(new)):
+        if not name.endswith(('_ms', '_s', 'seconds', '_mb')) or old[name] == 0:
+            continue
+        change = (new[name] - old[name]) / old[name] * 100
+        print(f'  {name:<70} {old[name]:>10.2f} {new[name]:>10.2f} {change:>+7.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fleet-sizes', default='100,1000', help='Comma-separated engine counts')
+    parser.add_argument('--cycles', type=int, default=200, help='Seeded cycles per engine')
+    parser.add_argument('--ingest', type=int, default=500, help='Cycles posted through add_cycle_data')
+    parser.add_argument('--repeat', type=int, default=50, help='Samples per latency measurement')
+    parser.add_argument('--database-url', help='Benchmark against this (empty) database instead of in-memory SQLite')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON file from an earlier run')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_fleet(args.worker, args.cycles, args.ingest, args.repeat, args.database_url)))
+        return
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'config': {'cycles': args.cycles, 'ingest': args.ingest, 'repeat': args.repeat,
+                   'database': args.database_url or 'sqlite (in-memory)'},
+        'fleets': {}
+    }
+
+    for engines in [int(size) for size in args.fleet_sizes.split(',')]:
+        command = [sys.executable, os.path.abspath(__file__), '--worker', str(engines), '--cycles', str(args.cycles),
+                   '--ingest', str(args.ingest), '--repeat', str(args.repeat)]
+        if args.database_url:
+            command += ['--database-url', args.database_url]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            sys.exit(f'Benchmark for {engines} engines failed:\n{completed.stderr}')
+        results = json.loads(completed.stdout.strip().splitlines()[-1])
+        report['fleets'][str(engines)] = results
+
+        print(f"\n{engines} engines x {args.cycles} cycles (seeded in {results['seed']['seconds']:.1f}s, "
+              f"peak RSS {results['peak_rss_mb']:.0f} MB)")
+        print(f"  add_cycle_data: {results['add_cycle_data']['cycles_per_s']:.0f} cycles/s, "
+              f"p99 {results['add_cycle_data']['p99_ms']:.1f} ms")
+        for label in ('run_predictions_cold', 'run_predictions_warm'):
+            stages = ', '.join(f"{stage} {stats['p50_ms']:.2f}" for stage, stats in results[label]['stages'].items())
+            print(f"  {label}: p50 {results[label]['p50_ms']:.2f} ms ({stages})")
+        for key, stats in results.items():
+            if key.startswith('GET '):
+                print(f"  {key}: p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare startup cost and inference latency of the RNN_fwd model backends.
+
+Each backend is measured in a fresh interpreter so import time and peak
+memory are not polluted by the other backend.
+
+Usage:
+    python scripts/benchmark_model_backends.py [--backends numpy keras] [--repeat 50]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(ROOT, 'ml_models', 'RNN_fwd.h5')
+
+WORKER = '''
+import json, resource, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+import numpy as np
+from app.services.model_backends import load_backend
+model = load_backend({backend!r}, {model_path!r})
+startup = time.perf_counter() - t0
+
+rng = np.random.default_rng(0)
+latency = {{}}
+for batch_size in (1, 64, 1024):
+    X = rng.normal(642.7, 0.5, size=(batch_size, 50, 1)).astype(np.float32)
+    model.predict(X)  # warm up
+    timings = []
+    for _ in range({repeat}):
+        start = time.perf_counter()
+        model.predict(X)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    latency[batch_size] = {{
+        'p50_ms': timings[len(timings) // 2] * 1000,
+        'p99_ms': timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+    }}
+
+print(json.dumps({{
+    'backend': {backend!r},
+    'startup_s': startup,
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'latency': latency
+}}))
+'''
+
+
+def run_backend(backend, repeat):
+    code = WORKER.format(root=ROOT, backend=backend, model_path=MODEL_PATH, repeat=repeat)
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        return {'backend': backend, 'error': completed.stderr.strip().splitlines()[-1]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=['numpy', 'keras'])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    results = [run_backend(backend, args.repeat) for backend in args.backends]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
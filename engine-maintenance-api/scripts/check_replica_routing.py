@@ -0,0 +1,89 @@
+"""
+Check that read-only endpoints are served by the read replica and writes go
+to the primary, using two throwaway SQLite databases as stand-ins.
+
+Every statement is counted per database: read-only GETs must not touch the
+primary, and writes must not touch the replica.
+
+    python scripts/check_replica_routing.py
+"""
+import os
+import sys
+import tempfile
+
+tmp_dir = tempfile.mkdtemp(prefix='replica-check-')
+os.environ['TEST_DATABASE_URL'] = f'sqlite:///{tmp_dir}/primary.db'
+os.environ['REPLICA_DATABASE_URL'] = f'sqlite:///{tmp_dir}/replica.db'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db
+
+
+def main():
+    app = create_app('testing')
+    app.extensions['response_cache'].enabled = False
+
+    with app.app_context():
+        from app.models.engine import Engine
+        from app.models.user import User
+
+        primary = db.engines[None]
+        replica = db.engines['replica']
+        db.metadata.create_all(replica)
+
+        # Same ids, different serial numbers, so responses show where they came from
+        for engine, label in ((primary, 'PRIMARY'), (replica, 'REPLICA')):
+            with engine.begin() as conn:
+                conn.execute(User.__table__.insert(), [{'username': 'admin', 'email': 'admin@example.com',
+                                                       'password': 'x', 'role': 'admin'}])
+                conn.execute(Engine.__table__.insert(), [{'serial_number': f'{label}-{i}', 'model': 'CFM56-7B',
+                                                         'status': 'active', 'total_cycles': 0}
+                                                        for i in range(1, 4)])
+
+        token = create_access_token(identity={'user_id': 1, 'username': 'admin', 'role': 'admin'})
+
+    counts = {'primary': 0, 'replica': 0}
+
+    def counter(name):
+        def count(*args):
+            counts[name] += 1
+        return count
+
+    event.listen(primary, 'before_cursor_execute', counter('primary'))
+    event.listen(replica, 'before_cursor_execute', counter('replica'))
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    failures = 0
+
+    def check(name, response, expect_db, body_contains=None):
+        nonlocal failures
+        other = 'primary' if expect_db == 'replica' else 'replica'
+        ok = response.status_code < 400 and counts[expect_db] > 0 and counts[other] == 0
+        if body_contains and body_contains not in response.get_data(as_text=True):
+            ok = False
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: HTTP {response.status_code}, "
+              f"{counts['primary']} primary / {counts['replica']} replica statements")
+        failures += not ok
+        counts.update(primary=0, replica=0)
+
+    check('GET /api/engines', client.get('/api/engines', headers=headers), 'replica', 'REPLICA-1')
+    check('GET /api/engines/1', client.get('/api/engines/1', headers=headers), 'replica', 'REPLICA-1')
+    check('GET /api/cycles/export', client.get('/api/cycles/export', headers=headers), 'replica')
+    # Cached endpoints stay on the primary so the cache never holds lagging data
+    check('GET /api/dashboard', client.get('/api/dashboard', headers=headers), 'primary')
+    check('GET /api/alerts', client.get('/api/alerts', headers=headers), 'primary')
+    check('GET /api/maintenance', client.get('/api/maintenance', headers=headers), 'replica')
+    check('POST /api/engines', client.post('/api/engines', headers=headers,
+                                           json={'serial_number': 'NEW-1', 'model': 'LEAP-1B'}), 'primary')
+    check('PUT /api/engines/1', client.put('/api/engines/1', headers=headers,
+                                           json={'status': 'maintenance'}), 'primary', 'PRIMARY-1')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Check that the hot read paths are served by indexes rather than full scans.
+
+Every SQL statement issued while calling each route (and the prediction
+service) is captured and run through EXPLAIN. The script exits non-zero if
+any statement scans one of the large tables without an index.
+
+Run it against a disposable database; it is seeded when empty:
+
+    TEST_DATABASE_URL=sqlite:////tmp/explain.db python scripts/explain_queries.py --engines 500 --cycles 400
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db
+
+# Scanning these tables end to end means the cost grows with history
+LARGE_TABLES = {'engine_cycle', 'alert', 'maintenance', 'engine_health'}
+
+
+def seed(engines, cycles):
+    from app.models.engine import Engine
+    from app.models.alert import Alert
+    from app.models.maintenance import Maintenance
+    from app.models.user import User
+    from app.services.ingest import build_cycle_rows, bulk_insert_cycles
+    from app.services.health import rebuild_engine_health
+
+    rng = random.Random(0)
+    db.session.add(User(username='explain', email='explain@example.com', password='x', role='admin'))
+    models = ['CFM56-7B', 'Trent 1000', 'LEAP-1B', 'PW1000G']
+    db.session.add_all([
+        Engine(serial_number=f'ENG-{i:05d}', model=models[i % len(models)], aircraft_id=f'N{i:05d}')
+        for i in range(engines)
+    ])
+    db.session.commit()
+
+    for engine_id in range(1, engines + 1):
+        records = [{'cycle': cycle, 's2': 642 + rng.random()}
+                   for cycle in range(1, cycles + 1)]
+        bulk_insert_cycles(build_cycle_rows(records, engine_id=engine_id), chunk_size=500)
+
+        start = datetime(2024, 1, 1) + timedelta(hours=engine_id)
+        db.session.add_all([
+            Alert(engine_id=engine_id, alert_type='maintenance_due', message='seed',
+                  created_at=start + timedelta(days=k), resolved=k % 3 != 0)
+            for k in range(5)
+        ])
+        db.session.add(Maintenance(engine_id=engine_id, maintenance_type='scheduled',
+                                   description='seed', start_date=start, performed_by=1))
+        db.session.commit()
+
+    rebuild_engine_health()
+
+
+def explain(conn, statement, parameters):
+    """Return (plan_lines, full_scan_tables) for one statement"""
+    full_scans = set()
+    lines = []
+
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        for row in rows:
+            detail = row[-1]
+            lines.append(detail)
+            words = detail.split()
+            # "SCAN table" without an index is a full table scan
+            if words[0] == 'SCAN' and 'INDEX' not in detail and words[1] in LARGE_TABLES:
+                full_scans.add(words[1])
+    else:
+        result = conn.exec_driver_sql('EXPLAIN ' + statement, parameters)
+        columns = list(result.keys())
+        for row in result.all():
+            row = dict(zip(columns, row))
+            lines.append(f"{row.get('table')}: type={row.get('type')} key={row.get('key')}")
+            if row.get('type') == 'ALL' and row.get('table') in LARGE_TABLES:
+                full_scans.add(row['table'])
+
+    return lines, full_scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='testing')
+    parser.add_argument('--engines', type=int, default=200)
+    parser.add_argument('--cycles', type=int, default=300)
+    parser.add_argument('--verbose', action='store_true', help='Print every plan')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    app.config['JWT_VERIFY_SUB'] = False
+    app.extensions['response_cache'].enabled = False
+
+    with app.app_context():
+        from app.models.engine import Engine
+        if Engine.query.count() == 0:
+            print(f'Seeding {args.engines} engines x {args.cycles} cycles...')
+            seed(args.engines, args.cycles)
+
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql('ANALYZE')
+
+        token = create_access_token(identity={'user_id': 1, 'username': 'explain', 'role': 'admin'})
+        engine_id = Engine.query.order_by(Engine.id).first().id
+
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+
+    def predict():
+        from app.services.prediction import fetch_windows
+        with app.app_context():
+            fetch_windows([engine_id, engine_id + 1])
+
+    checks = [
+        ('GET /api/engines', lambda: client.get('/api/engines', headers=headers)),
+        ('GET /api/engines?status=active&page=2', lambda: client.get('/api/engines?status=active&page=2', headers=headers)),
+        ('GET /api/engines/<id>', lambda: client.get(f'/api/engines/{engine_id}', headers=headers)),
+        ('GET /api/dashboard', lambda: client.get('/api/dashboard', headers=headers)),
+        ('GET /api/alerts', lambda: client.get('/api/alerts?limit=50', headers=headers)),
+        ('GET /api/alerts?resolved=true', lambda: client.get('/api/alerts?resolved=true&limit=50', headers=headers)),
+        ('GET /api/maintenance?engine_id=<id>', lambda: client.get(f'/api/maintenance?engine_id={engine_id}', headers=headers)),
+        ('fetch_windows', predict),
+    ]
+
+    failures = 0
+    with app.app_context():
+        captured = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                captured.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+
+        for name, call in checks:
+            captured.clear()
+            response = call()
+            if response is not None and response.status_code != 200:
+                print(f'FAIL {name}: HTTP {response.status_code}')
+                failures += 1
+                continue
+
+            statements = list(captured)
+            with db.engine.connect() as conn:
+                scans = set()
+                for statement, parameters in statements:
+                    lines, full_scans = explain(conn, statement, parameters)
+                    scans |= full_scans
+                    if args.verbose or full_scans:
+                        print(f'  {" ".join(statement.split())[:120]}')
+                        for line in lines:
+                            print(f'    {line}')
+
+            status = 'ok  ' if not scans else 'FAIL'
+            detail = f' full scan of {", ".join(sorted(scans))}' if scans else ''
+            print(f'{status} {name} ({len(statements)} queries){detail}')
+            failures += bool(scans)
+
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Load-test the main read endpoints and report throughput and latency.
+
+Either point it at a running server with --url, or let it start gunicorn
+(gunicorn.conf.py, wsgi:app) once per worker count in --workers and compare:
+
+    DATABASE_URL=sqlite:////tmp/load.db python scripts/load_test.py --workers 1,2,4 --threads 4
+
+The database must already contain engines (e.g. from the seed script). A
+load-test user is registered on first use.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def request(conn, method, path, token=None, body=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def connect(base_url):
+    parts = urlsplit(base_url)
+    return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+
+def login(base_url, username, password):
+    conn = connect(base_url)
+    credentials = {'username': username, 'password': password}
+    status, body = request(conn, 'POST', '/api/login', body=credentials)
+    if status == 401:
+        request(conn, 'POST', '/api/register', body=dict(credentials, email=f'{username}@example.com', role='admin'))
+        status, body = request(conn, 'POST', '/api/login', body=credentials)
+    if status != 200:
+        raise SystemExit(f'Login failed with HTTP {status}: {body[:200]}')
+    return json.loads(body)['access_token']
+
+
+def endpoints(base_url, token):
+    conn = connect(base_url)
+    status, body = request(conn, 'GET', '/api/engines?page=1&per_page=1&fields=id', token)
+    engines = json.loads(body) if status == 200 else []
+    if not engines:
+        raise SystemExit('No engines found; seed the database first')
+    engine_id = engines[0]['id']
+
+    return [
+        '/api/engines',
+        '/api/engines?page=1&per_page=50',
+        f'/api/engines/{engine_id}',
+        '/api/dashboard',
+        '/api/alerts?limit=50',
+        f'/api/maintenance?engine_id={engine_id}',
+    ]
+
+
+def run_load(base_url, token, paths, concurrency, duration):
+    """Hit paths round-robin from `concurrency` keep-alive clients for `duration` seconds"""
+    latencies = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        conn = connect(base_url)
+        local = []
+        i = offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                status, _ = request(conn, 'GET', path, token)
+            except (OSError, http.client.HTTPException):
+                status = None
+                conn.close()
+                conn = connect(base_url)
+            local.append((path, time.perf_counter() - start, status))
+        with lock:
+            for path, elapsed, status in local:
+                if status == 200:
+                    latencies[path].append(elapsed)
+                else:
+                    errors[path] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for path in paths:
+        timings = sorted(latencies[path])
+        results[path] = {
+            'requests': len(timings),
+            'errors': errors[path],
+            'rps': len(timings) / elapsed,
+            'p50_ms': percentile(timings, 0.50) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000
+        }
+    all_timings = sorted(t for timings in latencies.values() for t in timings)
+    results['total'] = {
+        'requests': len(all_timings),
+        'errors': sum(errors.values()),
+        'rps': len(all_timings) / elapsed,
+        'p50_ms': percentile(all_timings, 0.50) * 1000,
+        'p99_ms': percentile(all_timings, 0.99) * 1000
+    }
+    return results
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers, threads):
+    port = free_port()
+    env = dict(os.environ, GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads),
+               GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_ACCESS_LOG='')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    for _ in range(300):
+        if process.poll() is not None:
+            raise SystemExit('gunicorn exited during startup; run it by hand to see the error')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.1)
+
+    process.terminate()
+    raise SystemExit('gunicorn did not start listening in time')
+
+
+def print_results(label, results):
+    print(f'\n{label}')
+    print(f'  {"endpoint":<40} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    for path, stats in results.items():
+        print(f'  {path:<40} {stats["rps"]:>8.1f} {stats["p50_ms"]:>8.1f} {stats["p99_ms"]:>8.1f} {stats["errors"]:>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Test an already running server instead of starting gunicorn')
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated gunicorn worker counts to compare')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per run')
+    parser.add_argument('--username', default='loadtest')
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    if args.url:
+        runs = [(args.url, None)]
+    else:
+        runs = [(None, int(workers)) for workers in args.workers.split(',')]
+
+    report = {}
+    for base_url, workers in runs:
+        process = None
+        if workers is not None:
+            process, base_url = start_gunicorn(workers, args.threads)
+        try:
+            token = login(base_url, args.username, args.password)
+            paths = endpoints(base_url, token)
+            results = run_load(base_url, token, paths, args.concurrency, args.duration)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+        label = base_url if workers is None else f'{workers} worker(s) x {args.threads} thread(s)'
+        print_results(label, results)
+        report[label] = results
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+"""
+Production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The config preloads this module in the gunicorn master, so the app and the
+model weights are built once and shared copy-on-write by every worker.
+"""
+import os
+from app import create_app
+
+app = create_app(os.environ.get('FLASK_CONFIG', 'production'))